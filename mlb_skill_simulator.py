@@ -1,10 +1,54 @@
 import random
 import enum
-import tkinter as tk
-from tkinter import ttk, messagebox
+import functools
+import itertools
+import math
+import threading
+import queue
+import collections
+import contextlib
+import time
+import numpy as np
+import argparse
+import json
 import sys
 import os
-from PIL import Image, ImageTk
+
+# 多行程、雜湊、暫存檔、子行程、統計分布與記憶體量測模組只有部分功能使用，第一次用到時才載入以縮短匯入時間
+concurrent = multiprocessing = hashlib = tempfile = subprocess = statistics = tracemalloc = None
+
+def load_runtime_modules():
+    global concurrent, multiprocessing, hashlib, tempfile, subprocess, statistics, tracemalloc
+    if multiprocessing is None:
+        import concurrent.futures
+        import hashlib
+        import tempfile
+        import subprocess
+        import statistics
+        import tracemalloc
+        import multiprocessing
+
+# 圖形介面模組（tkinter、PIL）於啟動介面時才載入，模擬核心與命令列不需要它們
+tk = ttk = messagebox = Image = ImageTk = None
+
+# 本機模擬服務使用的 asyncio 於啟動服務時才載入
+asyncio = http = None
+
+def load_service_modules():
+    global asyncio, http
+    if asyncio is None:
+        import asyncio as asyncio_module
+        import http as http_module
+        asyncio, http = asyncio_module, http_module
+
+def load_gui_modules():
+    global tk, ttk, messagebox, Image, ImageTk
+    if tk is None:
+        import tkinter
+        from tkinter import ttk as tkinter_ttk, messagebox as tkinter_messagebox
+        from PIL import Image as pil_image, ImageTk as pil_image_tk
+        tk, ttk, messagebox = tkinter, tkinter_ttk, tkinter_messagebox
+        Image, ImageTk = pil_image, pil_image_tk
 
 def resource_path(relative_path):
     if hasattr(sys, '_MEIPASS'):
@@ -69,255 +113,3128 @@ class DefensivePosition(enum.Enum):
 
 # 技能類別
 class Skill:
-    def __init__(self, name, tier, level=1):
+    __slots__ = ("name", "tier", "level", "skill_id")
+
+    def __init__(self, name, tier, level=1, skill_id=None):
         self.name = name
         self.tier = tier
         self.level = level
+        self.skill_id = skill_id
+
+    def __str__(self):
+        return f"{self.name} Lv.{self.level}"
+
+# 球員類別
+class Player:
+    __slots__ = ("player_type", "position", "is_legend", "is_black_diamond", "skills", "defensive_position", "stats")
+
+    def __init__(self, player_type, position, is_legend=False, is_black_diamond=True):
+        self.player_type = player_type
+        self.position = position
+        self.is_legend = is_legend
+        self.is_black_diamond = is_black_diamond
+        self.skills = [None, None, None]
+        self.defensive_position = None
+        self.stats = SimulationStats(player_type)
+
+    def set_skill(self, slot, skill):
+        self.skills[slot] = skill
+
+    def has_legend_skill(self):
+        return any(skill and skill.tier == SkillTier.LEGEND for skill in self.skills)
+
+    def is_legend_skill_in_slot(self, slot):
+        return self.skills[slot] and self.skills[slot].tier == SkillTier.LEGEND
+
+# 技能資料庫
+BATTER_SKILLS = {
+    SkillTier.BRONZE: ["代打專家", "鷹眼", "推打", "拉打", "左腕殺手", "右腕殺手", "守備將軍", "打點機器", "直球殺手", "集中力", "正面對決", "初球攻略"],
+    SkillTier.SILVER: ["精密打擊", "揮大棒打者", "訓練上癮", "巨砲本能", "開路先鋒", "筋疲力盡", "忍術", "下盤鍛錬", "逆轉的力量", "勝負天性", "動物本能", "信賴", "克服弱點"],
+    SkillTier.GOLD: ["雷射肩", "王牌殺手", "超級強打", "五拍子球員", "超能神話", "預知能力", "盜壘天王", "打擊機器", "自走砲", "萬眾矚目", "超級輔助", "強化優點", "廣角打者"],
+    SkillTier.LEGEND: ["打者洞察力", "精準打擊", "壞球打者", "先鋒", "天生巨星", "機會製造者", "打者默契", "最強打者", "老手"]
+}
+
+PITCHER_SKILLS = {
+    SkillTier.BRONZE: ["牽制王", "平靜", "佛祖保佑", "危機克服", "光速投球", "魔球大師", "左打殺手", "右打殺手", "鋼鐵人", "老謀深算", "強心臟", "冰凍"],
+    SkillTier.SILVER: ["強力投手", "控球藝術家", "強打殺手", "國寶投手", "逆轉大師", "狙擊手", "野戰指揮", "投球機器", "布局", "乘勝追擊", "救火隊", "安全感", "調整節奏"],
+    SkillTier.GOLD: ["決勝球", "巨人殺手", "自我解決", "大吃局數", "王牌", "最後大魔王", "無法觸碰", "門志", "技巧派投手", "壓倒性投手", "王牌終結者", "滾地球投手", "交錯之火", "投球協調者"],
+    SkillTier.LEGEND: ["投手洞察力", "精準控球", "速球型投手", "先守後攻", "牛棚日", "合力投球", "投手默契", "工作馬", "完美先生"]
+}
+
+# 變更券類型
+TICKET_TYPES = [
+    "技能變更券", "高級技能變更券", "最高級技能變更券", "傳說技能變更券",
+    "傳說技能選擇變更券", "技能變更保護券", "技能選擇變更券"
+]
+
+# 技能階級編號，批次結果中的 tiers 陣列使用此順序，-1 代表空技能槽
+TIER_ORDER = [SkillTier.BRONZE, SkillTier.SILVER, SkillTier.GOLD, SkillTier.LEGEND]
+
+# 技能目錄：啟動時為每個 (球員類型, 階級, 技能名稱) 編號，
+# 並為每個 (編號, 等級) 預先建立共用的 Skill 物件，模擬時不再產生新物件
+class SkillCatalog:
+    def __init__(self, player_type, skills_db):
+        self.player_type = player_type
+        self.names = []
+        self.tiers = []
+        self.tier_ranges = {}
+        for tier in TIER_ORDER:
+            start = len(self.names)
+            self.names.extend(skills_db[tier])
+            self.tiers.extend([tier] * len(skills_db[tier]))
+            self.tier_ranges[tier] = (start, len(self.names))
+        self.ids = {(name, tier): skill_id for skill_id, (name, tier) in enumerate(zip(self.names, self.tiers))}
+        self.tier_codes = np.array([TIER_ORDER.index(tier) for tier in self.tiers], dtype=np.int8)
+        # 一般技能池為黃銅、炫銀、炫金，編號連續排在傳說技能之前
+        self.pool_size = self.tier_ranges[SkillTier.GOLD][1]
+        self._skills = [
+            tuple(Skill(name, tier, level, skill_id) for level in (1, 2, 3))
+            for skill_id, (name, tier) in enumerate(zip(self.names, self.tiers))
+        ]
+
+    def __len__(self):
+        return len(self.names)
+
+    def skill(self, skill_id, level):
+        return self._skills[skill_id][level - 1]
+
+    def skill_id(self, skill):
+        if skill is None:
+            return -1
+        if skill.skill_id is not None:
+            return skill.skill_id
+        return self.ids.get((skill.name, skill.tier), -1)
+
+SKILL_CATALOGS = {
+    PlayerType.BATTER: SkillCatalog(PlayerType.BATTER, BATTER_SKILLS),
+    PlayerType.PITCHER: SkillCatalog(PlayerType.PITCHER, PITCHER_SKILLS)
+}
+
+# 模擬統計：以固定長度的整數陣列累計，可整批加入、合併分段結果、快照與重置
+class SimulationStats:
+    def __init__(self, player_type):
+        self.player_type = player_type
+        self.simulation_count = 0
+        self.legend_count = 0
+        # 等級總和 3~9 的次數
+        self.level_sum_counts = np.zeros(7, dtype=np.int64)
+        # 依 TICKET_TYPES 順序的變更券使用次數
+        self.ticket_counts = np.zeros(len(TICKET_TYPES), dtype=np.int64)
+        # 各技能出現於結果中、且該次等級總和為 3~9 的次數
+        self.skill_level_sum_counts = np.zeros((len(SKILL_CATALOGS[player_type]), 7), dtype=np.int64)
+        # 產生此統計的主種子（可重現的模擬才會設定）
+        self.seed = None
+
+    @property
+    def level_sum_count(self):
+        return self.simulation_count
+
+    @property
+    def level_sum_stats(self):
+        return {level_sum: int(count) for level_sum, count in zip(range(3, 10), self.level_sum_counts)}
+
+    @property
+    def ticket_usage_stats(self):
+        return {ticket_type: int(count) for ticket_type, count in zip(TICKET_TYPES, self.ticket_counts)}
+
+    @property
+    def skill_hits(self):
+        return self.skill_level_sum_counts.sum(axis=1)
+
+    def add_tickets(self, ticket_type, count=1):
+        self.ticket_counts[TICKET_TYPES.index(ticket_type)] += count
+
+    def add_batch(self, ticket_type, skill_ids, levels, record_outcomes=True):
+        # skill_ids、levels 為 (n, 3) 陣列，-1 代表空技能槽；record_outcomes 為 False 時只累計變更券使用次數
+        skill_ids = np.asarray(skill_ids, dtype=np.int64).reshape(-1, 3)
+        levels = np.asarray(levels, dtype=np.int64).reshape(-1, 3)
+        n = len(skill_ids)
+        self.add_tickets(ticket_type, n)
+        if not record_outcomes:
+            return
+        catalog = SKILL_CATALOGS[self.player_type]
+        self.simulation_count += n
+        self.legend_count += int((skill_ids[:, 0] >= catalog.tier_ranges[SkillTier.LEGEND][0]).sum())
+        level_sums = levels.sum(axis=1)
+        in_range = (level_sums >= 3) & (level_sums <= 9)
+        self.level_sum_counts += np.bincount(level_sums[in_range] - 3, minlength=7)
+        present = (skill_ids >= 0) & in_range[:, None]
+        cells = (skill_ids * 7 + (level_sums - 3)[:, None])[present]
+        self.skill_level_sum_counts += np.bincount(cells, minlength=self.skill_level_sum_counts.size).reshape(self.skill_level_sum_counts.shape)
+
+    def add_skills(self, ticket_type, skills, record_outcomes=True):
+        catalog = SKILL_CATALOGS[self.player_type]
+        self.add_batch(
+            ticket_type,
+            [catalog.skill_id(skill) for skill in skills],
+            [skill.level if skill else 0 for skill in skills],
+            record_outcomes
+        )
+
+    @property
+    def draw_count(self):
+        # 實際抽取次數：不計入結果統計的變更券也會累計使用次數
+        return int(self.ticket_counts.sum())
+
+    def merge(self, other):
+        self.simulation_count += other.simulation_count
+        self.legend_count += other.legend_count
+        self.level_sum_counts += other.level_sum_counts
+        self.ticket_counts += other.ticket_counts
+        self.skill_level_sum_counts += other.skill_level_sum_counts
+        return self
+
+    def snapshot(self):
+        stats = SimulationStats(self.player_type)
+        stats.merge(self)
+        stats.seed = self.seed
+        return stats
+
+    def reset(self):
+        self.simulation_count = 0
+        self.legend_count = 0
+        self.level_sum_counts[:] = 0
+        self.ticket_counts[:] = 0
+        self.skill_level_sum_counts[:] = 0
+
+    def to_state(self):
+        # 可還原的完整內容（含各技能的計數），供快取與檢查點使用
+        return {
+            "player_type": self.player_type.value,
+            "simulation_count": self.simulation_count,
+            "legend_count": self.legend_count,
+            "level_sum_counts": self.level_sum_counts.copy(),
+            "ticket_counts": self.ticket_counts.copy(),
+            "skill_level_sum_counts": self.skill_level_sum_counts.copy(),
+            "seed": self.seed
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls(PlayerType(str(state["player_type"])))
+        stats.simulation_count = int(state["simulation_count"])
+        stats.legend_count = int(state["legend_count"])
+        stats.level_sum_counts[:] = state["level_sum_counts"]
+        stats.ticket_counts[:] = state["ticket_counts"]
+        stats.skill_level_sum_counts[:] = state["skill_level_sum_counts"]
+        stats.seed = None if state["seed"] is None else int(state["seed"])
+        return stats
+
+    def to_dict(self):
+        return {
+            "player_type": self.player_type.value,
+            "simulation_count": self.simulation_count,
+            "legend_count": self.legend_count,
+            "level_sum_stats": self.level_sum_stats,
+            "ticket_usage_stats": self.ticket_usage_stats,
+            "seed": self.seed
+        }
+
+# 機率表
+PROBABILITIES = {
+    PlayerType.BATTER: {
+        "base": [2.6316 / 100, 2.7027 / 100, 2.7778 / 100],
+        "legend_first": [1.0, 2.6316 / 100, 2.7027 / 100],
+        "legend_held": [2.7778 / 100, 2.8571 / 100],
+        "no_legend_held": [2.8571 / 100, 2.9412 / 100]
+    },
+    PlayerType.PITCHER: {
+        "base": [2.5641 / 100, 2.6316 / 100, 2.7027 / 100],
+        "legend_first": [1.0, 2.5641 / 100, 2.6316 / 100],
+        "legend_held": [2.7027 / 100, 2.7778 / 100],
+        "no_legend_held": [2.7778 / 100, 2.8571 / 100]
+    }
+}
+
+# 傳說技能出現機率
+LEGEND_PROBABILITIES = {
+    "傳說卡": {
+        "高級技能變更券": 0.20,
+        "最高級技能變更券": 0.25,
+        "傳說技能變更券": 1.00,
+        "傳說技能選擇變更券": 1.00,
+    },
+    "其他卡": {
+        "高級技能變更券": 0.10,
+        "最高級技能變更券": 0.15,
+        "傳說技能變更券": 1.00,
+        "傳說技能選擇變更券": 1.00,
+    }
+}
+
+# 技能等級機率
+LEVEL_PROB = {"等級1": 0.34, "等級2": 0.33, "等級3": 0.33}
+
+# 精確機率計算：由 PROBABILITIES、LEGEND_PROBABILITIES、LEVEL_PROB 推導，結果依設定快取
+REROLL_TICKET_TYPES = ["技能變更券", "高級技能變更券", "最高級技能變更券", "傳說技能變更券"]
+
+def _check_reroll_ticket(ticket_type):
+    if ticket_type not in TICKET_TYPES:
+        raise ValueError("未知的變更券類型")
+    if ticket_type not in REROLL_TICKET_TYPES:
+        raise ValueError("此變更券的結果取決於目前技能，無法直接計算機率")
+
+# 參數化計算：等級機率可為任意形狀的陣列（最後一維為等級 1~3），整組參數格點一次以陣列運算求值
+# 27 種等級組合對應的總和索引（0 對應總和 3）
+_LEVEL_SUM_MATRIX = np.array([[sum(triple) == index for index in range(7)] for triple in itertools.product(range(3), repeat=3)], dtype=np.float64)
+
+def level_sum_probs_from(level_probs, super_levels=False):
+    single = np.asarray(level_probs, dtype=np.float64)
+    single = single / single.sum(axis=-1, keepdims=True)
+    # 三個技能槽等級獨立，總和分布為單槽分布的三重卷積
+    joint = single[..., :, None, None] * single[..., None, :, None] * single[..., None, None, :]
+    probs = joint.reshape(single.shape[:-1] + (27,)) @ _LEVEL_SUM_MATRIX
+    if super_levels:
+        # 總和未達 5 時重抽，相當於以總和至少為 5 為條件
+        probs[..., :2] = 0.0
+        probs = probs / probs.sum(axis=-1, keepdims=True)
+    return probs
+
+def legend_rate_from(legend_prob, level_probs=None, retry_legend_prob=None):
+    # 指定 retry_legend_prob 時為最高級技能變更券（非傳說卡）：第一次抽取通過時使用 legend_prob，重抽則使用 retry_legend_prob
+    legend_prob = np.asarray(legend_prob, dtype=np.float64)
+    if retry_legend_prob is None:
+        return legend_prob
+    accept = level_sum_probs_from(level_probs)[..., 2:].sum(axis=-1)
+    return accept * legend_prob + (1 - accept) * np.asarray(retry_legend_prob, dtype=np.float64)
+
+@functools.lru_cache(maxsize=None)
+def _level_sum_probs(ticket_type, is_legend):
+    if is_legend:
+        return (0.0,) * 6 + (1.0,)
+    probs = level_sum_probs_from([LEVEL_PROB["等級1"], LEVEL_PROB["等級2"], LEVEL_PROB["等級3"]], ticket_type == "最高級技能變更券")
+    return tuple(float(p) for p in probs)
+
+def level_sum_distribution(ticket_type, is_legend):
+    _check_reroll_ticket(ticket_type)
+    return dict(zip(range(3, 10), _level_sum_probs(ticket_type, is_legend)))
+
+@functools.lru_cache(maxsize=None)
+def legend_rate(ticket_type, is_legend):
+    _check_reroll_ticket(ticket_type)
+    card_type = "傳說卡" if is_legend else "其他卡"
+    legend_prob = LEGEND_PROBABILITIES[card_type].get(ticket_type, 0.0)
+    if ticket_type == "最高級技能變更券" and not is_legend:
+        # 第一次抽取通過時使用最高級的機率，重抽則以高級技能變更券的機率計算
+        level_probs = [LEVEL_PROB["等級1"], LEVEL_PROB["等級2"], LEVEL_PROB["等級3"]]
+        return float(legend_rate_from(legend_prob, level_probs, LEGEND_PROBABILITIES[card_type]["高級技能變更券"]))
+    return legend_prob
+
+@functools.lru_cache(maxsize=None)
+def exact_distribution(player_type, is_legend, ticket_type):
+    _check_reroll_ticket(ticket_type)
+    catalog = SKILL_CATALOGS[player_type]
+    pool_size = catalog.pool_size
+    gold_start, gold_stop = catalog.tier_ranges[SkillTier.GOLD]
+    legend_start, legend_stop = catalog.tier_ranges[SkillTier.LEGEND]
+    gold_count = gold_stop - gold_start
+    rate = legend_rate(ticket_type, is_legend)
+
+    # slot_probs[slot, skill_id] 為該技能出現在該技能槽的機率
+    slot_probs = np.zeros((3, len(catalog)))
+    if ticket_type == "技能變更券":
+        slot_probs[:, :pool_size] = 1.0 / pool_size
+    else:
+        slot_probs[0, legend_start:legend_stop] = rate / (legend_stop - legend_start)
+        slot_probs[0, gold_start:gold_stop] = (1 - rate) / gold_count
+        # 技能槽 2、3 可互換：出現傳說技能時從完整技能池抽取，否則從移除炫金保底後的技能池抽取
+        slot_probs[1:, :pool_size] = rate / pool_size + (1 - rate) / (pool_size - 1)
+        slot_probs[1:, gold_start:gold_stop] = rate / pool_size + (1 - rate) * (1 - 1 / gold_count) / (pool_size - 1)
+    slot_probs.flags.writeable = False
+
+    level_sum = level_sum_distribution(ticket_type, is_legend)
+    return {
+        "legend_rate": rate,
+        "level_sum": level_sum,
+        "expected_level_sum": sum(total * prob for total, prob in level_sum.items()),
+        "slot_probs": slot_probs
+    }
+
+# 機率表敏感度分析：對等級機率（權重，會正規化）與傳說技能機率指定數值格點，一次求出每個格點的
+# 傳說技能機率、期望等級總和，以及重複使用同一種變更券直到第一技能槽出現傳說技能的期望張數（幾何分布）；
+# PROBABILITIES 為由技能池大小推導的公告數值，不影響這些指標，因此不列入參數
+# legend_prob 為該變更券在此卡片類型的傳說技能機率，retry_legend_prob 只用於最高級技能變更券（非傳說卡）的重抽
+SWEEP_PARAMETERS = ("等級1", "等級2", "等級3", "legend_prob", "retry_legend_prob")
+
+def sweep_parameters(ticket_type, is_legend, grid):
+    _check_reroll_ticket(ticket_type)
+    unknown = set(grid) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"未知的參數：{'、'.join(sorted(unknown))}")
+    if ticket_type == "技能變更券" and "legend_prob" in grid:
+        raise ValueError("技能變更券不會出現傳說技能")
+    super_levels = ticket_type == "最高級技能變更券" and not is_legend
+    if "retry_legend_prob" in grid and not super_levels:
+        raise ValueError("只有最高級技能變更券（非傳說卡）會重抽，retry_legend_prob 不適用")
+    if is_legend and set(grid) & {"等級1", "等級2", "等級3"}:
+        raise ValueError("傳說卡的技能等級固定為 3，等級機率不適用")
+    card_type = "傳說卡" if is_legend else "其他卡"
+    values = dict(LEVEL_PROB)
+    values["legend_prob"] = LEGEND_PROBABILITIES[card_type].get(ticket_type, 0.0)
+    values["retry_legend_prob"] = LEGEND_PROBABILITIES[card_type]["高級技能變更券"]
+
+    names = [name for name in SWEEP_PARAMETERS if name in grid]
+    axes = [np.asarray(grid[name], dtype=np.float64).ravel() for name in names]
+    for name, axis in zip(names, axes):
+        if not axis.size:
+            raise ValueError(f"參數 {name} 沒有數值")
+        if axis.min() < 0 or (name in ("legend_prob", "retry_legend_prob") and axis.max() > 1):
+            raise ValueError(f"參數 {name} 超出範圍")
+    values.update(zip(names, np.meshgrid(*axes, indexing="ij")))
+    shape = tuple(axis.size for axis in axes)
+    level_probs = np.stack([np.broadcast_to(values[name], shape) for name in ("等級1", "等級2", "等級3")], axis=-1)
+    if (level_probs.sum(axis=-1) <= 0).any():
+        raise ValueError("等級機率總和必須大於 0")
+
+    if is_legend:
+        level_sum_probs = np.zeros(shape + (7,))
+        level_sum_probs[..., 6] = 1.0
+    else:
+        level_sum_probs = level_sum_probs_from(level_probs, super_levels)
+    if ticket_type == "技能變更券":
+        rate = np.zeros(shape)
+    else:
+        rate = np.broadcast_to(legend_rate_from(
+            values["legend_prob"], level_probs,
+            values["retry_legend_prob"] if super_levels else None
+        ), shape)
+    with np.errstate(divide="ignore"):
+        expected_tickets = np.where(rate > 0, 1.0 / np.where(rate > 0, rate, 1.0), np.inf)
+    return {
+        "ticket_type": ticket_type,
+        "is_legend": is_legend,
+        "parameters": names,
+        "axes": {name: axis for name, axis in zip(names, axes)},
+        "legend_rate": rate,
+        "expected_level_sum": level_sum_probs @ np.arange(3, 10),
+        "expected_tickets_to_legend": expected_tickets,
+        "level_sum_probs": level_sum_probs
+    }
+
+# 技能等級總和機率（普通情況）
+LEVEL_SUM_PROB_DEFAULT = level_sum_distribution("技能變更券", False)
+
+# 技能等級總和機率（最高級技能變更券，總和至少為 5）
+LEVEL_SUM_PROB_SUPER = level_sum_distribution("最高級技能變更券", False)
+
+# 系統模擬次數上限：批次與串流模擬的記憶體用量固定，上限僅作為防呆，可由環境變數 MLB_SIM_MAX_LIMIT 調整；
+# 匯入時讀取，數值無效時不中斷匯入（圖形介面、命令列與服務都會匯入本模組），改用預設值並提出警告
+DEFAULT_MAX_SIMULATION_LIMIT = 10 ** 8
+
+def _env_simulation_limit(default=DEFAULT_MAX_SIMULATION_LIMIT):
+    text = os.environ.get("MLB_SIM_MAX_LIMIT")
+    if text is None:
+        return default
+    try:
+        value = float(text)
+    except ValueError:
+        value = math.nan
+    if not value.is_integer() or value <= 0:
+        print(f"警告：MLB_SIM_MAX_LIMIT={text!r} 不是正整數，改用預設值 {default}", file=sys.stderr)
+        return default
+    return int(value)
+
+MAX_SIMULATION_LIMIT = _env_simulation_limit()
+
+# 計入傳說技能與等級總和統計的變更券
+STATS_TICKET_TYPES = ["高級技能變更券", "最高級技能變更券"]
+
+# 一鍵模擬多次：背景執行緒每次處理的試驗數，以及介面更新間隔（毫秒）
+SIMULATION_CHUNK_SIZE = 4096
+SIMULATION_REFRESH_MS = 100
+
+# 效能量測：預設關閉，關閉時 phase() 回傳共用的空 context manager，熱點只多一次布林判斷；
+# 開啟後記錄各階段的次數與耗時、各變更券的抽取次數與耗時，以及最高級技能變更券第一次抽取未通過的次數
+# （等同原本重抽迴圈中至少重抽一次的次數）。多行程模擬只量測主行程內的工作
+_NO_PHASE = contextlib.nullcontext()
+
+class _PhaseTimer:
+    __slots__ = ("instrumentation", "name", "start")
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.add_time(self.name, time.perf_counter() - self.start)
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phases = collections.defaultdict(lambda: [0, 0.0])
+            self.tickets = collections.defaultdict(lambda: [0, 0.0])
+            self.super_rejections = 0
+            self.super_draws = 0
+            self.started = time.perf_counter()
+
+    def enable(self):
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def phase(self, name):
+        return _PhaseTimer(self, name) if self.enabled else _NO_PHASE
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            entry = self.phases[name]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_draws(self, ticket_type, count, seconds):
+        with self._lock:
+            entry = self.tickets[ticket_type]
+            entry[0] += count
+            entry[1] += seconds
+
+    def add_super_draws(self, count, rejected):
+        with self._lock:
+            self.super_draws += count
+            self.super_rejections += rejected
+
+    def snapshot(self):
+        with self._lock:
+            accept = _super_level_table()[2]
+            return {
+                "enabled": self.enabled,
+                "elapsed_seconds": time.perf_counter() - self.started,
+                "phases": {
+                    name: {"count": count, "seconds": seconds, "mean_ms": seconds / count * 1000 if count else 0.0}
+                    for name, (count, seconds) in self.phases.items()
+                },
+                "tickets": {
+                    ticket_type: {"draws": count, "seconds": seconds, "draws_per_sec": count / seconds if seconds else 0.0}
+                    for ticket_type, (count, seconds) in self.tickets.items()
+                },
+                "super_draws": self.super_draws,
+                "super_first_rejected": self.super_rejections,
+                # 原本的重抽迴圈在第一次未通過後，平均還要再抽 1 / accept 次
+                "super_retries_expected": self.super_rejections / accept
+            }
+
+INSTRUMENTATION = Instrumentation()
+
+# 別名表（Walker alias method）：建表一次後，每次抽樣只需一個均勻亂數與一次比較；
+# 同時提供逐次（random 模組）與向量化（NumPy Generator）兩種抽樣
+class AliasTable:
+    def __init__(self, weights, values=None):
+        weights = np.asarray(weights, dtype=float)
+        size = len(weights)
+        scaled = weights * size / weights.sum()
+        prob = np.ones(size)
+        alias = np.arange(size)
+        small = [i for i in range(size) if scaled[i] < 1]
+        large = [i for i in range(size) if scaled[i] >= 1]
+        while small and large:
+            i = small.pop()
+            j = large.pop()
+            prob[i] = scaled[i]
+            alias[i] = j
+            scaled[j] -= 1 - scaled[i]
+            (small if scaled[j] < 1 else large).append(j)
+        self.size = size
+        self.prob = prob
+        self.values = np.arange(size) if values is None else np.asarray(values)
+        self.alias_values = self.values[alias]
+        # 逐次抽樣使用 Python 串列，避免 NumPy 純量的額外成本
+        self._prob = prob.tolist()
+        self._values = self.values.tolist()
+        self._alias_values = self.alias_values.tolist()
+
+    def sample(self):
+        u = random.random() * self.size
+        i = int(u)
+        return self._values[i] if u - i < self._prob[i] else self._alias_values[i]
+
+    def sample_batch(self, shape, rng):
+        u = rng.random(shape) * self.size
+        i = u.astype(np.intp)
+        return np.where(u - i < self.prob[i], self.values[i], self.alias_values[i])
+
+LEVEL_SAMPLER = AliasTable([LEVEL_PROB["等級1"], LEVEL_PROB["等級2"], LEVEL_PROB["等級3"]], values=[1, 2, 3])
+
+def get_skill_level(is_legend_player):
+    if is_legend_player:
+        return 3
+    return LEVEL_SAMPLER.sample()
+
+# 最高級技能變更券直接抽樣表：等級組合以總和至少為 5 為條件的分布（別名表抽取組合編號），
+# 以及第一次抽取即通過的機率（決定傳說技能機率使用最高級或高級的數值）
+@functools.lru_cache(maxsize=None)
+def _super_level_table():
+    single = [LEVEL_PROB["等級1"], LEVEL_PROB["等級2"], LEVEL_PROB["等級3"]]
+    total = sum(single)
+    triples = [levels for levels in itertools.product((1, 2, 3), repeat=3) if sum(levels) >= 5]
+    weights = [
+        single[a - 1] * single[b - 1] * single[c - 1] / total ** 3
+        for a, b, c in triples
+    ]
+    return triples, AliasTable(weights), sum(weights)
+
+def _draw_super_levels():
+    triples, table, accept = _super_level_table()
+    first_accepted = random.random() < accept
+    return triples[table.sample()], first_accepted
+
+def _draw_distinct(start, stop, taken):
+    # 不放回抽樣：先在未選的技能中抽名次，再依序跳過已選的技能
+    excluded = sorted({skill_id - start for skill_id in taken if start <= skill_id < stop})
+    draw = int(random.random() * (stop - start - len(excluded)))
+    for skill_id in excluded:
+        if draw >= skill_id:
+            draw += 1
+    return start + draw
+
+def simulate_skill_change(player, ticket_type, protected_slot=None):
+    catalog = SKILL_CATALOGS[player.player_type]
+    pool_size = catalog.pool_size
+    is_legend = player.is_legend
+
+    if ticket_type in REROLL_TICKET_TYPES:
+        skill_ids, levels = ticket_sampler(player.player_type, is_legend, ticket_type).sample()
+        return [catalog.skill(skill_id, level) for skill_id, level in zip(skill_ids, levels)]
+
+    elif ticket_type == "傳說技能選擇變更券":
+        if not player.has_legend_skill():
+            raise ValueError("必須至少有一個傳說技能才能使用此變更券")
+
+        # 找到第一個傳說技能的槽位
+        legend_slot = None
+        for slot in range(3):
+            if player.is_legend_skill_in_slot(slot):
+                legend_slot = slot
+                break
+
+        if legend_slot is None:
+            raise ValueError("未找到傳說技能，無法使用此變更券")
+
+        # 保留原始技能
+        selected_skills = player.skills.copy()
+
+        # 只對第一個傳說技能的槽位進行變更，並保留原始等級
+        current_skill = selected_skills[legend_slot]
+        skill_id = _draw_distinct(*catalog.tier_ranges[SkillTier.LEGEND], (catalog.skill_id(current_skill),))
+        selected_skills[legend_slot] = catalog.skill(skill_id, current_skill.level)
+        return selected_skills
+
+    elif ticket_type == "技能變更保護券":
+        if protected_slot is None:
+            raise ValueError("必須指定保護的技能槽")
+        selected_skills = [None, None, None]
+        taken = []
+        if player.skills[protected_slot]:
+            selected_skills[protected_slot] = player.skills[protected_slot]
+            taken.append(catalog.skill_id(player.skills[protected_slot]))
+        for slot in range(3):
+            if slot == protected_slot:
+                continue
+            skill_id = _draw_distinct(0, pool_size, taken)
+            taken.append(skill_id)
+            level = 3 if is_legend else (player.skills[slot].level if player.skills[slot] else get_skill_level(is_legend))
+            selected_skills[slot] = catalog.skill(skill_id, level)
+        return selected_skills
+
+    elif ticket_type == "技能選擇變更券":
+        selected_slot = protected_slot if protected_slot is not None else random.randint(0, 2)
+        selected_skills = player.skills.copy()
+        current_skill = selected_skills[selected_slot]
+        # 空技能槽視為臨時技能，臨時技能不在技能池中，等級沿用臨時技能的等級
+        current_level = current_skill.level if current_skill else get_skill_level(is_legend)
+        skill_id = _draw_distinct(0, pool_size, (catalog.skill_id(current_skill),))
+        level = 3 if is_legend else current_level
+        selected_skills[selected_slot] = catalog.skill(skill_id, level)
+        return selected_skills
+
+    else:
+        raise ValueError("未知的變更券類型")
+
+# 批次模擬引擎（NumPy 向量化）
+# 等級只有三種結果，向量化抽樣直接與兩個累積門檻比較，比別名表的索引查詢更快
+_LEVEL_THRESHOLDS = np.cumsum([LEVEL_PROB["等級1"], LEVEL_PROB["等級2"]]) / sum(LEVEL_PROB.values())
+
+def _draw_levels_batch(is_legend_player, shape, rng):
+    if is_legend_player:
+        return np.full(shape, 3, dtype=np.int8)
+    u = rng.random(shape)
+    return (1 + (u >= _LEVEL_THRESHOLDS[0]) + (u >= _LEVEL_THRESHOLDS[1])).astype(np.int8)
+
+def _draw_excluding(size, excluded, rng=None, uniforms=None):
+    # 從 [0, size) 均勻抽取，排除每列 excluded 中的編號（-1 代表不排除），
+    # 先抽名次再依序跳過已排除的編號，等同於不放回抽樣；指定 uniforms 時由 [0, 1) 均勻亂數換算名次
+    excluded = np.where((excluded >= 0) & (excluded < size), excluded, size)
+    remaining = size - (excluded < size).sum(axis=1)
+    if uniforms is None:
+        draw = rng.integers(0, remaining)
+    else:
+        draw = np.minimum((uniforms * remaining).astype(np.int64), remaining - 1)
+    for column in np.sort(excluded, axis=1).T:
+        draw += draw >= column
+    return draw
+
+def _reroll_ids_batch(catalog, legend_prob, n, rng):
+    # legend_prob 為 None 代表技能變更券（三個技能槽皆從技能池抽取），也可為每列不同機率的陣列
+    pool_size = catalog.pool_size
+    ids = np.empty((n, 3), dtype=np.int16)
+    if legend_prob is None:
+        ids[:, 0] = rng.integers(0, pool_size, n)
+        excluded = ids[:, 0].astype(np.int64)
+    else:
+        legend_start, legend_stop = catalog.tier_ranges[SkillTier.LEGEND]
+        gold_start, gold_stop = catalog.tier_ranges[SkillTier.GOLD]
+        is_legend_skill = rng.random(n) < legend_prob
+        ids[:, 0] = np.where(
+            is_legend_skill,
+            rng.integers(legend_start, legend_stop, n),
+            rng.integers(gold_start, gold_stop, n)
+        )
+        # 傳說技能不在一般技能池中，只有炫金保底才需要從技能池移除
+        excluded = np.where(is_legend_skill, -1, ids[:, 0])
+    ids[:, 1] = _draw_excluding(pool_size, excluded[:, None], rng)
+    ids[:, 2] = _draw_excluding(pool_size, np.stack([excluded, ids[:, 1]], axis=1), rng)
+    return ids
+
+@functools.lru_cache(maxsize=None)
+def _super_level_array():
+    return np.array(_super_level_table()[0], dtype=np.int8)
+
+def _draw_super_levels_batch(n, rng):
+    _, table, accept = _super_level_table()
+    first_accepted = rng.random(n) < accept
+    return _super_level_array()[table.sample_batch(n, rng)], first_accepted
+
+# 重抽型變更券抽樣器：每種 (球員類型, 卡片類型, 變更券) 建立一次並快取，
+# 第一技能槽（傳說技能或炫金保底）與等級使用別名表，技能槽 2、3 以名次跳過法不放回抽取
+class TicketSampler:
+    def __init__(self, player_type, is_legend, ticket_type):
+        _check_reroll_ticket(ticket_type)
+        self.catalog = SKILL_CATALOGS[player_type]
+        self.is_legend = is_legend
+        self.ticket_type = ticket_type
+        self.pool_size = self.catalog.pool_size
+        self.super_levels = ticket_type == "最高級技能變更券" and not is_legend
+        card_type = "傳說卡" if is_legend else "其他卡"
+        self.first_skill = self._first_skill_table(LEGEND_PROBABILITIES[card_type].get(ticket_type))
+        # 最高級技能變更券第一次抽取未通過時，傳說技能機率為高級技能變更券的數值
+        self.retry_first_skill = self._first_skill_table(LEGEND_PROBABILITIES[card_type]["高級技能變更券"]) if self.super_levels else None
+
+    def _first_skill_table(self, legend_prob):
+        weights = np.zeros(len(self.catalog))
+        if self.ticket_type == "技能變更券":
+            weights[:self.pool_size] = 1.0
+        else:
+            legend_start, legend_stop = self.catalog.tier_ranges[SkillTier.LEGEND]
+            gold_start, gold_stop = self.catalog.tier_ranges[SkillTier.GOLD]
+            weights[legend_start:legend_stop] = legend_prob / (legend_stop - legend_start)
+            weights[gold_start:gold_stop] = (1 - legend_prob) / (gold_stop - gold_start)
+        return AliasTable(weights)
+
+    def sample(self):
+        # 回傳 ((技能編號 x3), (等級 x3))
+        if self.super_levels:
+            levels, first_accepted = _draw_super_levels()
+            if INSTRUMENTATION.enabled:
+                INSTRUMENTATION.add_super_draws(1, not first_accepted)
+            first = (self.first_skill if first_accepted else self.retry_first_skill).sample()
+        else:
+            levels = (get_skill_level(self.is_legend), get_skill_level(self.is_legend), get_skill_level(self.is_legend))
+            first = self.first_skill.sample()
+        # 傳說技能不在一般技能池中，只有從技能池抽出的技能需要排除
+        taken = [first] if first < self.pool_size else []
+        second = _draw_distinct(0, self.pool_size, taken)
+        taken.append(second)
+        third = _draw_distinct(0, self.pool_size, taken)
+        return (first, second, third), levels
+
+    def sample_batch(self, n, rng):
+        # 回傳 (技能編號 (n, 3) int16, 等級 (n, 3) int8)
+        ids = np.empty((n, 3), dtype=np.int16)
+        if self.super_levels:
+            levels, first_accepted = _draw_super_levels_batch(n, rng)
+            if INSTRUMENTATION.enabled:
+                INSTRUMENTATION.add_super_draws(n, n - int(first_accepted.sum()))
+            ids[:, 0] = np.where(
+                first_accepted,
+                self.first_skill.sample_batch(n, rng),
+                self.retry_first_skill.sample_batch(n, rng)
+            )
+        else:
+            levels = _draw_levels_batch(self.is_legend, (n, 3), rng)
+            ids[:, 0] = self.first_skill.sample_batch(n, rng)
+        excluded = np.where(ids[:, 0] < self.pool_size, ids[:, 0], -1).astype(np.int64)
+        ids[:, 1] = _draw_excluding(self.pool_size, excluded[:, None], rng)
+        ids[:, 2] = _draw_excluding(self.pool_size, np.stack([excluded, ids[:, 1]], axis=1), rng)
+        return ids, levels
+
+@functools.lru_cache(maxsize=None)
+def ticket_sampler(player_type, is_legend, ticket_type):
+    return TicketSampler(player_type, is_legend, ticket_type)
+
+def _super_reroll_by_rejection(catalog, n, rng):
+    # 原本的重抽規則（非傳說卡）：總和未達 5 時以高級技能變更券整組重抽，僅供驗證直接抽樣使用
+    legend_probs = LEGEND_PROBABILITIES["其他卡"]
+    ids = _reroll_ids_batch(catalog, legend_probs["最高級技能變更券"], n, rng)
+    levels = _draw_levels_batch(False, (n, 3), rng)
+    retry = np.flatnonzero(levels.sum(axis=1) < 5)
+    while retry.size:
+        ids[retry] = _reroll_ids_batch(catalog, legend_probs["高級技能變更券"], retry.size, rng)
+        levels[retry] = _draw_levels_batch(False, (retry.size, 3), rng)
+        retry = retry[levels[retry].sum(axis=1) < 5]
+    return ids, levels
+
+def player_state_arrays(player):
+    if isinstance(player, PlayerView):
+        return player.skill_ids.copy(), player.levels.copy()
+    catalog = SKILL_CATALOGS[player.player_type]
+    skill_ids = np.full(3, -1, dtype=np.int16)
+    levels = np.zeros(3, dtype=np.int8)
+    for slot, skill in enumerate(player.skills):
+        if skill:
+            skill_ids[slot] = catalog.skill_id(skill)
+            levels[slot] = skill.level
+    return skill_ids, levels
+
+def skills_from_arrays(player_type, skill_ids, levels):
+    catalog = SKILL_CATALOGS[player_type]
+    return [
+        catalog.skill(skill_id, level) if skill_id >= 0 else None
+        for skill_id, level in zip(skill_ids, levels)
+    ]
+
+def simulate_skill_change_batch(player_type, is_legend, ticket_type, n, rng=None, protected_slot=None, skill_ids=None, levels=None):
+    if ticket_type not in TICKET_TYPES:
+        raise ValueError("未知的變更券類型")
+    if rng is None:
+        rng = np.random.default_rng()
+    catalog = SKILL_CATALOGS[player_type]
+    pool_size = catalog.pool_size
+
+    if ticket_type in REROLL_TICKET_TYPES:
+        new_ids, new_levels = ticket_sampler(player_type, is_legend, ticket_type).sample_batch(n, rng)
+
+    else:
+        if skill_ids is None:
+            skill_ids = np.full(3, -1, dtype=np.int16)
+        if levels is None:
+            levels = np.zeros(3, dtype=np.int8)
+        new_ids = np.broadcast_to(np.asarray(skill_ids, dtype=np.int16), (n, 3)).copy()
+        new_levels = np.broadcast_to(np.asarray(levels, dtype=np.int8), (n, 3)).copy()
+        rows = np.arange(n)
+
+        if ticket_type == "傳說技能選擇變更券":
+            legend_start, legend_stop = catalog.tier_ranges[SkillTier.LEGEND]
+            is_legend_skill = new_ids >= legend_start
+            if not is_legend_skill.any(axis=1).all():
+                raise ValueError("必須至少有一個傳說技能才能使用此變更券")
+            # 只變更第一個傳說技能的槽位，並保留原始等級
+            legend_slot = is_legend_skill.argmax(axis=1)
+            current = new_ids[rows, legend_slot].astype(np.int64) - legend_start
+            new_ids[rows, legend_slot] = legend_start + _draw_excluding(legend_stop - legend_start, current[:, None], rng)
+
+        elif ticket_type == "技能變更保護券":
+            if protected_slot is None:
+                raise ValueError("必須指定保護的技能槽")
+            excluded = [new_ids[:, protected_slot].astype(np.int64)]
+            for slot in range(3):
+                if slot == protected_slot:
+                    continue
+                if not is_legend:
+                    new_levels[:, slot] = np.where(
+                        new_ids[:, slot] >= 0,
+                        new_levels[:, slot],
+                        _draw_levels_batch(is_legend, n, rng)
+                    )
+                else:
+                    new_levels[:, slot] = 3
+                new_ids[:, slot] = _draw_excluding(pool_size, np.stack(excluded, axis=1), rng)
+                excluded.append(new_ids[:, slot].astype(np.int64))
+
+        else:
+            if protected_slot is not None:
+                selected_slot = np.full(n, protected_slot)
+            else:
+                selected_slot = rng.integers(0, 3, n)
+            current = new_ids[rows, selected_slot].astype(np.int64)
+            # 空技能槽先以臨時技能填入，臨時技能不在技能池中，等級沿用臨時技能的等級
+            current_levels = np.where(
+                current >= 0,
+                new_levels[rows, selected_slot],
+                _draw_levels_batch(is_legend, n, rng)
+            )
+            new_ids[rows, selected_slot] = _draw_excluding(pool_size, current[:, None], rng)
+            new_levels[rows, selected_slot] = 3 if is_legend else current_levels
+
+    tiers = np.where(new_ids >= 0, catalog.tier_codes[np.maximum(new_ids, 0)], -1).astype(np.int8)
+    return new_ids, tiers, new_levels
+
+# 多行程模擬：工作切成固定大小的區塊，第 i 個區塊固定使用主種子衍生的第 i 個子序列，
+# 因此同一個種子不論使用幾個行程，結果都完全相同；
+# 每個區塊算完即併入累計計數，記憶體用量與模擬次數無關
+SIMULATION_BLOCK_SIZE = 1 << 16
+
+# 長時間模擬寫入檢查點的間隔（秒）
+CHECKPOINT_INTERVAL = 30.0
+
+def _block_seed(seed_seq, index):
+    return np.random.SeedSequence(seed_seq.entropy, spawn_key=seed_seq.spawn_key + (index,))
+
+def _block_sizes(n, block_size):
+    for _ in range(n // block_size):
+        yield block_size
+    if n % block_size:
+        yield n % block_size
+
+def _draw_block(task):
+    player_type, is_legend, ticket_type, size, seed_seq, protected_slot, skill_ids, levels = task
+    rng = np.random.default_rng(seed_seq)
+    start = time.perf_counter() if INSTRUMENTATION.enabled else None
+    new_ids, _, new_levels = simulate_skill_change_batch(
+        player_type, is_legend, ticket_type, size, rng,
+        protected_slot=protected_slot, skill_ids=skill_ids, levels=levels
+    )
+    if start is not None:
+        INSTRUMENTATION.add_draws(ticket_type, size, time.perf_counter() - start)
+    return new_ids, new_levels
+
+def _block_stats(player_type, ticket_type, skill_ids, levels):
+    # 所有模擬入口共用的統計規則：只有 STATS_TICKET_TYPES 計入傳說技能與等級總和，其他變更券只累計使用次數
+    stats = SimulationStats(player_type)
+    stats.add_batch(ticket_type, skill_ids, levels, record_outcomes=ticket_type in STATS_TICKET_TYPES)
+    return stats
+
+def _run_block_with_draws(task):
+    player_type, ticket_type = task[0], task[2]
+    new_ids, new_levels = _draw_block(task)
+    with INSTRUMENTATION.phase("stats.add_batch"):
+        stats = _block_stats(player_type, ticket_type, new_ids, new_levels)
+    return stats, new_ids, new_levels
+
+def _run_block(task):
+    return _run_block_with_draws(task)[0]
+
+def _run_coalesced_block(task, sizes):
+    # 合併的請求一次抽取總次數，再依序切分成各請求的統計
+    player_type, ticket_type = task[0], task[2]
+    new_ids, new_levels = _draw_block(task)
+    return [
+        _block_stats(player_type, ticket_type, new_ids[start:stop], new_levels[start:stop])
+        for start, stop in itertools.pairwise(itertools.accumulate(sizes, initial=0))
+    ]
+
+def _iter_block_results(tasks, workers, block_function=_run_block):
+    if workers <= 1:
+        for task in tasks:
+            yield block_function(task)
+        return
+    # 同時送出的區塊數有上限，依序取回結果
+    load_runtime_modules()
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    pending = collections.deque()
+    try:
+        for task in tasks:
+            pending.append(executor.submit(block_function, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def run_simulation(player_type, is_legend, ticket_type, n, seed=None, workers=None, protected_slot=None, skill_ids=None, levels=None, block_size=SIMULATION_BLOCK_SIZE, progress=None, should_stop=None, on_block=None, history=None, checkpoint=None, checkpoint_interval=CHECKPOINT_INTERVAL, start_block=0, base_stats=None):
+    # 每次試驗都從相同的初始技能開始，彼此獨立；
+    # progress(已完成次數, 總次數) 與 on_block(區塊統計) 於每個區塊完成後呼叫，should_stop() 回傳 True 時於區塊之間停止；
+    # 指定 history（HistoryWriter）時，依試驗順序寫入每次抽取的技能與等級；
+    # 指定 checkpoint（檔案路徑）時，每隔 checkpoint_interval 秒及結束時寫入檢查點；
+    # start_block 與 base_stats 用於從檢查點接續：跳過已完成的區塊，並以已累計的統計為起點
+    if n <= 0:
+        raise ValueError("模擬次數必須大於 0")
+    if n > MAX_SIMULATION_LIMIT:
+        raise ValueError(f"模擬次數不得超過系統上限 {MAX_SIMULATION_LIMIT} 次")
+    seed_seq = np.random.SeedSequence(seed)
+    tasks = (
+        (player_type, is_legend, ticket_type, size, _block_seed(seed_seq, index), protected_slot, skill_ids, levels)
+        for index, size in itertools.islice(enumerate(_block_sizes(n, block_size)), start_block, None)
+    )
+    block_count = -(-n // block_size)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, block_count - start_block))
+
+    stats = base_stats.snapshot() if base_stats else SimulationStats(player_type)
+    stats.seed = seed_seq.entropy
+    config = {
+        "player_type": player_type.value,
+        "is_legend": bool(is_legend),
+        "ticket_type": ticket_type,
+        "n": n,
+        "seed": str(seed_seq.entropy),
+        "protected_slot": protected_slot,
+        "skill_ids": [int(skill_id) for skill_id in skill_ids] if skill_ids is not None else None,
+        "levels": [int(level) for level in levels] if levels is not None else None,
+        "block_size": block_size
+    }
+    next_block = start_block
+    saved_at = time.monotonic()
+    results = _iter_block_results(tasks, workers, _run_block if history is None else _run_block_with_draws)
+    try:
+        for result in results:
+            if history is None:
+                part = result
+            else:
+                part, new_ids, new_levels = result
+                with INSTRUMENTATION.phase("history.write"):
+                    history.write(new_ids, new_levels)
+            with INSTRUMENTATION.phase("stats.merge"):
+                stats.merge(part)
+            next_block += 1
+            if checkpoint and time.monotonic() - saved_at >= checkpoint_interval:
+                save_checkpoint(checkpoint, config, stats, next_block)
+                saved_at = time.monotonic()
+            if on_block:
+                on_block(part)
+            if progress:
+                progress(stats.draw_count, n)
+            if should_stop and should_stop():
+                break
+    finally:
+        results.close()
+    if checkpoint:
+        save_checkpoint(checkpoint, config, stats, next_block)
+    return stats
+
+# 檢查點：累計統計、下一個區塊編號與主種子存成一個小的 .npz 檔（先寫暫存檔再取代，中途當機不會留下損壞的檔案）；
+# 第 i 個區塊的亂數只由主種子與 i 決定，因此從檢查點接續的結果與不中斷執行完全相同
+def _atomic_savez(path, arrays):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    load_runtime_modules()
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def save_checkpoint(path, config, stats, next_block):
+    state = stats.to_state()
+    state["seed"] = "" if state["seed"] is None else str(state["seed"])
+    _atomic_savez(path, {
+        **state,
+        "config": json.dumps(config, ensure_ascii=False),
+        "tables": probability_table_hash(),
+        "next_block": next_block
+    })
+
+def load_checkpoint(path):
+    # 回傳 (設定, 累計統計, 下一個區塊編號)
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            state = {name: data[name] for name in data.files}
+    except (OSError, ValueError) as e:
+        raise ValueError(f"無法讀取檢查點：{e}")
+    if str(state["tables"]) != probability_table_hash():
+        raise ValueError("機率表或模擬引擎已變更，無法從此檢查點接續")
+    state["seed"] = int(state["seed"]) if str(state["seed"]) else None
+    return json.loads(str(state["config"])), SimulationStats.from_state(state), int(state["next_block"])
+
+def checkpoint_complete(config, next_block):
+    return next_block * config["block_size"] >= config["n"]
+
+def resume_simulation(path, workers=None, progress=None, should_stop=None, checkpoint_interval=CHECKPOINT_INTERVAL):
+    config, stats, next_block = load_checkpoint(path)
+    if checkpoint_complete(config, next_block):
+        return stats
+    return run_simulation(
+        PlayerType(config["player_type"]), config["is_legend"], config["ticket_type"], config["n"],
+        seed=int(config["seed"]), workers=workers, protected_slot=config["protected_slot"],
+        skill_ids=None if config["skill_ids"] is None else np.array(config["skill_ids"], dtype=np.int16),
+        levels=None if config["levels"] is None else np.array(config["levels"], dtype=np.int8),
+        block_size=config["block_size"], progress=progress, should_stop=should_stop,
+        checkpoint=path, checkpoint_interval=checkpoint_interval, start_block=next_block, base_stats=stats
+    )
+
+# 抽取歷史紀錄：每次抽取寫入 (trial, slot, skill_id, level) 四個欄位，每個欄位每個區塊一個 .npy 檔，
+# 緩衝區大小固定（chunk_trials 次試驗），寫滿即寫入磁碟，讀取端以 mmap 開啟，記憶體用量與紀錄長度無關
+HISTORY_COLUMNS = {"trial": np.int64, "slot": np.int8, "skill_id": np.int16, "level": np.int8}
+HISTORY_CHUNK_TRIALS = 1 << 18
+HISTORY_META_FILE = "history.json"
+
+class HistoryWriter:
+    def __init__(self, directory, player_type, chunk_trials=HISTORY_CHUNK_TRIALS, metadata=None):
+        if os.path.exists(os.path.join(directory, HISTORY_META_FILE)):
+            raise ValueError(f"歷史紀錄目錄已有資料：{directory}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.player_type = player_type
+        self.metadata = dict(metadata or {})
+        self.trial_count = 0
+        self.chunks = []
+        self._skill_ids = np.empty((chunk_trials, 3), dtype=np.int16)
+        self._levels = np.empty((chunk_trials, 3), dtype=np.int8)
+        self._filled = 0
+        self._write_meta(complete=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # 發生例外時保留已寫入的區塊，但標記為不完整
+        self.close(complete=exc_type is None)
+
+    def write(self, skill_ids, levels):
+        # skill_ids、levels 為 (n, 3) 陣列，依試驗順序附加
+        skill_ids = np.asarray(skill_ids).reshape(-1, 3)
+        levels = np.asarray(levels).reshape(-1, 3)
+        start = 0
+        while start < len(skill_ids):
+            count = min(len(skill_ids) - start, len(self._skill_ids) - self._filled)
+            self._skill_ids[self._filled:self._filled + count] = skill_ids[start:start + count]
+            self._levels[self._filled:self._filled + count] = levels[start:start + count]
+            self._filled += count
+            start += count
+            if self._filled == len(self._skill_ids):
+                self.flush()
+
+    def write_skills(self, skills_list):
+        catalog = SKILL_CATALOGS[self.player_type]
+        self.write(
+            [[catalog.skill_id(skill) for skill in skills] for skills in skills_list],
+            [[skill.level if skill else 0 for skill in skills] for skills in skills_list]
+        )
+
+    def flush(self):
+        if not self._filled:
+            return
+        count = self._filled
+        columns = {
+            "trial": np.repeat(np.arange(self.trial_count, self.trial_count + count, dtype=np.int64), 3),
+            "slot": np.tile(np.arange(3, dtype=np.int8), count),
+            "skill_id": self._skill_ids[:count].ravel(),
+            "level": self._levels[:count].ravel()
+        }
+        index = len(self.chunks)
+        for name, values in columns.items():
+            np.save(os.path.join(self.directory, f"{index:06d}.{name}.npy"), values.astype(HISTORY_COLUMNS[name], copy=False))
+        self.chunks.append(count * 3)
+        self.trial_count += count
+        self._filled = 0
+        self._write_meta(complete=False)
+
+    def _write_meta(self, complete):
+        meta = {
+            "player_type": self.player_type.value,
+            "columns": list(HISTORY_COLUMNS),
+            "chunks": self.chunks,
+            "trial_count": self.trial_count,
+            "complete": complete,
+            "metadata": self.metadata
+        }
+        # 每寫完一個區塊才更新索引，讀取端只會看到完整的區塊
+        temp_path = os.path.join(self.directory, HISTORY_META_FILE + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, os.path.join(self.directory, HISTORY_META_FILE))
+
+    def close(self, complete=True):
+        # 模擬中途停止時由呼叫端傳入 complete=False
+        self.flush()
+        self._write_meta(complete=complete)
+
+def skill_id_by_name(player_type, name):
+    catalog = SKILL_CATALOGS[player_type]
+    for skill_id, skill_name in enumerate(catalog.names):
+        if skill_name == name:
+            return skill_id
+    raise ValueError(f"未知的技能：{name}")
+
+class HistoryReader:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, HISTORY_META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.player_type = PlayerType(self.meta["player_type"])
+
+    def __len__(self):
+        return sum(self.meta["chunks"])
+
+    @property
+    def trial_count(self):
+        return self.meta["trial_count"]
+
+    def chunk(self, index):
+        # 回傳 {欄位: 以 mmap 開啟的陣列}
+        return {
+            name: np.load(os.path.join(self.directory, f"{index:06d}.{name}.npy"), mmap_mode="r")
+            for name in self.meta["columns"]
+        }
+
+    def iter_chunks(self):
+        for index in range(len(self.meta["chunks"])):
+            yield self.chunk(index)
+
+    def co_occurrence(self, skill_a, skill_b):
+        # 兩個技能同時出現在同一次抽取結果中的次數
+        id_a = skill_id_by_name(self.player_type, skill_a)
+        id_b = skill_id_by_name(self.player_type, skill_b)
+        together = 0
+        count_a = 0
+        count_b = 0
+        for chunk in self.iter_chunks():
+            skill_ids = chunk["skill_id"].reshape(-1, 3)
+            has_a = (skill_ids == id_a).any(axis=1)
+            has_b = (skill_ids == id_b).any(axis=1)
+            together += int((has_a & has_b).sum())
+            count_a += int(has_a.sum())
+            count_b += int(has_b.sum())
+        trials = self.trial_count
+        return {
+            "trials": trials,
+            skill_a: count_a,
+            skill_b: count_b,
+            "together": together,
+            "rate": together / trials if trials else 0.0
+        }
+
+# 模擬結果快取：以設定與機率表雜湊為鍵，將統計存成磁碟上的 .npz 檔；
+# 只快取指定種子且完整跑完的模擬，總大小超過上限時刪除最久未使用的項目（以檔案修改時間記錄使用時間）
+# 抽樣演算法改變會使相同種子的結果不同，此時需遞增 SIMULATION_ENGINE_VERSION
+SIMULATION_ENGINE_VERSION = 1
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+def probability_table_hash():
+    # 機率表或技能資料庫變更時雜湊隨之改變，舊的快取項目不再命中並逐漸被淘汰
+    tables = {
+        "engine": SIMULATION_ENGINE_VERSION,
+        "probabilities": {player_type.value: table for player_type, table in PROBABILITIES.items()},
+        "legend_probabilities": LEGEND_PROBABILITIES,
+        "level_prob": LEVEL_PROB,
+        "skills": {
+            player_type.value: [[tier.value, names] for tier, names in skills_db.items()]
+            for player_type, skills_db in ((PlayerType.BATTER, BATTER_SKILLS), (PlayerType.PITCHER, PITCHER_SKILLS))
+        }
+    }
+    load_runtime_modules()
+    return hashlib.sha256(json.dumps(tables, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def default_cache_dir():
+    return os.environ.get("MLB_SIM_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "mlb_skill_simulator")
+
+class ResultCache:
+    def __init__(self, directory=None, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def key(self, player_type, is_legend, ticket_type, n, seed, protected_slot=None, skill_ids=None, levels=None, block_size=SIMULATION_BLOCK_SIZE):
+        config = {
+            "player_type": player_type.value,
+            "is_legend": bool(is_legend),
+            "ticket_type": ticket_type,
+            "protected_slot": protected_slot,
+            "skill_ids": [int(skill_id) for skill_id in skill_ids] if skill_ids is not None else None,
+            "levels": [int(level) for level in levels] if levels is not None else None,
+            "seed": seed,
+            "n": n,
+            "block_size": block_size,
+            "tables": probability_table_hash(),
+            # 結果統計規則：只有 STATS_TICKET_TYPES 計入傳說技能與等級總和
+            "record_outcomes": ticket_type in STATS_TICKET_TYPES
+        }
+        load_runtime_modules()
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                state = {name: data[name] for name in data.files}
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        state["seed"] = int(state["seed"]) if str(state["seed"]) else None
+        return SimulationStats.from_state(state)
+
+    def put(self, key, stats):
+        state = stats.to_state()
+        state["seed"] = "" if state["seed"] is None else str(state["seed"])
+        # 先寫入暫存檔再取代，避免其他行程讀到寫到一半的檔案
+        _atomic_savez(self._path(key), state)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                path = os.path.join(self.directory, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.directory, name))
+
+def cached_run_simulation(cache, player_type, is_legend, ticket_type, n, seed=None, protected_slot=None, skill_ids=None, levels=None, block_size=SIMULATION_BLOCK_SIZE, **kwargs):
+    # 回傳 (統計, 是否命中快取)；未指定種子時結果不可重現，不使用快取
+    if cache is None or seed is None:
+        stats = run_simulation(
+            player_type, is_legend, ticket_type, n, seed=seed, protected_slot=protected_slot,
+            skill_ids=skill_ids, levels=levels, block_size=block_size, **kwargs
+        )
+        return stats, False
+    key = cache.key(player_type, is_legend, ticket_type, n, seed, protected_slot, skill_ids, levels, block_size)
+    stats = cache.get(key)
+    if stats is not None:
+        return stats, True
+    stats = run_simulation(
+        player_type, is_legend, ticket_type, n, seed=seed, protected_slot=protected_slot,
+        skill_ids=skill_ids, levels=levels, block_size=block_size, **kwargs
+    )
+    # 中途停止的結果不完整，不寫入快取
+    if stats.draw_count == n:
+        try:
+            cache.put(key, stats)
+        except OSError:
+            pass
+    return stats, False
+
+def parse_simulation_count(text):
+    # 接受整數或 1e6 之類的科學記號
+    value = float(text)
+    if not value.is_integer():
+        raise ValueError("模擬次數必須為整數")
+    return int(value)
+
+# 信賴區間與精度目標：以 Wilson 區間估計傳說技能機率與各等級總和機率，
+# 所有區間的半寬都不超過 epsilon 時即可停止模擬
+def _z_score(confidence):
+    load_runtime_modules()
+    return statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+def wilson_interval(successes, trials, confidence=0.95):
+    if trials <= 0:
+        return 0.0, 1.0
+    z = _z_score(confidence)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+def stats_intervals(stats, confidence=0.95):
+    return {
+        "legend": wilson_interval(stats.legend_count, stats.simulation_count, confidence),
+        "level_sum": {
+            level_sum: wilson_interval(int(count), stats.level_sum_count, confidence)
+            for level_sum, count in zip(range(3, 10), stats.level_sum_counts)
+        }
+    }
+
+def precision_reached(stats, epsilon, confidence=0.95):
+    if stats.simulation_count == 0:
+        return False
+    intervals = stats_intervals(stats, confidence)
+    widths = [intervals["legend"]] + list(intervals["level_sum"].values())
+    return all((upper - lower) / 2 <= epsilon for lower, upper in widths)
+
+def run_until_precision(player_type, is_legend, ticket_type, epsilon, seed=None, workers=None, confidence=0.95, max_trials=None, protected_slot=None, skill_ids=None, levels=None, block_size=SIMULATION_BLOCK_SIZE, progress=None, should_stop=None):
+    # 依區塊持續模擬直到達到精度目標或 max_trials；同一個種子的結果等於 run_simulation 的前幾個區塊
+    if epsilon <= 0:
+        raise ValueError("精度目標必須大於 0")
+    if ticket_type not in STATS_TICKET_TYPES:
+        # 其他變更券不計入結果統計，永遠達不到精度目標
+        raise ValueError("精度模擬僅適用於高級技能變更券與最高級技能變更券")
+    if max_trials is None:
+        max_trials = MAX_SIMULATION_LIMIT
+    seed_seq = np.random.SeedSequence(seed)
+    tasks = (
+        (player_type, is_legend, ticket_type, size, _block_seed(seed_seq, index), protected_slot, skill_ids, levels)
+        for index, size in enumerate(_block_sizes(max_trials, block_size))
+    )
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, -(-max_trials // block_size))
+
+    stats = SimulationStats(player_type)
+    results = _iter_block_results(tasks, workers)
+    try:
+        for part in results:
+            stats.merge(part)
+            if progress:
+                progress(stats.simulation_count, max_trials)
+            if precision_reached(stats, epsilon, confidence):
+                break
+            if should_stop and should_stop():
+                break
+    finally:
+        results.close()
+    stats.seed = seed_seq.entropy
+    return stats, stats_intervals(stats, confidence)
+
+# 共同亂數比較：每次試驗產生一組共用的均勻亂數，各設定（變更券、卡片類型）以相同的亂數換算結果，
+# 結果彼此高度正相關，成對差異的變異數遠小於兩組獨立模擬，所需的試驗數因此大幅減少
+# 亂數欄位：等級組合、最高級第一次抽取是否通過、是否為傳說技能、第一技能槽的技能、技能槽 2、技能槽 3
+CRN_UNIFORMS = ("level", "accept", "legend", "first", "second", "third")
+COMPARISON_METRICS = ("legend", "level_sum")
+
+@functools.lru_cache(maxsize=None)
+def _level_triple_cdf(ticket_type, is_legend):
+    # 27 種等級組合依總和排序，以單一亂數反查累積機率，各變更券的等級總和因此為同向變化
+    if is_legend:
+        return np.array([[3, 3, 3]], dtype=np.int8), np.array([1.0])
+    single = np.array([LEVEL_PROB["等級1"], LEVEL_PROB["等級2"], LEVEL_PROB["等級3"]])
+    single = single / single.sum()
+    triples = sorted(itertools.product((1, 2, 3), repeat=3), key=sum)
+    if ticket_type == "最高級技能變更券":
+        triples = [triple for triple in triples if sum(triple) >= 5]
+    probs = np.array([np.prod(single[np.array(triple) - 1]) for triple in triples])
+    cdf = np.cumsum(probs / probs.sum())
+    cdf[-1] = 1.0
+    return np.array(triples, dtype=np.int8), cdf
+
+def reroll_from_uniforms(player_type, is_legend, ticket_type, uniforms):
+    # 無狀態的重抽型變更券抽樣：uniforms 為 (n, len(CRN_UNIFORMS)) 的 [0, 1) 亂數，相同亂數永遠得到相同結果
+    _check_reroll_ticket(ticket_type)
+    catalog = SKILL_CATALOGS[player_type]
+    pool_size = catalog.pool_size
+    u_level, u_accept, u_legend, u_first, u_second, u_third = np.asarray(uniforms, dtype=np.float64).T
+    n = len(u_level)
+    triples, cdf = _level_triple_cdf(ticket_type, is_legend)
+    levels = triples[np.minimum(np.searchsorted(cdf, u_level, side="right"), len(cdf) - 1)]
+
+    ids = np.empty((n, 3), dtype=np.int16)
+    if ticket_type == "技能變更券":
+        ids[:, 0] = np.minimum((u_first * pool_size).astype(np.int64), pool_size - 1)
+    else:
+        card_type = "傳說卡" if is_legend else "其他卡"
+        legend_prob = LEGEND_PROBABILITIES[card_type][ticket_type]
+        if ticket_type == "最高級技能變更券" and not is_legend:
+            # 第一次抽取未通過時，傳說技能機率為高級技能變更券的數值
+            accept = _super_level_table()[2]
+            legend_prob = np.where(u_accept < accept, legend_prob, LEGEND_PROBABILITIES[card_type]["高級技能變更券"])
+        legend_start, legend_stop = catalog.tier_ranges[SkillTier.LEGEND]
+        gold_start, gold_stop = catalog.tier_ranges[SkillTier.GOLD]
+        ids[:, 0] = np.where(
+            u_legend < legend_prob,
+            legend_start + np.minimum((u_first * (legend_stop - legend_start)).astype(np.int64), legend_stop - legend_start - 1),
+            gold_start + np.minimum((u_first * (gold_stop - gold_start)).astype(np.int64), gold_stop - gold_start - 1)
+        )
+    excluded = np.where(ids[:, 0] < pool_size, ids[:, 0], -1).astype(np.int64)
+    ids[:, 1] = _draw_excluding(pool_size, excluded[:, None], uniforms=u_second)
+    ids[:, 2] = _draw_excluding(pool_size, np.stack([excluded, ids[:, 1]], axis=1), uniforms=u_third)
+    return ids, levels
+
+def _comparison_metrics(player_type, is_legend, ticket_type, uniforms, cost):
+    skill_ids, levels = reroll_from_uniforms(player_type, is_legend, ticket_type, uniforms)
+    legend_start = SKILL_CATALOGS[player_type].tier_ranges[SkillTier.LEGEND][0]
+    # 每列為一個指標：是否出現傳說技能、等級總和，皆除以每張變更券的成本
+    return np.stack([skill_ids[:, 0] >= legend_start, levels.sum(axis=1, dtype=np.int64)]) / cost
+
+def _run_comparison_block(task):
+    player_type, configs, costs, size, seed_seq = task
+    uniforms = np.random.default_rng(seed_seq).random((size, len(CRN_UNIFORMS)))
+    values = np.stack([
+        _comparison_metrics(player_type, is_legend, ticket_type, uniforms, costs[index])
+        for index, (is_legend, ticket_type) in enumerate(configs)
+    ])
+    # 各設定的總和、平方和，以及其餘設定與基準（第一個設定）成對差異的總和、平方和
+    diffs = values[1:] - values[:1]
+    return {
+        "sum": values.sum(axis=2),
+        "sum_sq": (values * values).sum(axis=2),
+        "diff_sum": diffs.sum(axis=2),
+        "diff_sum_sq": (diffs * diffs).sum(axis=2)
+    }
+
+def _config_label(is_legend, ticket_type):
+    return f"{ticket_type}（{'傳說卡' if is_legend else '其他卡'}）"
+
+def compare_configurations(player_type, configs, n, seed=None, workers=None, costs=None, confidence=0.95, block_size=SIMULATION_BLOCK_SIZE):
+    # configs 為 (是否為傳說卡, 變更券) 的串列；costs 可依變更券指定成本，指標皆以每單位成本計算；
+    # 每個設定與第一個設定（基準）的成對差異附常態近似信賴區間，並列出相對於獨立模擬的變異數縮減倍數
+    configs = [(bool(is_legend), ticket_type) for is_legend, ticket_type in configs]
+    if len(configs) < 2:
+        raise ValueError("至少需要兩個設定才能比較")
+    for _, ticket_type in configs:
+        _check_reroll_ticket(ticket_type)
+    if n <= 1:
+        raise ValueError("模擬次數必須大於 1")
+    if n > MAX_SIMULATION_LIMIT:
+        raise ValueError(f"模擬次數不得超過系統上限 {MAX_SIMULATION_LIMIT} 次")
+    costs = costs or {}
+    cost_values = [float(costs.get(ticket_type, 1.0)) for _, ticket_type in configs]
+    if any(cost <= 0 for cost in cost_values):
+        raise ValueError("變更券成本必須大於 0")
+    seed_seq = np.random.SeedSequence(seed)
+    tasks = (
+        (player_type, configs, cost_values, size, _block_seed(seed_seq, index))
+        for index, size in enumerate(_block_sizes(n, block_size))
+    )
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, -(-n // block_size))
+
+    totals = None
+    results = _iter_block_results(tasks, workers, _run_comparison_block)
+    try:
+        for part in results:
+            totals = part if totals is None else {key: totals[key] + value for key, value in part.items()}
+    finally:
+        results.close()
+
+    def mean_and_variance(total, total_sq):
+        mean = total / n
+        return mean, max(total_sq / n - mean * mean, 0.0) * n / (n - 1)
+
+    z = _z_score(confidence)
+    labels = [_config_label(is_legend, ticket_type) for is_legend, ticket_type in configs]
+    result = {"player_type": player_type.value, "trials": n, "seed": seed_seq.entropy, "confidence": confidence, "configs": {}, "differences": {}}
+    for index, label in enumerate(labels):
+        result["configs"][label] = {"cost": cost_values[index]}
+        for metric_index, metric in enumerate(COMPARISON_METRICS):
+            mean, variance = mean_and_variance(totals["sum"][index, metric_index], totals["sum_sq"][index, metric_index])
+            half_width = z * math.sqrt(variance / n)
+            result["configs"][label][metric] = {"mean": mean, "interval": (mean - half_width, mean + half_width)}
+    for index in range(1, len(configs)):
+        comparison = {}
+        for metric_index, metric in enumerate(COMPARISON_METRICS):
+            mean, variance = mean_and_variance(totals["diff_sum"][index - 1, metric_index], totals["diff_sum_sq"][index - 1, metric_index])
+            _, variance_a = mean_and_variance(totals["sum"][index, metric_index], totals["sum_sq"][index, metric_index])
+            _, variance_b = mean_and_variance(totals["sum"][0, metric_index], totals["sum_sq"][0, metric_index])
+            half_width = z * math.sqrt(variance / n)
+            comparison[metric] = {
+                "difference": mean,
+                "interval": (mean - half_width, mean + half_width),
+                # 兩組獨立模擬的差異變異數除以成對差異的變異數，即達到相同精度所節省的試驗倍數
+                "variance_reduction": (variance_a + variance_b) / variance if variance > 0 else math.inf
+            }
+        result["differences"][f"{labels[index]} - {labels[0]}"] = comparison
+    return result
+
+# 目標技能組合：第一技能槽為指定傳說技能（None 代表任一傳說技能）、等級總和至少 min_level_sum，
+# 並包含 required_skills 中的所有技能
+class TargetBuild:
+    def __init__(self, legend_skill=None, min_level_sum=7, required_skills=()):
+        self.legend_skill = legend_skill
+        self.min_level_sum = min_level_sum
+        self.required_skills = tuple(sorted(set(required_skills)))
+
+    def _key(self):
+        return (self.legend_skill, self.min_level_sum, self.required_skills)
+
+    def __eq__(self, other):
+        return isinstance(other, TargetBuild) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"TargetBuild(legend_skill={self.legend_skill!r}, min_level_sum={self.min_level_sum}, required_skills={self.required_skills!r})"
+
+    def validate(self, player_type):
+        catalog = SKILL_CATALOGS[player_type]
+        if self.legend_skill is not None and (self.legend_skill, SkillTier.LEGEND) not in catalog.ids:
+            raise ValueError(f"未知的傳說技能：{self.legend_skill}")
+        pool_names = catalog.names[:catalog.pool_size]
+        for name in self.required_skills:
+            if name not in pool_names:
+                raise ValueError(f"未知的技能：{name}")
+        if self.min_level_sum > 9:
+            raise ValueError("等級總和最高為 9")
+
+    def has_legend_base(self, skills):
+        first = skills[0]
+        return bool(first) and first.tier == SkillTier.LEGEND and sum(skill.level for skill in skills if skill) >= self.min_level_sum
+
+    def is_met(self, skills):
+        if not self.has_legend_base(skills):
+            return False
+        if self.legend_skill is not None and skills[0].name != self.legend_skill:
+            return False
+        names = {skill.name for skill in skills if skill}
+        return all(name in names for name in self.required_skills)
+
+# 目標所需變更券數（吸收馬可夫鏈）：
+# 狀態為 (第一技能槽類別, 等級總和是否達標)，類別為 other（非傳說技能）、legend（其他傳說技能）、target（目標傳說技能）；
+# 策略為重抽直到第一技能槽出現傳說技能且等級總和達標，再使用傳說技能選擇變更券直到變成目標傳說技能
+_CHAIN_STATES = [(category, level_ok) for category in ("other", "legend", "target") for level_ok in (False, True)]
+_CHAIN_ABSORBING = ("target", True)
+_CHAIN_TAIL_MASS = 1e-12
+_CHAIN_MAX_TICKETS = 100000
+
+def _chain_state(player_type, target, skills):
+    first = skills[0] if skills else None
+    if not first or first.tier != SkillTier.LEGEND:
+        category = "other"
+    elif target.legend_skill is None or first.name == target.legend_skill:
+        category = "target"
+    else:
+        category = "legend"
+    level_ok = sum(skill.level for skill in skills if skill) >= target.min_level_sum if skills else False
+    return category, level_ok
+
+def _absorption_distribution(Q, R, start_rows):
+    # 逐步推進狀態分布，回傳每一步被吸收的機率（索引為使用的變更券數）
+    probs = [np.zeros(len(start_rows))]
+    visits = start_rows
+    while visits.sum(axis=1).max() > _CHAIN_TAIL_MASS and len(probs) <= _CHAIN_MAX_TICKETS:
+        probs.append(visits @ R)
+        visits = visits @ Q
+    return np.array(probs).T
+
+def _ticket_count_distribution(Q, R, uses_ticket, start_rows):
+    # 某一種變更券使用次數的分布：同一次數下經由其他變更券的走訪以 (I - Q_o)^-1 一次處理
+    Q_ticket = Q * uses_ticket[:, None]
+    Q_other = Q * ~uses_ticket[:, None]
+    R_ticket = R * uses_ticket
+    R_other = R * ~uses_ticket
+    visits_other = np.linalg.inv(np.eye(len(Q)) - Q_other)
+    visits = start_rows @ visits_other
+    probs = [visits @ R_other]
+    while visits.sum(axis=1).max() > _CHAIN_TAIL_MASS and len(probs) <= _CHAIN_MAX_TICKETS:
+        absorbed = visits @ R_ticket
+        visits = (visits @ Q_ticket) @ visits_other
+        probs.append(absorbed + visits @ R_other)
+    return np.array(probs).T
+
+@functools.lru_cache(maxsize=None)
+def _tickets_to_target_chain(player_type, is_legend, target, reroll_ticket):
+    catalog = SKILL_CATALOGS[player_type]
+    legend_start, legend_stop = catalog.tier_ranges[SkillTier.LEGEND]
+    legend_count = legend_stop - legend_start
+    rate = legend_rate(reroll_ticket, is_legend)
+    level_ok_prob = sum(prob for total, prob in level_sum_distribution(reroll_ticket, is_legend).items() if total >= target.min_level_sum)
+    target_share = 1.0 / legend_count if target.legend_skill is not None else 1.0
+
+    reroll_outcomes = {}
+    for level_ok, level_prob in ((True, level_ok_prob), (False, 1 - level_ok_prob)):
+        reroll_outcomes[("target", level_ok)] = rate * target_share * level_prob
+        reroll_outcomes[("legend", level_ok)] = rate * (1 - target_share) * level_prob
+        reroll_outcomes[("other", level_ok)] = (1 - rate) * level_prob
+    # 傳說技能選擇變更券會換成其他傳說技能之一，等級不變
+    select_outcomes = {
+        ("target", True): 1.0 / (legend_count - 1),
+        ("legend", True): 1 - 1.0 / (legend_count - 1)
+    }
+
+    transient = [state for state in _CHAIN_STATES if state != _CHAIN_ABSORBING]
+    index = {state: i for i, state in enumerate(transient)}
+    Q = np.zeros((len(transient), len(transient)))
+    R = np.zeros(len(transient))
+    tickets = []
+    for state in transient:
+        if state == ("legend", True):
+            ticket_type, outcomes = "傳說技能選擇變更券", select_outcomes
+        else:
+            ticket_type, outcomes = reroll_ticket, reroll_outcomes
+        tickets.append(ticket_type)
+        for next_state, prob in outcomes.items():
+            if next_state == _CHAIN_ABSORBING:
+                R[index[state]] += prob
+            else:
+                Q[index[state], index[next_state]] += prob
+
+    identity = np.eye(len(transient))
+    fundamental = np.linalg.inv(identity - Q)
+    ticket_types = [reroll_ticket, "傳說技能選擇變更券"]
+    expected = {}
+    variance = {}
+    distribution = {}
+    for ticket_type in ticket_types + [None]:
+        # None 代表所有變更券的總數
+        uses_ticket = np.array([ticket_type is None or ticket == ticket_type for ticket in tickets])
+        reward = uses_ticket.astype(float)
+        mean = fundamental @ reward
+        second_moment = fundamental @ (reward + 2 * reward * (Q @ mean))
+        expected[ticket_type] = mean
+        variance[ticket_type] = second_moment - mean ** 2
+        if ticket_type is None:
+            distribution[ticket_type] = _absorption_distribution(Q, R, identity)
+        else:
+            distribution[ticket_type] = _ticket_count_distribution(Q, R, uses_ticket, identity)
+    return {"index": index, "expected": expected, "variance": variance, "distribution": distribution}
+
+# 多步驟變更券軌跡引擎：宣告式策略為依序排列的規則 (變更券, 目標, 技能槽)，
+# 每一步對每條軌跡使用第一個尚未達成目標的規則所指定的變更券，所有規則的目標都達成即結束；
+# 所有軌跡以陣列同時推進，已結束的軌跡移出陣列
+class TicketPolicy:
+    def __init__(self, rules):
+        self.rules = []
+        for rule in rules:
+            ticket_type, until = rule[0], rule[1]
+            slot = rule[2] if len(rule) > 2 else None
+            if ticket_type not in TICKET_TYPES:
+                raise ValueError("未知的變更券類型")
+            if ticket_type == "技能變更保護券" and slot is None:
+                raise ValueError("必須指定保護的技能槽")
+            self.rules.append((ticket_type, until, slot))
+        if not self.rules:
+            raise ValueError("策略至少需要一條規則")
+
+    def __repr__(self):
+        return f"TicketPolicy({self.rules!r})"
+
+    @property
+    def ticket_types(self):
+        return [ticket_type for ticket_type in TICKET_TYPES if any(rule[0] == ticket_type for rule in self.rules)]
+
+    @classmethod
+    def reach_target(cls, target, reroll_ticket="高級技能變更券"):
+        # 重抽直到第一技能槽為傳說技能且等級總和達標，再換成指定傳說技能，最後保護第一技能槽重抽其他技能
+        rules = [(reroll_ticket, TargetBuild(None, target.min_level_sum), None)]
+        if target.legend_skill is not None:
+            rules.append(("傳說技能選擇變更券", TargetBuild(target.legend_skill, target.min_level_sum), None))
+        if target.required_skills:
+            rules.append(("技能變更保護券", target, 0))
+        return cls(rules)
+
+def target_met_batch(player_type, target, skill_ids, levels):
+    # 向量化的 TargetBuild.is_met，skill_ids、levels 為 (n, 3) 陣列
+    return _target_met_sums(player_type, target, skill_ids, levels.sum(axis=1))
+
+def _target_met_sums(player_type, target, skill_ids, level_sums):
+    # 目標只透過等級總和取決於等級，level_sums 為 (n,) 陣列
+    catalog = SKILL_CATALOGS[player_type]
+    first = skill_ids[:, 0]
+    met = (first >= catalog.tier_ranges[SkillTier.LEGEND][0]) & (level_sums >= target.min_level_sum)
+    if target.legend_skill is not None:
+        met &= first == catalog.ids[(target.legend_skill, SkillTier.LEGEND)]
+    for name in target.required_skills:
+        met &= (skill_ids == skill_id_by_name(player_type, name)).any(axis=1)
+    return met
+
+@functools.lru_cache(maxsize=None)
+def _reroll_outcomes(player_type, is_legend, ticket_type):
+    # 重抽型變更券所有可能結果的精確機率：(技能編號 (m, 3), 等級總和 (m,), 機率 (m,))；
+    # 第一技能槽、技能槽 2/3 與等級彼此的依存關係同 exact_distribution，等級組合只保留總和
+    catalog = SKILL_CATALOGS[player_type]
+    pool_size = catalog.pool_size
+    first_probs = exact_distribution(player_type, is_legend, ticket_type)["slot_probs"][0]
+    pairs = np.array([(a, b) for a in range(pool_size) for b in range(pool_size) if a != b], dtype=np.int16)
+    ids, probs = [], []
+    for first in np.flatnonzero(first_probs):
+        rest = pairs[(pairs != first).all(axis=1)]
+        ids.append(np.column_stack([np.full(len(rest), first, dtype=np.int16), rest]))
+        probs.append(np.full(len(rest), first_probs[first] / len(rest)))
+    ids, probs = np.concatenate(ids), np.concatenate(probs)
+    sum_probs = np.array(_level_sum_probs(ticket_type, is_legend))
+    sums = np.flatnonzero(sum_probs)
+    return (
+        np.repeat(ids, len(sums), axis=0),
+        np.tile(sums + 3, len(ids)).astype(np.int8),
+        (probs[:, None] * sum_probs[sums]).ravel()
+    )
+
+class _RerollJump:
+    # 重抽型變更券的結果與目前技能無關，連續使用同一條規則直到狀態離開該規則為止的張數為幾何分布，
+    # 離開時的狀態為以「離開」為條件的單次抽取結果，因此可一次跳到離開的狀態，不需逐張抽取
+    def __init__(self, player_type, is_legend, ticket_type, rules, index):
+        ids, level_sums, probs = _reroll_outcomes(player_type, is_legend, ticket_type)
+        # 留在規則 index：先前的目標都達成且此規則的目標未達成
+        stay = ~_target_met_sums(player_type, rules[index][1], ids, level_sums)
+        for _, until, _ in rules[:index]:
+            stay &= _target_met_sums(player_type, until, ids, level_sums)
+        leave = np.flatnonzero(~stay)
+        self.exit_prob = float(probs[leave].sum())
+        self.ids = ids[leave]
+        self.level_sums = level_sums[leave]
+        self.cdf = np.cumsum(probs[leave]) / self.exit_prob if self.exit_prob > 0 else None
+        self.triples, self.triple_cdf = _level_triple_cdf(ticket_type, is_legend)
+        triple_sums = self.triples.sum(axis=1, dtype=np.int64)
+        # 依總和排序的等級組合中，各總和所佔的累積機率區間
+        starts = np.concatenate([[0.0], self.triple_cdf[:-1]])
+        self.sum_range = {
+            level_sum: (starts[triple_sums == level_sum].min(), self.triple_cdf[triple_sums == level_sum].max())
+            for level_sum in np.unique(triple_sums)
+        }
+
+    def sample(self, n, rng):
+        # 回傳 (使用張數, 技能編號, 等級)；永遠無法離開時張數為無限大
+        if self.cdf is None:
+            return np.full(n, np.inf), None, None
+        tickets = rng.geometric(self.exit_prob, n) if self.exit_prob < 1 else np.ones(n, dtype=np.int64)
+        chosen = np.minimum(np.searchsorted(self.cdf, rng.random(n), side="right"), len(self.cdf) - 1)
+        level_sums = self.level_sums[chosen].astype(np.int64)
+        # 在該總和的累積機率區間內均勻取值，即為以總和為條件的等級組合
+        lower = np.zeros(n)
+        upper = np.zeros(n)
+        for level_sum, (low, high) in self.sum_range.items():
+            rows = level_sums == level_sum
+            lower[rows] = low
+            upper[rows] = high
+        u = lower + rng.random(n) * (upper - lower)
+        triples = self.triples[np.minimum(np.searchsorted(self.triple_cdf, u, side="right"), len(self.triple_cdf) - 1)]
+        return tickets, self.ids[chosen], triples
+
+def run_trajectories(player_type, is_legend, policy, trials=100000, seed=None, skills=None, max_tickets=_CHAIN_MAX_TICKETS):
+    # 回傳各變更券的平均使用數、變異數與使用數分布；超過 max_tickets 仍未完成的軌跡計入 unfinished
+    # 重抽型變更券的規則以 _RerollJump 一次跳到離開該規則的狀態，其餘變更券逐張模擬；各軌跡的進度因此不同步
+    for _, until, _ in policy.rules:
+        until.validate(player_type)
+    rng = np.random.default_rng(seed)
+    player = Player(player_type, None, is_legend)
+    player.skills = list(skills) if skills else [None, None, None]
+    initial_ids, initial_levels = player_state_arrays(player)
+    counts = np.zeros((trials, len(TICKET_TYPES)), dtype=np.int64)
+    unfinished = 0
+    jumps = {
+        index: _RerollJump(player_type, is_legend, ticket_type, policy.rules, index)
+        for index, (ticket_type, _, _) in enumerate(policy.rules) if ticket_type in REROLL_TICKET_TYPES
+    }
+
+    # 只保留仍在進行的軌跡，每一步壓縮掉已結束的列
+    origin = np.arange(trials)
+    skill_ids = np.broadcast_to(initial_ids, (trials, 3)).copy()
+    levels = np.broadcast_to(initial_levels, (trials, 3)).copy()
+    row_counts = np.zeros((trials, len(TICKET_TYPES)), dtype=np.int64)
+    used = np.zeros(trials, dtype=np.int64)
+    while origin.size:
+        rule = np.full(origin.size, -1)
+        pending = np.ones(origin.size, dtype=bool)
+        for index, (_, until, _) in enumerate(policy.rules):
+            unmet = pending & ~target_met_batch(player_type, until, skill_ids, levels)
+            rule[unmet] = index
+            pending &= ~unmet
+        exhausted = (rule >= 0) & (used >= max_tickets)
+        unfinished += int(exhausted.sum())
+        keep = (rule >= 0) & ~exhausted
+        if not keep.all():
+            counts[origin[~keep]] = row_counts[~keep]
+            origin = origin[keep]
+            skill_ids = skill_ids[keep]
+            levels = levels[keep]
+            row_counts = row_counts[keep]
+            used = used[keep]
+            rule = rule[keep]
+        for index, (ticket_type, _, slot) in enumerate(policy.rules):
+            rows = rule == index
+            size = int(rows.sum())
+            if not size:
+                continue
+            whole = size == origin.size
+            column = TICKET_TYPES.index(ticket_type)
+            if index in jumps:
+                tickets, new_ids, new_levels = jumps[index].sample(size, rng)
+                # 超過上限的軌跡停在上限，下一輪計入 unfinished
+                remaining = max_tickets - used[rows]
+                capped = tickets > remaining
+                tickets = np.where(capped, remaining, tickets).astype(np.int64)
+                if new_ids is not None:
+                    stay = np.flatnonzero(rows)[capped]
+                    old_ids, old_levels = skill_ids[stay], levels[stay]
+                    skill_ids[rows] = new_ids
+                    levels[rows] = new_levels
+                    skill_ids[stay], levels[stay] = old_ids, old_levels
+                row_counts[rows, column] += tickets
+                used[rows] += tickets
+                continue
+            current_ids = skill_ids if whole else skill_ids[rows]
+            current_levels = levels if whole else levels[rows]
+            new_ids, _, new_levels = simulate_skill_change_batch(
+                player_type, is_legend, ticket_type, size, rng,
+                protected_slot=slot, skill_ids=current_ids, levels=current_levels
+            )
+            if whole:
+                skill_ids, levels = new_ids, new_levels
+            else:
+                skill_ids[rows] = new_ids
+                levels[rows] = new_levels
+            row_counts[:, column] += rows
+            used += rows
+
+    ticket_types = policy.ticket_types
+    totals = counts.sum(axis=1)
+    per_ticket = {ticket_type: counts[:, TICKET_TYPES.index(ticket_type)] for ticket_type in ticket_types}
+    return {
+        "exact": False,
+        "trials": trials,
+        "unfinished": unfinished,
+        "expected": {ticket_type: float(values.mean()) for ticket_type, values in per_ticket.items()},
+        "variance": {ticket_type: float(values.var()) for ticket_type, values in per_ticket.items()},
+        "expected_total": float(totals.mean()),
+        "variance_total": float(totals.var()),
+        "distribution": {
+            ticket_type: np.bincount(values) / trials for ticket_type, values in per_ticket.items()
+        } | {"total": np.bincount(totals) / trials}
+    }
+
+def simulate_tickets_to_target(player_type, is_legend, target, reroll_ticket="高級技能變更券", skills=None, trials=10000, seed=None, max_tickets=_CHAIN_MAX_TICKETS):
+    # 抽樣估計：以軌跡引擎執行 TicketPolicy.reach_target 策略
+    return run_trajectories(
+        player_type, is_legend, TicketPolicy.reach_target(target, reroll_ticket),
+        trials, seed, skills, max_tickets
+    )
+
+@functools.lru_cache(maxsize=64)
+def _sampled_tickets_to_target(player_type, is_legend, target, reroll_ticket, state, trials, seed):
+    # 抽樣估計的快取：state 為各技能槽的 (技能編號, 等級)，None 代表空技能槽
+    skills = skills_from_arrays(player_type, *zip(*state)) if state else None
+    return simulate_tickets_to_target(player_type, is_legend, target, reroll_ticket, skills, trials, seed)
+
+def solve_tickets_to_target(player_type, is_legend, target, reroll_ticket="高級技能變更券", skills=None, trials=10000, seed=None):
+    # 回傳各變更券的期望使用數、變異數與使用數分布（distribution[...][k] 為恰好使用 k 張的機率）；
+    # 目標只涉及第一技能槽時精確計算，需要其他技能時改以抽樣估計（指定種子時依設定快取）
+    if reroll_ticket not in ["高級技能變更券", "最高級技能變更券", "傳說技能變更券"]:
+        raise ValueError("重抽變更券必須會出現傳說技能")
+    target.validate(player_type)
+    if target.required_skills:
+        if seed is None:
+            # 未指定種子時每次都是新的估計，不使用快取
+            return simulate_tickets_to_target(player_type, is_legend, target, reroll_ticket, skills, trials, seed)
+        catalog = SKILL_CATALOGS[player_type]
+        state = tuple((catalog.skill_id(skill), skill.level if skill else 0) for skill in skills) if skills else None
+        return _sampled_tickets_to_target(player_type, is_legend, target, reroll_ticket, state, trials, seed)
+
+    start = _chain_state(player_type, target, skills)
+    if start == _CHAIN_ABSORBING:
+        zero = {reroll_ticket: 0.0, "傳說技能選擇變更券": 0.0}
+        return {
+            "exact": True, "expected": zero, "variance": dict(zero),
+            "expected_total": 0.0, "variance_total": 0.0,
+            "distribution": {reroll_ticket: np.ones(1), "傳說技能選擇變更券": np.ones(1), "total": np.ones(1)}
+        }
+    if legend_rate(reroll_ticket, is_legend) == 0 or level_sum_distribution(reroll_ticket, is_legend)[9] == 0:
+        raise ValueError("目標無法達成")
+    chain = _tickets_to_target_chain(player_type, is_legend, target, reroll_ticket)
+    row = chain["index"][start]
+    ticket_types = [reroll_ticket, "傳說技能選擇變更券"]
+    return {
+        "exact": True,
+        "expected": {ticket_type: float(chain["expected"][ticket_type][row]) for ticket_type in ticket_types},
+        "variance": {ticket_type: float(chain["variance"][ticket_type][row]) for ticket_type in ticket_types},
+        "expected_total": float(chain["expected"][None][row]),
+        "variance_total": float(chain["variance"][None][row]),
+        "distribution": {ticket_type: chain["distribution"][ticket_type][row] for ticket_type in ticket_types}
+        | {"total": chain["distribution"][None][row]}
+    }
+
+# 變更券使用策略最佳化（動態規劃）：
+# 狀態只保留與目標有關的資訊：第一技能槽類別、技能槽 2、3 的類別（兩槽規則相同，排序後視為同一狀態）、等級總和是否達標。
+# 類別為 target（目標傳說技能）、legend（其他傳說技能）、必要技能名稱、other（其他一般技能）；
+# 只有重抽型變更券會改變等級，因此等級只需記錄是否達標
+class TicketStrategyOptimizer:
+    def __init__(self, player_type, is_legend, target):
+        target.validate(player_type)
+        self.player_type = player_type
+        self.is_legend = is_legend
+        self.target = target
+        self.catalog = SKILL_CATALOGS[player_type]
+        self.legend_ids = range(*self.catalog.tier_ranges[SkillTier.LEGEND])
+        self.target_id = self.catalog.ids[(target.legend_skill, SkillTier.LEGEND)] if target.legend_skill is not None else None
+        self.required_ids = {self.catalog.ids[(name, tier)]: name for name in target.required_skills for tier in TIER_ORDER if (name, tier) in self.catalog.ids}
+        self.classes = [self._classify(skill_id) for skill_id in range(len(self.catalog))]
+        self._memo = {}
+        self._reroll_memo = {}
+        self._transition_memo = {}
+
+    def _classify(self, skill_id):
+        if skill_id in self.legend_ids:
+            return "target" if self.target_id is None or skill_id == self.target_id else "legend"
+        return self.required_ids.get(skill_id, "other")
+
+    def state_of(self, skills):
+        # 空技能槽（尚未使用過變更券）以 None 表示
+        if not any(skills):
+            return None
+        classes = [self.classes[self.catalog.skill_id(skill)] if skill else "other" for skill in skills]
+        level_ok = sum(skill.level for skill in skills if skill) >= self.target.min_level_sum
+        return classes[0], tuple(sorted(classes[1:])), level_ok
+
+    def is_met(self, state):
+        if state is None:
+            return False
+        first, others, level_ok = state
+        return first == "target" and level_ok and all(name in others for name in self.target.required_skills)
+
+    def _representative(self, state):
+        first, others, _ = state
+        skill_ids = []
+        for category in (first,) + others:
+            if category == "target":
+                skill_id = self.target_id if self.target_id is not None else self.legend_ids[0]
+            elif category == "legend":
+                skill_id = next(i for i in self.legend_ids if i != self.target_id)
+            elif category == "other":
+                skill_id = next(
+                    i for i in range(self.catalog.pool_size)
+                    if i not in self.required_ids and i not in skill_ids
+                )
+            else:
+                skill_id = next(i for i, name in self.required_ids.items() if name == category)
+            skill_ids.append(skill_id)
+        return skill_ids
+
+    def _pool_class_counts(self, excluded):
+        return collections.Counter(
+            self.classes[skill_id] for skill_id in range(self.catalog.pool_size) if skill_id not in excluded
+        )
+
+    def _pair_outcomes(self, excluded):
+        # 從技能池不放回抽兩個技能，回傳依抽出順序的類別組合與機率
+        counts = self._pool_class_counts(excluded)
+        total = sum(counts.values())
+        for first, first_count in counts.items():
+            for second, second_count in counts.items():
+                second_count -= first == second
+                if second_count > 0:
+                    yield first, second, first_count / total * second_count / (total - 1)
+
+    def _transitions(self, state, action):
+        ticket_type, slot = action
+        key = (None if ticket_type in REROLL_TICKET_TYPES else state, action)
+        if key in self._transition_memo:
+            return self._transition_memo[key]
+        outcomes = collections.defaultdict(float)
+        pool_size = self.catalog.pool_size
+
+        if ticket_type in REROLL_TICKET_TYPES:
+            if ticket_type == "技能變更券":
+                firsts = [(skill_id, 1.0 / pool_size) for skill_id in range(pool_size)]
+            else:
+                rate = legend_rate(ticket_type, self.is_legend)
+                gold_ids = range(*self.catalog.tier_ranges[SkillTier.GOLD])
+                firsts = [(skill_id, rate / len(self.legend_ids)) for skill_id in self.legend_ids]
+                firsts += [(skill_id, (1 - rate) / len(gold_ids)) for skill_id in gold_ids]
+            level_ok_prob = sum(
+                prob for total, prob in level_sum_distribution(ticket_type, self.is_legend).items()
+                if total >= self.target.min_level_sum
+            )
+            for first, first_prob in firsts:
+                if first_prob == 0:
+                    continue
+                for second, third, pair_prob in self._pair_outcomes({first}):
+                    others = tuple(sorted((second, third)))
+                    for level_ok, level_prob in ((True, level_ok_prob), (False, 1 - level_ok_prob)):
+                        if level_prob > 0:
+                            outcomes[(self.classes[first], others, level_ok)] += first_prob * pair_prob * level_prob
+        else:
+            first, others, level_ok = state
+            classes = [first, others[0], others[1]]
+            skill_ids = self._representative(state)
+            if ticket_type == "傳說技能選擇變更券":
+                for skill_id in self.legend_ids:
+                    if skill_id != skill_ids[0]:
+                        outcomes[(self.classes[skill_id], others, level_ok)] += 1.0 / (len(self.legend_ids) - 1)
+            elif ticket_type == "技能變更保護券":
+                # 其餘兩槽依技能槽順序從移除保護技能後的技能池抽取，等級不變
+                rerolled = [i for i in range(3) if i != slot]
+                for drawn_first, drawn_second, prob in self._pair_outcomes({skill_ids[slot]}):
+                    new_classes = list(classes)
+                    new_classes[rerolled[0]] = drawn_first
+                    new_classes[rerolled[1]] = drawn_second
+                    outcomes[(new_classes[0], tuple(sorted(new_classes[1:])), level_ok)] += prob
+            else:
+                counts = self._pool_class_counts({skill_ids[slot]})
+                total = sum(counts.values())
+                for category, count in counts.items():
+                    new_classes = list(classes)
+                    new_classes[slot] = category
+                    outcomes[(new_classes[0], tuple(sorted(new_classes[1:])), level_ok)] += count / total
+
+        result = tuple(outcomes.items())
+        self._transition_memo[key] = result
+        return result
+
+    def _actions(self, state, inventory):
+        for ticket_type, count in zip(TICKET_TYPES, inventory):
+            if not count:
+                continue
+            if ticket_type in REROLL_TICKET_TYPES:
+                yield ticket_type, None
+            elif state is None:
+                # 空技能槽只能使用重抽型變更券
+                continue
+            elif ticket_type == "傳說技能選擇變更券":
+                if state[0] in ("target", "legend"):
+                    yield ticket_type, None
+            else:
+                # 技能槽 2、3 類別相同時只需考慮其中一個
+                yield ticket_type, 0
+                yield ticket_type, 1
+                if state[1][0] != state[1][1]:
+                    yield ticket_type, 2
+
+    def _action_value(self, state, inventory, action):
+        ticket_index = TICKET_TYPES.index(action[0])
+        remaining = inventory[:ticket_index] + (inventory[ticket_index] - 1,) + inventory[ticket_index + 1:]
+        if action[0] in REROLL_TICKET_TYPES:
+            # 重抽結果與目前狀態無關，同一份剩餘變更券只需計算一次
+            key = (action[0], remaining)
+            if key not in self._reroll_memo:
+                self._reroll_memo[key] = sum(
+                    prob * self._value(next_state, remaining)
+                    for next_state, prob in self._transitions(None, action)
+                )
+            return self._reroll_memo[key]
+        return sum(prob * self._value(next_state, remaining) for next_state, prob in self._transitions(state, action))
+
+    def _value(self, state, inventory):
+        if self.is_met(state):
+            return 1.0
+        key = (state, inventory)
+        if key not in self._memo:
+            best_value, best_action = 0.0, None
+            for action in self._actions(state, inventory):
+                value = self._action_value(state, inventory, action)
+                if value > best_value + 1e-15:
+                    best_value, best_action = value, action
+            self._memo[key] = (best_value, best_action)
+        return self._memo[key][0]
+
+    def _inventory_key(self, inventory):
+        for ticket_type in inventory:
+            if ticket_type not in TICKET_TYPES:
+                raise ValueError("未知的變更券類型")
+        return tuple(int(inventory.get(ticket_type, 0)) for ticket_type in TICKET_TYPES)
+
+    def success_probability(self, skills, inventory):
+        return self._value(self.state_of(skills), self._inventory_key(inventory))
+
+    def best_action(self, skills, inventory):
+        # 回傳 (變更券, 技能槽) 或 None（已達成目標或已無有用的變更券）
+        state = self.state_of(skills)
+        inventory_key = self._inventory_key(inventory)
+        if self.is_met(state):
+            return None
+        self._value(state, inventory_key)
+        action = self._memo[(state, inventory_key)][1]
+        if action is None or action[1] in (None, 0):
+            return action
+        # 將排序後的技能槽對應回實際的技能槽
+        category = state[1][action[1] - 1]
+        current = [self.classes[self.catalog.skill_id(skill)] for skill in skills[1:]]
+        return action[0], 1 + current.index(category)
+
+def optimize_ticket_strategy(player_type, is_legend, target, inventory, skills=None):
+    # inventory 為 {變更券: 張數}；回傳達成目標的最高機率與目前應使用的變更券
+    optimizer = TicketStrategyOptimizer(player_type, is_legend, target)
+    skills = skills if skills is not None else [None, None, None]
+    return {
+        "probability": optimizer.success_probability(skills, inventory),
+        "action": optimizer.best_action(skills, inventory),
+        "optimizer": optimizer
+    }
+
+# 全隊模擬：12 個投手位置與 14 個打者位置套用同一份變更券計畫，所有位置的區塊一起交給行程池；
+# 第 i 個位置固定使用主種子衍生的第 i 個子序列，結果與行程數及其他位置無關
+ROSTER_POSITIONS = [(position.value, PlayerType.PITCHER, position) for position in PitcherPosition] + [
+    (position.value, PlayerType.BATTER, position) for position in BatterPosition
+]
+
+def roster_players(players=None):
+    # 補齊尚未設定的位置（非傳說球員、空技能槽）
+    players = dict(players or {})
+    for position_str, player_type, position in ROSTER_POSITIONS:
+        if position_str not in players:
+            players[position_str] = Player(player_type, position, False, is_black_diamond=True)
+    return players
+
+def _roster_plan(ticket_plan, position_str, protected_slot):
+    # ticket_plan 為單一變更券（套用至所有位置），或 {位置: 變更券 或 (變更券, 技能槽)}
+    if isinstance(ticket_plan, str):
+        return ticket_plan, protected_slot
+    plan = ticket_plan.get(position_str)
+    if plan is None or isinstance(plan, str):
+        return plan, protected_slot
+    return plan
+
+def _check_roster_plan(player, ticket_type, protected_slot):
+    if ticket_type not in TICKET_TYPES:
+        raise ValueError("未知的變更券類型")
+    if ticket_type == "傳說技能選擇變更券" and not player.has_legend_skill():
+        raise ValueError("必須至少有一個傳說技能才能使用此變更券")
+    if ticket_type == "技能變更保護券" and protected_slot is None:
+        raise ValueError("必須指定保護的技能槽")
+
+def run_roster_simulation(players, ticket_plan, n, seed=None, workers=None, protected_slot=None, block_size=SIMULATION_BLOCK_SIZE, progress=None, should_stop=None):
+    # 每個位置各自從目前技能開始進行 n 次獨立試驗；
+    # progress(位置, 部分統計) 於每個區塊完成後呼叫，回傳 {"slots": {位置: 統計}, "errors": {位置: 訊息}, "seed": 主種子}
+    if n <= 0:
+        raise ValueError("模擬次數必須大於 0")
+    if n > MAX_SIMULATION_LIMIT:
+        raise ValueError(f"模擬次數不得超過系統上限 {MAX_SIMULATION_LIMIT} 次")
+    players = roster_players(players)
+    seed_seq = np.random.SeedSequence(seed)
+    slots = {}
+    errors = {}
+    plans = []
+    for index, (position_str, player_type, _) in enumerate(ROSTER_POSITIONS):
+        player = players[position_str]
+        ticket_type, slot = _roster_plan(ticket_plan, position_str, protected_slot)
+        if ticket_type is None:
+            continue
+        try:
+            _check_roster_plan(player, ticket_type, slot)
+        except ValueError as e:
+            errors[position_str] = str(e)
+            continue
+        skill_ids, levels = player_state_arrays(player)
+        slot_seq = np.random.SeedSequence(seed_seq.entropy, spawn_key=seed_seq.spawn_key + (index,))
+        slots[position_str] = SimulationStats(player_type)
+        plans.append((position_str, (player_type, player.is_legend, ticket_type), slot_seq, slot, skill_ids, levels))
+
+    # 區塊工作與 run_simulation 相同，邊執行邊產生；結果依送出順序取回，owners 記錄每個待取回區塊所屬的位置
+    owners = collections.deque()
+
+    def jobs():
+        for position_str, (player_type, is_legend, ticket_type), slot_seq, slot, skill_ids, levels in plans:
+            for block_index, size in enumerate(_block_sizes(n, block_size)):
+                owners.append((position_str, ticket_type))
+                yield (player_type, is_legend, ticket_type, size, _block_seed(slot_seq, block_index), slot, skill_ids, levels)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(plans) * -(-n // block_size)))
+    results = _iter_block_results(jobs(), workers)
+    try:
+        for part in results:
+            position_str, ticket_type = owners.popleft()
+            slots[position_str].merge(part)
+            if progress:
+                progress(position_str, part)
+            if should_stop and should_stop():
+                break
+    finally:
+        results.close()
+    for stats in slots.values():
+        stats.seed = seed_seq.entropy
+    return {"slots": slots, "errors": errors, "seed": seed_seq.entropy}
+
+def roster_summary(result):
+    # 各位置與全隊的傳說技能覆蓋率、等級總和分布與變更券使用次數
+    slots = {}
+    level_sum_counts = np.zeros(7, dtype=np.int64)
+    ticket_counts = np.zeros(len(TICKET_TYPES), dtype=np.int64)
+    simulation_count = 0
+    legend_count = 0
+    expected_legend_slots = 0.0
+    slots_with_legend = 0
+    for position_str, stats in result["slots"].items():
+        slot_legend_rate = stats.legend_count / stats.simulation_count if stats.simulation_count else 0.0
+        slots[position_str] = dict(stats.to_dict(), legend_rate=slot_legend_rate)
+        level_sum_counts += stats.level_sum_counts
+        ticket_counts += stats.ticket_counts
+        simulation_count += stats.simulation_count
+        legend_count += stats.legend_count
+        expected_legend_slots += slot_legend_rate
+        slots_with_legend += stats.legend_count > 0
+    team = {
+        "slot_count": len(slots),
+        "simulation_count": simulation_count,
+        "legend_count": legend_count,
+        # 每個位置使用一次計畫後，預期擁有傳說技能的位置數與比例
+        "expected_legend_slots": expected_legend_slots,
+        "legend_coverage": expected_legend_slots / len(slots) if slots else 0.0,
+        "slots_with_legend": slots_with_legend,
+        "level_sum_stats": {level_sum: int(count) for level_sum, count in zip(range(3, 10), level_sum_counts)},
+        "ticket_usage_stats": {ticket_type: int(count) for ticket_type, count in zip(TICKET_TYPES, ticket_counts)}
+    }
+    return {"slots": slots, "team": team, "errors": dict(result["errors"]), "seed": result["seed"]}
+
+# 背景全隊模擬：每個區塊完成後將 {位置: 部分統計} 放入佇列，結束時放入全隊摘要
+def roster_simulation_worker(players, ticket_type, n, progress_queue, stop_event):
+    try:
+        result = run_roster_simulation(
+            players, ticket_type, n,
+            progress=lambda position_str, part: progress_queue.put(("roster", {position_str: part}, None)),
+            should_stop=stop_event.is_set
+        )
+        progress_queue.put(("summary", roster_summary(result), None))
+    except ValueError as e:
+        progress_queue.put(("error", str(e), None))
+    progress_queue.put(("done", None, None))
+
+# 陣列化陣容儲存：每個陣容為 26 個位置（順序同 ROSTER_POSITIONS），每個位置記錄技能編號、等級與傳說球員旗標；
+# 大量假設陣容可集中放在一個結構化陣列中，PlayerView 直接讀寫陣列內容，不複製資料
+ROSTER_DTYPE = np.dtype([("skill_id", np.int16, (3,)), ("level", np.int8, (3,)), ("is_legend", np.bool_), ("is_black_diamond", np.bool_)])
+ROSTER_INDEX = {position_str: index for index, (position_str, _, _) in enumerate(ROSTER_POSITIONS)}
+
+class PlayerView:
+    # 指向 RosterStore 陣列中一個位置的檢視：skill_ids、levels 直接是陣列的檢視（可讀寫、不複製），
+    # Skill 物件只在 to_skills / to_player（圖形介面載入時）才建立
+    __slots__ = ("store", "roster_index", "slot_index", "player_type", "position")
+
+    def __init__(self, store, roster_index, slot_index):
+        self.store = store
+        self.roster_index = roster_index
+        self.slot_index = slot_index
+        _, self.player_type, self.position = ROSTER_POSITIONS[slot_index]
+
+    @property
+    def skill_ids(self):
+        return self.store.data["skill_id"][self.roster_index, self.slot_index]
+
+    @property
+    def levels(self):
+        return self.store.data["level"][self.roster_index, self.slot_index]
+
+    @property
+    def is_legend(self):
+        return bool(self.store.data["is_legend"][self.roster_index, self.slot_index])
+
+    @is_legend.setter
+    def is_legend(self, value):
+        self.store.data["is_legend"][self.roster_index, self.slot_index] = value
+
+    @property
+    def is_black_diamond(self):
+        return bool(self.store.data["is_black_diamond"][self.roster_index, self.slot_index])
+
+    @is_black_diamond.setter
+    def is_black_diamond(self, value):
+        self.store.data["is_black_diamond"][self.roster_index, self.slot_index] = value
+
+    def set_skill(self, slot, skill):
+        self.skill_ids[slot] = SKILL_CATALOGS[self.player_type].skill_id(skill)
+        self.levels[slot] = skill.level if skill else 0
+
+    def set_skills(self, skills):
+        for slot, skill in enumerate(skills):
+            self.set_skill(slot, skill)
+
+    @property
+    def skills(self):
+        # 唯讀，每次存取都建立 Skill 物件，供 simulate_skill_change 等以 Player 為介面的程式使用
+        return self.to_skills()
+
+    def has_legend_skill(self):
+        return bool((self.skill_ids >= SKILL_CATALOGS[self.player_type].tier_ranges[SkillTier.LEGEND][0]).any())
+
+    def is_legend_skill_in_slot(self, slot):
+        return bool(self.skill_ids[slot] >= SKILL_CATALOGS[self.player_type].tier_ranges[SkillTier.LEGEND][0])
+
+    def to_skills(self):
+        return skills_from_arrays(self.player_type, self.skill_ids, self.levels)
+
+    def to_player(self):
+        player = Player(self.player_type, self.position, self.is_legend, self.is_black_diamond)
+        player.skills = self.to_skills()
+        return player
+
+class RosterStore:
+    def __init__(self, capacity=16):
+        self.data = self._empty(max(capacity, 1))
+        self.size = 0
+
+    @staticmethod
+    def _empty(capacity):
+        data = np.zeros((capacity, len(ROSTER_POSITIONS)), dtype=ROSTER_DTYPE)
+        data["skill_id"] = -1
+        data["is_black_diamond"] = True
+        return data
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, count):
+        if self.size + count > len(self.data):
+            data = self._empty(max(self.size + count, len(self.data) * 2))
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+
+    def append(self, players=None):
+        # players 為 {位置: Player}，未設定的位置為空技能槽；回傳新陣容的編號
+        self._reserve(1)
+        index = self.size
+        self.size += 1
+        for position_str, player in (players or {}).items():
+            view = PlayerView(self, index, ROSTER_INDEX[position_str])
+            view.is_legend = player.is_legend
+            view.is_black_diamond = player.is_black_diamond
+            view.set_skills(player.skills)
+        return index
+
+    def extend(self, skill_ids, levels, is_legend=False):
+        # 整批加入 (k, 26, 3) 的技能編號與等級；回傳新陣容的編號範圍
+        skill_ids = np.asarray(skill_ids, dtype=np.int16).reshape(-1, len(ROSTER_POSITIONS), 3)
+        count = len(skill_ids)
+        self._reserve(count)
+        rows = slice(self.size, self.size + count)
+        self.data["skill_id"][rows] = skill_ids
+        self.data["level"][rows] = np.asarray(levels, dtype=np.int8).reshape(skill_ids.shape)
+        self.data["is_legend"][rows] = is_legend
+        self.size += count
+        return range(rows.start, rows.stop)
+
+    def view(self, index, position_str):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return PlayerView(self, index, ROSTER_INDEX[position_str])
+
+    def roster(self, index):
+        return {position_str: self.view(index, position_str) for position_str in ROSTER_INDEX}
+
+    def to_players(self, index):
+        # 複製為一般 Player 物件（技能、傳說球員與黑鑽旗標；陣列中不存統計，統計為空），供圖形介面載入
+        return {position_str: view.to_player() for position_str, view in self.roster(index).items()}
+
+    @property
+    def rosters(self):
+        return self.data[:self.size]
+
+    def legend_slots(self):
+        # 每個陣容中擁有傳說技能的位置數
+        legend_starts = np.array([
+            SKILL_CATALOGS[player_type].tier_ranges[SkillTier.LEGEND][0] for _, player_type, _ in ROSTER_POSITIONS
+        ])
+        return (self.rosters["skill_id"] >= legend_starts[:, None]).any(axis=2).sum(axis=1)
+
+    def level_sums(self):
+        # (陣容數, 26) 的等級總和
+        return self.rosters["level"].sum(axis=2, dtype=np.int64)
+
+# 背景模擬：連續使用同一種變更券，每處理一個區塊便將部分統計與最新技能放入佇列
+# 指定 precision 時，從 base_stats 開始累計，區間半寬都不超過 precision 即停止
+def simulation_worker(player_type, is_legend, ticket_type, n, protected_slot, skills, progress_queue, stop_event, precision=None, base_stats=None):
+    try:
+        if ticket_type in REROLL_TICKET_TYPES:
+            # 重抽型變更券的結果與目前技能無關，可整批計算
+            rng = np.random.default_rng()
+            running = base_stats.snapshot() if base_stats else SimulationStats(player_type)
+            for size in _block_sizes(n, SIMULATION_CHUNK_SIZE):
+                if stop_event.is_set():
+                    break
+                start = time.perf_counter() if INSTRUMENTATION.enabled else None
+                skill_ids, _, levels = simulate_skill_change_batch(player_type, is_legend, ticket_type, size, rng)
+                if start is not None:
+                    INSTRUMENTATION.add_draws(ticket_type, size, time.perf_counter() - start)
+                with INSTRUMENTATION.phase("stats.add_batch"):
+                    stats = _block_stats(player_type, ticket_type, skill_ids, levels)
+                progress_queue.put(("progress", stats, skills_from_arrays(player_type, skill_ids[-1], levels[-1])))
+                if precision is not None:
+                    running.merge(stats)
+                    if precision_reached(running, precision):
+                        break
+        else:
+            # 其他變更券依目前技能連續變更，傳說技能選擇變更券直接採用變更後的技能
+            player = Player(player_type, None, is_legend)
+            player.skills = list(skills)
+            for size in _block_sizes(n, SIMULATION_CHUNK_SIZE):
+                if stop_event.is_set():
+                    break
+                start = time.perf_counter() if INSTRUMENTATION.enabled else None
+                for _ in range(size):
+                    player.skills = simulate_skill_change(player, ticket_type, protected_slot)
+                if start is not None:
+                    INSTRUMENTATION.add_draws(ticket_type, size, time.perf_counter() - start)
+                stats = SimulationStats(player_type)
+                stats.add_tickets(ticket_type, size)
+                progress_queue.put(("progress", stats, list(player.skills)))
+    except ValueError as e:
+        progress_queue.put(("error", str(e), None))
+    progress_queue.put(("done", None, None))
+
+# 背景模擬（指定種子）：只用於重抽型變更券，每次試驗彼此獨立、結果可重現；
+# 先查詢快取，命中時一次回報完整統計，否則每個區塊完成後回報部分統計
+def seeded_simulation_worker(cache, player_type, is_legend, ticket_type, n, seed, progress_queue, stop_event):
+    def report(part):
+        progress_queue.put(("progress", part, None))
+
+    try:
+        stats, hit = cached_run_simulation(
+            cache, player_type, is_legend, ticket_type, n, seed=seed,
+            should_stop=stop_event.is_set, on_block=report
+        )
+        if hit:
+            report(stats)
+    except ValueError as e:
+        progress_queue.put(("error", str(e), None))
+    progress_queue.put(("done", None, None))
+
+# 統計驗證
+def _regularized_gamma_q(a, x):
+    if x <= 0:
+        return 1.0
+    log_prefactor = -x + a * math.log(x) - math.lgamma(a)
+    if x < a + 1:
+        # 級數展開
+        term = total = 1.0 / a
+        k = a
+        for _ in range(10000):
+            k += 1
+            term *= x / k
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(log_prefactor))
+    # 連分數展開（Lentz 法）
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        if abs(d) < tiny:
+            d = tiny
+        c = b + an / c
+        if abs(c) < tiny:
+            c = tiny
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefactor) * h
+
+def chi2_sf(statistic, dof):
+    return _regularized_gamma_q(dof / 2, statistic / 2)
+
+def chi2_homogeneity_test(counts_a, counts_b):
+    table = np.array([counts_a, counts_b], dtype=float)
+    table = table[:, table.sum(axis=0) > 0]
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0) / table.sum()
+    statistic = float(((table - expected) ** 2 / expected).sum())
+    dof = table.shape[1] - 1
+    return statistic, dof, chi2_sf(statistic, dof)
+
+def _super_outcome_counts(skill_ids, levels, catalog):
+    # 分組：第一技能槽是否為傳說技能 × 等級組合
+    legend_start = catalog.tier_ranges[SkillTier.LEGEND][0]
+    levels = np.asarray(levels, dtype=np.int64) - 1
+    cells = (np.asarray(skill_ids)[:, 0] >= legend_start) * 27 + levels[:, 0] * 9 + levels[:, 1] * 3 + levels[:, 2]
+    return np.bincount(cells, minlength=54)
+
+def verify_super_sampler(player_type=PlayerType.PITCHER, n=200000, scalar_n=50000, seed=0):
+    # 以卡方齊一性檢定比較直接抽樣與原本重抽規則的結果分布，回傳各路徑的 (統計量, 自由度, p 值)
+    catalog = SKILL_CATALOGS[player_type]
+    rng = np.random.default_rng(seed)
+    reference = _super_outcome_counts(*_super_reroll_by_rejection(catalog, n, rng), catalog)
+
+    skill_ids, _, levels = simulate_skill_change_batch(player_type, False, "最高級技能變更券", n, rng)
+    results = {"batch": chi2_homogeneity_test(reference, _super_outcome_counts(skill_ids, levels, catalog))}
+
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        player = Player(player_type, None)
+        draws = [simulate_skill_change(player, "最高級技能變更券") for _ in range(scalar_n)]
+    finally:
+        random.setstate(state)
+    skill_ids = [[catalog.skill_id(skill) for skill in skills] for skills in draws]
+    levels = [[skill.level for skill in skills] for skills in draws]
+    results["scalar"] = chi2_homogeneity_test(reference, _super_outcome_counts(skill_ids, levels, catalog))
+    return results
+
+# 機率一致性檢驗：以固定種子大量抽樣，對精確機率進行卡方適合度與二項檢定；
+# 整體誤報率控制在 alpha（Bonferroni 校正，每項檢定以 alpha / 檢定數為門檻）
+CONFORMANCE_ALPHA = 1e-3
+
+def chi2_goodness_of_fit(counts, probs):
+    counts = np.asarray(counts, dtype=float)
+    probs = np.asarray(probs, dtype=float)
+    impossible = probs <= 0
+    if counts[impossible].any():
+        return math.inf, int((~impossible).sum()) - 1, 0.0
+    counts = counts[~impossible]
+    expected = probs[~impossible] / probs[~impossible].sum() * counts.sum()
+    dof = len(counts) - 1
+    if dof <= 0:
+        return 0.0, 0, 1.0
+    statistic = float(((counts - expected) ** 2 / expected).sum())
+    return statistic, dof, chi2_sf(statistic, dof)
+
+def binomial_test(successes, trials, prob):
+    # 雙尾檢定（常態近似，含連續性校正）；機率為 0 或 1 時結果必須完全相符
+    if prob <= 0 or prob >= 1:
+        return 1.0 if successes == trials * prob else 0.0
+    z = max(0.0, abs(successes - trials * prob) - 0.5) / math.sqrt(trials * prob * (1 - prob))
+    load_runtime_modules()
+    return 2 * statistics.NormalDist().cdf(-z)
+
+def _published_checks():
+    # PROBABILITIES 中每次抽取的技能機率應等於從剩餘技能池均勻抽取（表中數值四捨五入至 0.0001%）
+    results = {}
+    for player_type, table in PROBABILITIES.items():
+        pool_size = SKILL_CATALOGS[player_type].pool_size
+        expected = {
+            "base": [1 / pool_size, 1 / (pool_size - 1), 1 / (pool_size - 2)],
+            "legend_first": [1.0, 1 / pool_size, 1 / (pool_size - 1)]
+        }
+        for key, values in expected.items():
+            matched = all(abs(a - b) < 1e-6 for a, b in zip(table[key], values))
+            results[f"published/{player_type.value}/{key}"] = 1.0 if matched else 0.0
+    return results
+
+def _reference_player(player_type, is_legend):
+    # 第一技能槽為傳說技能，所有變更券都能使用
+    catalog = SKILL_CATALOGS[player_type]
+    player = Player(player_type, None, is_legend)
+    player.set_skill(0, catalog.skill(catalog.tier_ranges[SkillTier.LEGEND][0], 3))
+    player.set_skill(1, catalog.skill(0, 2))
+    player.set_skill(2, catalog.skill(1, 1))
+    return player
+
+def _conformance_tests(prefix, player_type, is_legend, ticket_type, skill_ids, levels, initial_ids, initial_levels, protected_slot):
+    # 回傳 {檢定名稱: p 值}
+    catalog = SKILL_CATALOGS[player_type]
+    pool_size = catalog.pool_size
+    legend_start, legend_stop = catalog.tier_ranges[SkillTier.LEGEND]
+    skill_ids = np.asarray(skill_ids, dtype=np.int64)
+    levels = np.asarray(levels, dtype=np.int64)
+    n = len(skill_ids)
+    results = {}
+
+    def uniform(ids, excluded=()):
+        probs = np.zeros(len(catalog))
+        probs[ids] = 1.0
+        probs[list(excluded)] = 0.0
+        return probs
+
+    def unchanged(slots):
+        same = (skill_ids[:, slots] == initial_ids[slots]).all() and (levels[:, slots] == initial_levels[slots]).all()
+        return 1.0 if same else 0.0
+
+    if ticket_type in REROLL_TICKET_TYPES:
+        exact = exact_distribution(player_type, is_legend, ticket_type)
+        results[f"{prefix}/legend"] = binomial_test(int((skill_ids[:, 0] >= legend_start).sum()), n, exact["legend_rate"])
+        level_sums = levels.sum(axis=1)
+        results[f"{prefix}/level_sum"] = chi2_goodness_of_fit(
+            np.bincount(level_sums - 3, minlength=7)[:7], [exact["level_sum"][total] for total in range(3, 10)]
+        )[2]
+        for slot in range(3):
+            results[f"{prefix}/slot{slot + 1}"] = chi2_goodness_of_fit(
+                np.bincount(skill_ids[:, slot], minlength=len(catalog)), exact["slot_probs"][slot]
+            )[2]
+        # 最高級技能變更券（非傳說卡）的等級彼此相關，以等級總和檢定即可
+        if not (ticket_type == "最高級技能變更券" and not is_legend):
+            level_probs = [0.0, 0.0, 1.0] if is_legend else [LEVEL_PROB["等級1"], LEVEL_PROB["等級2"], LEVEL_PROB["等級3"]]
+            results[f"{prefix}/levels"] = chi2_goodness_of_fit(np.bincount(levels.ravel() - 1, minlength=3), level_probs)[2]
+    elif ticket_type == "傳說技能選擇變更券":
+        results[f"{prefix}/slot1"] = chi2_goodness_of_fit(
+            np.bincount(skill_ids[:, 0], minlength=len(catalog)),
+            uniform(range(legend_start, legend_stop), [initial_ids[0]])
+        )[2]
+        results[f"{prefix}/unchanged"] = unchanged([1, 2])
+    elif ticket_type == "技能變更保護券":
+        rerolled = [slot for slot in range(3) if slot != protected_slot]
+        for slot in rerolled:
+            results[f"{prefix}/slot{slot + 1}"] = chi2_goodness_of_fit(
+                np.bincount(skill_ids[:, slot], minlength=len(catalog)),
+                uniform(range(pool_size), [initial_ids[protected_slot]])
+            )[2]
+        distinct = (skill_ids[:, rerolled[0]] != skill_ids[:, rerolled[1]]).all()
+        results[f"{prefix}/distinct"] = 1.0 if distinct else 0.0
+        if is_legend:
+            results[f"{prefix}/unchanged"] = unchanged([protected_slot]) * (1.0 if (levels[:, rerolled] == 3).all() else 0.0)
+        else:
+            results[f"{prefix}/unchanged"] = 1.0 if (levels == initial_levels).all() and unchanged([protected_slot]) else 0.0
+    else:
+        results[f"{prefix}/slot{protected_slot + 1}"] = chi2_goodness_of_fit(
+            np.bincount(skill_ids[:, protected_slot], minlength=len(catalog)),
+            uniform(range(pool_size), [initial_ids[protected_slot]])
+        )[2]
+        results[f"{prefix}/unchanged"] = unchanged([slot for slot in range(3) if slot != protected_slot])
+    return results
+
+def conformance_configs():
+    # 依固定順序列出 (編號, 球員類型, 是否為傳說卡, 變更券)，編號決定該設定的亂數種子
+    configs = itertools.product(PlayerType, (False, True), TICKET_TYPES)
+    return [(index, player_type, is_legend, ticket_type) for index, (player_type, is_legend, ticket_type) in enumerate(configs)]
+
+def conformance_case(index, player_type, is_legend, ticket_type, n=1000000, scalar_n=10000, seed=0):
+    # 單一設定以批次引擎抽 n 次、逐次引擎抽 scalar_n 次，回傳 {檢定名稱: p 值}
+    catalog = SKILL_CATALOGS[player_type]
+    player = _reference_player(player_type, is_legend)
+    initial_ids, initial_levels = player_state_arrays(player)
+    initial_ids = initial_ids.astype(np.int64)
+    initial_levels = initial_levels.astype(np.int64)
+    card_type = "傳說卡" if is_legend else "其他卡"
+    protected_slot = 1 if ticket_type in ["技能變更保護券", "技能選擇變更券"] else None
+    name = f"{player_type.value}/{card_type}/{ticket_type}"
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+    skill_ids, _, levels = simulate_skill_change_batch(
+        player_type, is_legend, ticket_type, n, rng,
+        protected_slot=protected_slot, skill_ids=initial_ids, levels=initial_levels
+    )
+    results = _conformance_tests(
+        f"batch/{name}", player_type, is_legend, ticket_type,
+        skill_ids, levels, initial_ids, initial_levels, protected_slot
+    )
+    if scalar_n:
+        state = random.getstate()
+        random.seed(seed * 1000003 + index)
+        try:
+            draws = [simulate_skill_change(player, ticket_type, protected_slot) for _ in range(scalar_n)]
+        finally:
+            random.setstate(state)
+        results.update(_conformance_tests(
+            f"scalar/{name}", player_type, is_legend, ticket_type,
+            [[catalog.skill_id(skill) for skill in skills] for skills in draws],
+            [[skill.level for skill in skills] for skills in draws],
+            initial_ids, initial_levels, protected_slot
+        ))
+    return results
+
+def run_conformance(n=1000000, scalar_n=10000, seed=0, alpha=CONFORMANCE_ALPHA):
+    # 每種球員類型、卡片類型與變更券各抽 n 次（批次引擎）與 scalar_n 次（逐次引擎）
+    results = _published_checks()
+    for config in conformance_configs():
+        results.update(conformance_case(*config, n=n, scalar_n=scalar_n, seed=seed))
+    threshold = alpha / len(results)
+    failures = {name: p_value for name, p_value in results.items() if p_value < threshold}
+    return {
+        "alpha": alpha,
+        "tests": len(results),
+        "threshold": threshold,
+        "passed": not failures,
+        "failures": failures,
+        "p_values": results
+    }
+
+# 效能基準：各熱點的每秒抽取次數、執行期間的記憶體用量峰值與結束後仍佔用的記憶體，可存成基準 JSON 並檢查效能退步
+BENCHMARK_THRESHOLD = 0.2
 
-    def __str__(self):
-        return f"{self.name} Lv.{self.level}"
+def benchmark_cases(quick=False):
+    # 回傳 [(名稱, 抽取次數, 函式)]，函式執行一次即完成該次數的抽取
+    scale = 10 if quick else 1
+    scalar_draws = 20000 // scale
+    batch_draws = SIMULATION_BLOCK_SIZE * 8 // scale
+    parallel_draws = 2000000 // scale
+    cases = []
+    for player_type in PlayerType:
+        for is_legend in (False, True):
+            player = _reference_player(player_type, is_legend)
+            card_type = "傳說卡" if is_legend else "其他卡"
+            for ticket_type in TICKET_TYPES:
+                protected_slot = 1 if ticket_type in ["技能變更保護券", "技能選擇變更券"] else None
+                def run_scalar(player=player, ticket_type=ticket_type, protected_slot=protected_slot):
+                    for _ in range(scalar_draws):
+                        simulate_skill_change(player, ticket_type, protected_slot)
+                cases.append((f"scalar/{player_type.value}/{card_type}/{ticket_type}", scalar_draws, run_scalar))
 
-# 球員類別
-class Player:
-    def __init__(self, player_type, position, is_legend=False, is_black_diamond=True):
-        self.player_type = player_type
-        self.position = position
-        self.is_legend = is_legend
-        self.is_black_diamond = is_black_diamond
-        self.skills = [None, None, None]
-        self.defensive_position = None
-        self.simulation_count = 0
-        self.legend_count = 0
-        self.level_sum_stats = {3: 0, 4: 0, 5: 0, 6: 0, 7: 0, 8: 0, 9: 0}
-        self.level_sum_count = 0
-        self.ticket_usage_stats = {
-            "技能變更券": 0,
-            "高級技能變更券": 0,
-            "最高級技能變更券": 0,
-            "傳說技能變更券": 0,
-            "傳說技能選擇變更券": 0,
-            "技能變更保護券": 0,
-            "技能選擇變更券": 0
-        }
+                skill_ids, levels = player_state_arrays(player)
+                def run_batch(player=player, ticket_type=ticket_type, protected_slot=protected_slot, skill_ids=skill_ids, levels=levels):
+                    rng = np.random.default_rng(0)
+                    for size in _block_sizes(batch_draws, SIMULATION_BLOCK_SIZE):
+                        simulate_skill_change_batch(
+                            player.player_type, player.is_legend, ticket_type, size, rng,
+                            protected_slot=protected_slot, skill_ids=skill_ids, levels=levels
+                        )
+                cases.append((f"batch/{player_type.value}/{card_type}/{ticket_type}", batch_draws, run_batch))
 
-    def set_skill(self, slot, skill):
-        self.skills[slot] = skill
+    for is_legend in (False, True):
+        card_type = "傳說卡" if is_legend else "其他卡"
+        def run_level(is_legend=is_legend):
+            for _ in range(scalar_draws):
+                get_skill_level(is_legend)
+        cases.append((f"level/{card_type}", scalar_draws, run_level))
 
-    def has_legend_skill(self):
-        return any(skill and skill.tier == SkillTier.LEGEND for skill in self.skills)
+    for workers in sorted({1, os.cpu_count() or 1}):
+        def run_parallel(workers=workers):
+            run_simulation(PlayerType.PITCHER, False, "最高級技能變更券", parallel_draws, seed=0, workers=workers)
+        cases.append((f"parallel/workers={workers}", parallel_draws, run_parallel))
+    return cases
 
-    def is_legend_skill_in_slot(self, slot):
-        return self.skills[slot] and self.skills[slot].tier == SkillTier.LEGEND
+def run_benchmarks(quick=False, pattern=None, repeats=3):
+    load_runtime_modules()
+    results = {}
+    for name, draws, function in benchmark_cases(quick):
+        if pattern and pattern not in name:
+            continue
+        random.seed(0)
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+        # 另外執行一次量測記憶體（tracemalloc 會拖慢執行，不計入時間）：
+        # peak_bytes 為執行期間同時佔用的最高量，取決於批次大小而非抽取次數；
+        # retained_bytes_per_draw 為結束後仍未釋放的配置量除以抽取次數，持續大於 0 代表有累積的配置
+        tracemalloc.start()
+        function()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            "draws": draws,
+            "draws_per_sec": draws / best,
+            "peak_bytes": peak,
+            "retained_bytes_per_draw": retained / draws
+        }
+    return results
 
-# 技能資料庫
-BATTER_SKILLS = {
-    SkillTier.BRONZE: ["代打專家", "鷹眼", "推打", "拉打", "左腕殺手", "右腕殺手", "守備將軍", "打點機器", "直球殺手", "集中力", "正面對決", "初球攻略"],
-    SkillTier.SILVER: ["精密打擊", "揮大棒打者", "訓練上癮", "巨砲本能", "開路先鋒", "筋疲力盡", "忍術", "下盤鍛錬", "逆轉的力量", "勝負天性", "動物本能", "信賴", "克服弱點"],
-    SkillTier.GOLD: ["雷射肩", "王牌殺手", "超級強打", "五拍子球員", "超能神話", "預知能力", "盜壘天王", "打擊機器", "自走砲", "萬眾矚目", "超級輔助", "強化優點", "廣角打者"],
-    SkillTier.LEGEND: ["打者洞察力", "精準打擊", "壞球打者", "先鋒", "天生巨星", "機會製造者", "打者默契", "最強打者", "老手"]
-}
+def compare_benchmarks(current, baseline, threshold=BENCHMARK_THRESHOLD):
+    # 回傳每秒抽取次數低於基準 (1 - threshold) 倍的項目
+    regressions = {}
+    for name, result in current.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        ratio = result["draws_per_sec"] / reference["draws_per_sec"]
+        if ratio < 1 - threshold:
+            regressions[name] = {
+                "baseline": reference["draws_per_sec"],
+                "current": result["draws_per_sec"],
+                "ratio": ratio
+            }
+    return regressions
 
-PITCHER_SKILLS = {
-    SkillTier.BRONZE: ["牽制王", "平靜", "佛祖保佑", "危機克服", "光速投球", "魔球大師", "左打殺手", "右打殺手", "鋼鐵人", "老謀深算", "強心臟", "冰凍"],
-    SkillTier.SILVER: ["強力投手", "控球藝術家", "強打殺手", "國寶投手", "逆轉大師", "狙擊手", "野戰指揮", "投球機器", "布局", "乘勝追擊", "救火隊", "安全感", "調整節奏"],
-    SkillTier.GOLD: ["決勝球", "巨人殺手", "自我解決", "大吃局數", "王牌", "最後大魔王", "無法觸碰", "門志", "技巧派投手", "壓倒性投手", "王牌終結者", "滾地球投手", "交錯之火", "投球協調者"],
-    SkillTier.LEGEND: ["投手洞察力", "精準控球", "速球型投手", "先守後攻", "牛棚日", "合力投球", "投手默契", "工作馬", "完美先生"]
-}
+def save_benchmarks(path, results):
+    data = {"python": sys.version.split()[0], "numpy": np.__version__, "cases": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
 
-# 機率表
-PROBABILITIES = {
-    PlayerType.BATTER: {
-        "base": [2.6316 / 100, 2.7027 / 100, 2.7778 / 100],
-        "legend_first": [1.0, 2.6316 / 100, 2.7027 / 100],
-        "legend_held": [2.7778 / 100, 2.8571 / 100],
-        "no_legend_held": [2.8571 / 100, 2.9412 / 100]
-    },
-    PlayerType.PITCHER: {
-        "base": [2.5641 / 100, 2.6316 / 100, 2.7027 / 100],
-        "legend_first": [1.0, 2.5641 / 100, 2.6316 / 100],
-        "legend_held": [2.7027 / 100, 2.7778 / 100],
-        "no_legend_held": [2.7778 / 100, 2.8571 / 100]
-    }
-}
+def load_benchmarks(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["cases"]
 
-# 傳說技能出現機率
-LEGEND_PROBABILITIES = {
-    "傳說卡": {
-        "高級技能變更券": 0.20,
-        "最高級技能變更券": 0.25,
-        "傳說技能變更券": 1.00,
-        "傳說技能選擇變更券": 1.00,
-    },
-    "其他卡": {
-        "高級技能變更券": 0.10,
-        "最高級技能變更券": 0.15,
-        "傳說技能變更券": 1.00,
-        "傳說技能選擇變更券": 1.00,
+# 本機模擬服務：以 asyncio 提供 HTTP/JSON 介面，預設只監聽本機位址，每個連線處理一個請求
+#   POST /simulate       {"type", "ticket", "n", "legend", "skills", "slot", "seed", "stream"}
+#   DELETE /jobs/<編號>  取消執行中的工作
+#   GET /health          服務狀態與執行中的工作進度
+# 相同設定、未指定種子的小型請求在短暫的時間窗內合併為一次批次抽取，再依各請求的次數切分統計；
+# 其餘請求切成區塊送入行程池，結果與相同種子的 run_simulation 相同，stream 為 true 時逐區塊回傳進度（NDJSON）；
+# 所有請求共用上限為 max_concurrency 的區塊名額，用戶端中斷連線或取消時，尚未開始的區塊隨之取消
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_COALESCE_WINDOW = 0.005
+SERVICE_COALESCE_MAX_TRIALS = SIMULATION_BLOCK_SIZE
+SERVICE_MAX_BODY_BYTES = 1 << 20
+
+def parse_service_request(payload):
+    if not isinstance(payload, dict):
+        raise ValueError("請求內容必須為 JSON 物件")
+    # JSON 的各欄位型別都可能不符，先檢查型別再查表，確保錯誤都以 ValueError 回報
+    player_type_name = payload.get("type", "pitcher")
+    if not isinstance(player_type_name, str) or player_type_name not in PLAYER_TYPE_CHOICES:
+        raise ValueError("未知的球員類型")
+    player_type = PLAYER_TYPE_CHOICES[player_type_name]
+    ticket_type = payload.get("ticket")
+    if not isinstance(ticket_type, str) or ticket_type not in TICKET_TYPES:
+        raise ValueError("未知的變更券類型")
+    n = parse_simulation_count(str(payload.get("n", 10000)))
+    if n <= 0:
+        raise ValueError("模擬次數必須大於 0")
+    if n > MAX_SIMULATION_LIMIT:
+        raise ValueError(f"模擬次數不得超過系統上限 {MAX_SIMULATION_LIMIT} 次")
+    is_legend = payload.get("legend", False)
+    if not isinstance(is_legend, bool):
+        raise ValueError("legend 必須為 true 或 false")
+    skills = payload.get("skills")
+    if skills is None:
+        skills = []
+    if not isinstance(skills, list) or not all(isinstance(text, str) for text in skills):
+        raise ValueError("skills 必須為技能字串的陣列")
+    skill_ids, levels = initial_state_arrays(player_type, is_legend, skills)
+    slot = payload.get("slot")
+    if slot is not None and (isinstance(slot, bool) or slot not in (1, 2, 3)):
+        raise ValueError("技能槽必須為 1~3")
+    if ticket_type == "技能變更保護券" and slot is None:
+        raise ValueError("必須指定保護的技能槽")
+    seed = payload.get("seed")
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+        raise ValueError("seed 必須為非負整數")
+    return {
+        "player_type": player_type,
+        "is_legend": is_legend,
+        "ticket_type": ticket_type,
+        "n": n,
+        "protected_slot": None if slot is None else slot - 1,
+        "skill_ids": skill_ids,
+        "levels": levels,
+        "seed": seed
     }
-}
 
-# 技能等級機率
-LEVEL_PROB = {"等級1": 0.34, "等級2": 0.33, "等級3": 0.33}
+def _service_worker_ready():
+    return os.getpid()
 
-# 技能等級總和機率（普通情況）
-LEVEL_SUM_PROB_DEFAULT = {
-    3: 0.34 * 0.34 * 0.34,
-    4: 3 * (0.34 * 0.34 * 0.33),
-    5: 3 * (0.34 * 0.33 * 0.33) + 3 * (0.34 * 0.33 * 0.34),
-    6: 3 * (0.34 * 0.33 * 0.33) + 3 * (0.33 * 0.33 * 0.33),
-    7: 3 * (0.33 * 0.33 * 0.33) + 3 * (0.33 * 0.33 * 0.34),
-    8: 3 * (0.33 * 0.33 * 0.34),
-    9: 0.33 * 0.33 * 0.33
-}
+class SimulationService:
+    def __init__(self, host=SERVICE_HOST, port=SERVICE_PORT, workers=None, max_concurrency=None, coalesce_window=SERVICE_COALESCE_WINDOW, coalesce_max_trials=SERVICE_COALESCE_MAX_TRIALS, block_size=SIMULATION_BLOCK_SIZE):
+        load_service_modules()
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.workers * 2
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_trials = coalesce_max_trials
+        self.block_size = block_size
+        self.server = None
+        self.executor = None
+        self._semaphore = None
+        # 等待合併的請求：設定 -> [(次數, future)]
+        self._pending = {}
+        self._flushes = set()
+        self._jobs = {}
+        self._job_ids = itertools.count(1)
 
-# 技能等級總和機率（最高級技能變更券，總和至少為 5）
-LEVEL_SUM_PROB_SUPER = {
-    3: 0.0,
-    4: 0.0,
-    5: 0.266495,
-    6: 0.304984,
-    7: 0.258657,
-    8: 0.127398,
-    9: 0.042466
-}
+    async def start(self):
+        load_runtime_modules()
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        # 開始監聽前先啟動所有工作行程；否則工作行程會在第一個連線處理中才 fork，
+        # 繼承已接受連線的 socket，關閉連線時用戶端收不到 FIN
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _service_worker_ready) for _ in range(self.workers)))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
 
-# 系統模擬次數上限
-MAX_SIMULATION_LIMIT = 10000
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        for job in list(self._jobs.values()):
+            job["task"].cancel()
+        for task in list(self._flushes):
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
 
-def get_skill_level(is_legend_player):
-    if is_legend_player:
-        return 3
-    level = random.choices(
-        ["等級1", "等級2", "等級3"],
-        weights=[LEVEL_PROB["等級1"], LEVEL_PROB["等級2"], LEVEL_PROB["等級3"]],
-        k=1
-    )[0]
-    return int(level.split("等級")[-1])
+    async def __aenter__(self):
+        return await self.start()
 
-def simulate_skill_change(player, ticket_type, protected_slot=None):
-    skills_db = BATTER_SKILLS if player.player_type == PlayerType.BATTER else PITCHER_SKILLS
-    probs = PROBABILITIES[player.player_type]
-    all_skills = []
-    for tier in [SkillTier.BRONZE, SkillTier.SILVER, SkillTier.GOLD]:
-        all_skills.extend([(name, tier) for name in skills_db[tier]])
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
 
-    card_type = "傳說卡" if player.is_legend else "其他卡"
-    legend_prob = LEGEND_PROBABILITIES[card_type].get(ticket_type, 0.0)
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
 
-    selected_skills = [None, None, None]
-    remaining_skills = all_skills.copy()
+    async def _submit(self, function, *args):
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
 
-    if ticket_type == "技能變更券":
-        for slot in range(3):
-            prob = probs["base"][slot]
-            weights = [prob] * len(remaining_skills)
-            skill_name, skill_tier = random.choices(remaining_skills, weights=weights, k=1)[0]
-            level = 3 if player.is_legend else get_skill_level(player.is_legend)
-            selected_skills[slot] = Skill(skill_name, skill_tier, level)
-            remaining_skills.remove((skill_name, skill_tier))
-        return selected_skills
+    async def _coalesced(self, request):
+        key = (
+            request["player_type"], request["is_legend"], request["ticket_type"], request["protected_slot"],
+            tuple(request["skill_ids"].tolist()), tuple(request["levels"].tolist())
+        )
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_later(self.coalesce_window, self._start_flush, key, batch)
+        batch.append((request["n"], future))
+        if sum(n for n, _ in batch) >= self.coalesce_max_trials:
+            self._start_flush(key, batch)
+        return await future
 
-    elif ticket_type in ["高級技能變更券", "最高級技能變更券", "傳說技能變更券"]:
-        if random.random() < legend_prob:
-            legend_skills = [(name, SkillTier.LEGEND) for name in skills_db[SkillTier.LEGEND]]
-            skill_name, skill_tier = random.choice(legend_skills)
-            level = 3 if player.is_legend else get_skill_level(player.is_legend)
-            selected_skills[0] = Skill(skill_name, skill_tier, level)
-        else:
-            gold_skills = [(name, SkillTier.GOLD) for name in skills_db[SkillTier.GOLD]]
-            skill_name, skill_tier = random.choice(gold_skills)
-            level = 3 if player.is_legend else get_skill_level(player.is_legend)
-            selected_skills[0] = Skill(skill_name, skill_tier, level)
-            remaining_skills.remove((skill_name, skill_tier))
-
-        for slot in range(1, 3):
-            prob = probs["base"][slot]
-            weights = [prob] * len(remaining_skills)
-            skill_name, skill_tier = random.choices(remaining_skills, weights=weights, k=1)[0]
-            level = 3 if player.is_legend else get_skill_level(player.is_legend)
-            selected_skills[slot] = Skill(skill_name, skill_tier, level)
-            remaining_skills.remove((skill_name, skill_tier))
-
-        if ticket_type == "最高級技能變更券":
-            while True:
-                total_level = sum(skill.level for skill in selected_skills if skill)
-                if total_level >= 5 or player.is_legend:
-                    break
-                selected_skills = simulate_skill_change(player, "高級技能變更券", protected_slot)
+    def _start_flush(self, key, batch):
+        # 時間窗結束或累計次數達上限時送出，同一批只送出一次
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        task = asyncio.ensure_future(self._flush(key, batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
 
-        return selected_skills
+    async def _flush(self, key, batch):
+        # 已取消的請求不再抽取
+        batch = [(n, future) for n, future in batch if not future.done()]
+        if not batch:
+            return
+        player_type, is_legend, ticket_type, protected_slot, skill_ids, levels = key
+        sizes = [n for n, _ in batch]
+        task = (
+            player_type, is_legend, ticket_type, sum(sizes), np.random.SeedSequence(), protected_slot,
+            np.array(skill_ids, dtype=np.int16), np.array(levels, dtype=np.int8)
+        )
+        try:
+            parts = await self._submit(_run_coalesced_block, task, sizes)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), part in zip(batch, parts):
+            if not future.done():
+                future.set_result((part, len(batch)))
 
-    elif ticket_type == "傳說技能選擇變更券":
-        if not player.has_legend_skill():
-            raise ValueError("必須至少有一個傳說技能才能使用此變更券")
+    async def _run_blocks(self, request, progress):
+        seed_seq = np.random.SeedSequence(request["seed"])
+        tasks = [
+            asyncio.ensure_future(self._submit(_run_block, (
+                request["player_type"], request["is_legend"], request["ticket_type"], size, _block_seed(seed_seq, index),
+                request["protected_slot"], request["skill_ids"], request["levels"]
+            )))
+            for index, size in enumerate(_block_sizes(request["n"], self.block_size))
+        ]
+        stats = SimulationStats(request["player_type"])
+        try:
+            # 計數相加與順序無關，區塊完成即併入
+            for next_part in asyncio.as_completed(tasks):
+                stats.merge(await next_part)
+                await progress(stats.draw_count, request["n"])
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        stats.seed = seed_seq.entropy
+        return stats
 
-        # 找到第一個傳說技能的槽位
-        legend_slot = None
-        for slot in range(3):
-            if player.skills[slot] and player.skills[slot].tier == SkillTier.LEGEND:
-                legend_slot = slot
+    async def simulate(self, request, progress=None):
+        if progress is None:
+            async def progress(done, total):
+                pass
+        if request["seed"] is None and request["n"] <= self.coalesce_max_trials:
+            stats, batch_size = await self._coalesced(request)
+        else:
+            stats, batch_size = await self._run_blocks(request, progress), 1
+        result = stats.to_dict()
+        result["ticket_type"] = request["ticket_type"]
+        result["is_legend"] = request["is_legend"]
+        result["legend_rate"] = stats.legend_count / stats.simulation_count if stats.simulation_count else 0.0
+        # 與此請求合併抽取的請求數
+        result["coalesced"] = batch_size
+        return result
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise ValueError("無效的 HTTP 請求")
+        method, target, _ = request_line
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
                 break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > SERVICE_MAX_BODY_BYTES:
+            raise ValueError("請求內容過大")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], body
 
-        if legend_slot is None:
-            raise ValueError("未找到傳說技能，無法使用此變更券")
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
 
-        # 保留原始技能
-        selected_skills = player.skills.copy()
+    async def _write_line(self, writer, payload):
+        # 串流回應以 chunked 編碼逐行傳送 JSON
+        data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
 
-        # 只對第一個傳說技能的槽位進行變更，並保留原始等級
-        legend_skills = [(name, SkillTier.LEGEND) for name in skills_db[SkillTier.LEGEND]]
-        current_skill = selected_skills[legend_slot]
-        original_level = current_skill.level  # 取得原始技能等級
-        if current_skill:
-            skill_tuple = (current_skill.name, current_skill.tier)
-            if skill_tuple in legend_skills:
-                legend_skills.remove(skill_tuple)
-        skill_name, skill_tier = random.choice(legend_skills)
-        # 使用原始等級，而不是重新生成
-        selected_skills[legend_slot] = Skill(skill_name, skill_tier, original_level)
-        return selected_skills
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, path, body = await self._read_request(reader)
+                if path == "/health":
+                    if method != "GET":
+                        await self._respond(writer, 405, {"error": "不支援的方法"})
+                        return
+                    await self._respond(writer, 200, {
+                        "status": "ok",
+                        "workers": self.workers,
+                        "max_concurrency": self.max_concurrency,
+                        "jobs": {job_id: {"done": job["done"], "total": job["total"]} for job_id, job in self._jobs.items()}
+                    })
+                elif path.startswith("/jobs/"):
+                    if method != "DELETE":
+                        await self._respond(writer, 405, {"error": "不支援的方法"})
+                        return
+                    job = self._jobs.get(int(path[len("/jobs/"):]))
+                    if job is None:
+                        await self._respond(writer, 404, {"error": "找不到此工作"})
+                        return
+                    job["task"].cancel()
+                    await self._respond(writer, 200, {"cancelled": True})
+                elif path == "/simulate":
+                    if method != "POST":
+                        await self._respond(writer, 405, {"error": "不支援的方法"})
+                        return
+                    try:
+                        payload = json.loads(body or b"{}")
+                    except json.JSONDecodeError:
+                        raise ValueError("請求內容不是有效的 JSON")
+                    await self._handle_simulate(reader, writer, parse_service_request(payload), bool(payload.get("stream")))
+                else:
+                    await self._respond(writer, 404, {"error": "找不到此路徑"})
+            except ValueError as e:
+                await self._respond(writer, 400, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
 
-    elif ticket_type == "技能變更保護券":
-        if protected_slot is None:
-            raise ValueError("必須指定保護的技能槽")
-        selected_skills = [None, None, None]
-        remaining_skills = all_skills.copy()
-        if player.skills[protected_slot]:
-            selected_skills[protected_slot] = player.skills[protected_slot]
-            if (player.skills[protected_slot].name, player.skills[protected_slot].tier) in remaining_skills:
-                remaining_skills.remove((player.skills[protected_slot].name, player.skills[protected_slot].tier))
-        for slot in range(3):
-            if slot == protected_slot:
-                continue
-            prob = probs["base"][slot]
-            weights = [prob] * len(remaining_skills)
-            skill_name, skill_tier = random.choices(remaining_skills, weights=weights, k=1)[0]
-            level = 3 if player.is_legend else (player.skills[slot].level if player.skills[slot] else get_skill_level(player.is_legend))
-            selected_skills[slot] = Skill(skill_name, skill_tier, level)
-            remaining_skills.remove((skill_name, skill_tier))
-        return selected_skills
+    async def _handle_simulate(self, reader, writer, request, stream):
+        job_id = next(self._job_ids)
+        job = {"done": 0, "total": request["n"]}
+        if stream:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson; charset=utf-8\r\n"
+                b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+            )
+            await self._write_line(writer, {"job": job_id, "done": 0, "total": request["n"]})
 
-    elif ticket_type == "技能選擇變更券":
-        selected_slot = protected_slot if protected_slot is not None else random.randint(0, 2)
-        selected_skills = player.skills.copy()
-        remaining_skills = all_skills.copy()
-        if not selected_skills[selected_slot]:
-            selected_skills[selected_slot] = Skill("臨時技能", SkillTier.BRONZE, 3 if player.is_legend else get_skill_level(player.is_legend))
-        if (selected_skills[selected_slot].name, selected_skills[selected_slot].tier) in remaining_skills:
-            remaining_skills.remove((selected_skills[selected_slot].name, selected_skills[selected_slot].tier))
-        prob = probs["base"][0]
-        weights = [prob] * len(remaining_skills)
-        skill_name, skill_tier = random.choices(remaining_skills, weights=weights, k=1)[0]
-        level = 3 if player.is_legend else selected_skills[selected_slot].level
-        selected_skills[selected_slot] = Skill(skill_name, skill_tier, level)
-        return selected_skills
+        async def progress(done, total):
+            job["done"] = done
+            if stream:
+                await self._write_line(writer, {"job": job_id, "done": done, "total": total})
 
-    else:
-        raise ValueError("未知的變更券類型")
+        task = job["task"] = asyncio.ensure_future(self.simulate(request, progress))
+        self._jobs[job_id] = job
+        # 用戶端中斷連線時 read 會回傳空字串，此時取消工作
+        disconnect = asyncio.ensure_future(reader.read(1))
+        try:
+            await asyncio.wait({task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+        finally:
+            disconnect.cancel()
+            self._jobs.pop(job_id, None)
+            if not task.done():
+                task.cancel()
+
+        if task.cancelled():
+            status, payload = 409, {"job": job_id, "cancelled": True}
+        elif isinstance(task.exception(), ValueError):
+            status, payload = 400, {"job": job_id, "error": str(task.exception())}
+        elif task.exception() is not None:
+            # 其他錯誤（例如工作行程異常結束）回報為伺服器錯誤，用戶端仍會收到回應
+            status, payload = 500, {"job": job_id, "error": f"模擬失敗：{type(task.exception()).__name__}"}
+        else:
+            status, payload = 200, {"job": job_id, "result": task.result()}
+        if stream:
+            await self._write_line(writer, payload)
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        else:
+            await self._respond(writer, status, payload)
 
 # GUI 應用程式類別
 class MLBSkillSimulatorApp:
     def __init__(self, root):
+        load_gui_modules()
         self.root = root
         self.root.title("MLB 9局職棒25 技能模擬器")
         self.player = None
@@ -332,6 +3249,10 @@ class MLBSkillSimulatorApp:
         self.simulation_entry = None
         self.stop_button = None
         self.is_simulating = False
+        self.stop_event = None
+        self.simulation_queue = None
+        self.precision_target = None
+        self.result_cache = ResultCache()
         self.base_font_size = 12
         self.base_button_width = 12
         self.base_image_size = (150, 200)
@@ -436,6 +3357,12 @@ class MLBSkillSimulatorApp:
             self.ticket_stats_labels[ticket_type] = tk.Label(frame, text="0 次", fg="white", bg="black", font=("Arial", self.base_font_size), anchor="w")
             self.ticket_stats_labels[ticket_type].pack(side=tk.LEFT)
 
+        self.metrics_var = tk.BooleanVar(value=INSTRUMENTATION.enabled)
+        self.metrics_check = tk.Checkbutton(self.stats_inner_frame, text="效能量測", variable=self.metrics_var, command=self.toggle_metrics, fg="white", bg="black", selectcolor="black", font=("Arial", self.base_font_size, "bold"), anchor="w")
+        self.metrics_check.pack(anchor="w", pady=self.base_pady)
+        self.metrics_label = tk.Label(self.stats_inner_frame, text="", fg="white", bg="black", font=("Arial", self.base_font_size - 2), anchor="w", justify=tk.LEFT)
+        self.metrics_label.pack(anchor="w", padx=self.base_padx)
+
         self.separator_label = tk.Label(self.combined_scrollable_frame, text="—" * 30, fg="white", bg="black", font=("Arial", self.base_font_size), anchor="w")
         self.separator_label.pack(anchor="w", pady=self.base_pady)
 
@@ -787,8 +3714,14 @@ class MLBSkillSimulatorApp:
         self.simulation_entry.pack(side=tk.LEFT, padx=self.base_padx)
         self.simulation_limit_label = tk.Label(self.button_frame, text=f"(上限 {MAX_SIMULATION_LIMIT} 次)", fg="white", bg="black", font=("Arial", self.base_font_size))
         self.simulation_limit_label.pack(side=tk.LEFT, padx=self.base_padx)
+        self.seed_label = tk.Label(self.button_frame, text="種子:", fg="white", bg="black", font=("Arial", self.base_font_size))
+        self.seed_label.pack(side=tk.LEFT, padx=self.base_padx)
+        self.seed_entry = tk.Entry(self.button_frame, width=8, font=("Arial", self.base_font_size))
+        self.seed_entry.pack(side=tk.LEFT, padx=self.base_padx)
         self.simulate_multiple_button = tk.Button(self.button_frame, text="一鍵模擬多次", command=self.simulate_multiple, bg="#FFC107", fg="black", width=self.base_button_width, font=("Arial", self.base_font_size))
         self.simulate_multiple_button.pack(side=tk.LEFT, padx=self.base_padx)
+        self.simulate_roster_button = tk.Button(self.button_frame, text="全隊模擬", command=self.simulate_roster, bg="#FFC107", fg="black", width=self.base_button_width, font=("Arial", self.base_font_size))
+        self.simulate_roster_button.pack(side=tk.LEFT, padx=self.base_padx)
         self.stop_button = tk.Button(self.button_frame, text="停止模擬", command=self.stop_simulation, bg="#F44336", fg="white", width=self.base_button_width, font=("Arial", self.base_font_size))
         self.stop_button.pack_forget()
 
@@ -808,6 +3741,15 @@ class MLBSkillSimulatorApp:
         self.ticket_combobox.pack(side=tk.LEFT)
         self.ticket_combobox.bind("<<ComboboxSelected>>", self.update_slot_selection)
 
+        self.precision_frame = tk.Frame(self.options_frame, bg="black")
+        self.precision_frame.pack(side=tk.LEFT, padx=self.base_padx)
+        self.precision_label = tk.Label(self.precision_frame, text="精度目標 ±%:", fg="white", bg="black", font=("Arial", self.base_font_size))
+        self.precision_label.pack(side=tk.LEFT)
+        self.precision_entry = tk.Entry(self.precision_frame, width=6, font=("Arial", self.base_font_size))
+        self.precision_entry.pack(side=tk.LEFT, padx=self.base_padx)
+        self.simulate_precision_button = tk.Button(self.precision_frame, text="精度模擬", command=self.simulate_precision, bg="#FFC107", fg="black", width=self.base_button_width, font=("Arial", self.base_font_size))
+        self.simulate_precision_button.pack(side=tk.LEFT)
+
         self.slot_frame = tk.Frame(self.options_frame, bg="black")
         self.slot_frame.pack(side=tk.LEFT, padx=self.base_padx)
         self.slot_label = tk.Label(self.slot_frame, text="", fg="white", bg="black", font=("Arial", self.base_font_size))
@@ -905,6 +3847,7 @@ class MLBSkillSimulatorApp:
         self.update_legend_label(position_str, is_legend)
         self.update_player_skill_label(position_str, self.player.skills)
         self.update_stats()
+        self.update_slot_selection()
         self.simulate_button.config(state="normal")
 
     def select_batter(self, position_str):
@@ -939,6 +3882,7 @@ class MLBSkillSimulatorApp:
         self.update_legend_label(position_str, is_legend)
         self.update_player_skill_label(position_str, self.player.skills)
         self.update_stats()
+        self.update_slot_selection()
         self.simulate_button.config(state="normal")
         position_var, _ = self.batter_position_comboboxes[position_str]
         if self.player.defensive_position:
@@ -965,15 +3909,17 @@ class MLBSkillSimulatorApp:
         else:
             self.slot_frame.pack_forget()
 
-        legend_prob_legend_card = LEGEND_PROBABILITIES["傳說卡"].get(ticket_type, 0.0) * 100
-        legend_prob_other_card = LEGEND_PROBABILITIES["其他卡"].get(ticket_type, 0.0) * 100
+        if ticket_type in REROLL_TICKET_TYPES:
+            legend_prob_legend_card = legend_rate(ticket_type, True) * 100
+            legend_prob_other_card = legend_rate(ticket_type, False) * 100
+            level_sum_prob = level_sum_distribution(ticket_type, bool(self.player and self.player.is_legend))
+        else:
+            legend_prob_legend_card = LEGEND_PROBABILITIES["傳說卡"].get(ticket_type, 0.0) * 100
+            legend_prob_other_card = LEGEND_PROBABILITIES["其他卡"].get(ticket_type, 0.0) * 100
+            level_sum_prob = LEVEL_SUM_PROB_DEFAULT
         self.probability_labels["legend_prob_legend_card"].config(text=f"{legend_prob_legend_card:.2f}%")
         self.probability_labels["legend_prob_other_card"].config(text=f"{legend_prob_other_card:.2f}%")
 
-        if ticket_type == "最高級技能變更券":
-            level_sum_prob = LEVEL_SUM_PROB_SUPER
-        else:
-            level_sum_prob = LEVEL_SUM_PROB_DEFAULT
         for level_sum in range(3, 10):
             probability = level_sum_prob[level_sum] * 100
             self.probability_labels[f"level_sum_{level_sum}"].config(text=f"{probability:.2f}%")
@@ -994,16 +3940,25 @@ class MLBSkillSimulatorApp:
     def update_stats(self):
         if not self.player:
             return
-        self.stats_labels["simulation_count"].config(text=f"{self.player.simulation_count} 次")
-        probability = (self.player.legend_count / self.player.simulation_count * 100) if self.player.simulation_count > 0 else 0
-        self.stats_labels["legend_count"].config(text=f"{self.player.legend_count} 次 ({probability:.2f}%)")
+        stats = self.player.stats
+        # 使用精度模擬後，在機率後方顯示 95% Wilson 區間的半寬
+        intervals = stats_intervals(stats) if self.precision_target is not None and stats.simulation_count > 0 else None
+        self.stats_labels["simulation_count"].config(text=f"{stats.simulation_count} 次")
+        probability = (stats.legend_count / stats.simulation_count * 100) if stats.simulation_count > 0 else 0
+        margin = self.format_interval(intervals["legend"]) if intervals else ""
+        self.stats_labels["legend_count"].config(text=f"{stats.legend_count} 次 ({probability:.2f}%{margin})")
         for level_sum in range(3, 10):
-            count = self.player.level_sum_stats.get(level_sum, 0)
-            probability = (count / self.player.level_sum_count * 100) if self.player.level_sum_count > 0 else 0
-            self.stats_labels[f"level_sum_{level_sum}"].config(text=f"{count} 次 ({probability:.2f}%)")
-        for ticket_type, count in self.player.ticket_usage_stats.items():
+            count = int(stats.level_sum_counts[level_sum - 3])
+            probability = (count / stats.level_sum_count * 100) if stats.level_sum_count > 0 else 0
+            margin = self.format_interval(intervals["level_sum"][level_sum]) if intervals else ""
+            self.stats_labels[f"level_sum_{level_sum}"].config(text=f"{count} 次 ({probability:.2f}%{margin})")
+        for ticket_type, count in stats.ticket_usage_stats.items():
             self.ticket_stats_labels[ticket_type].config(text=f"{count} 次")
 
+    def format_interval(self, interval):
+        lower, upper = interval
+        return f" ±{(upper - lower) / 2 * 100:.2f}%"
+
     def show_skill_comparison(self, before_skills, after_skills, ticket_type, position_str):
         comparison_window = tk.Toplevel(self.root)
         comparison_window.title("技能變更比較")
@@ -1143,15 +4098,7 @@ class MLBSkillSimulatorApp:
             return
 
         if ticket_type in ["技能變更保護券", "技能選擇變更券"] and not any(self.player.skills):
-            skills_db = BATTER_SKILLS if self.player.player_type == PlayerType.BATTER else PITCHER_SKILLS
-            all_skills = []
-            for tier in [SkillTier.BRONZE, SkillTier.SILVER, SkillTier.GOLD]:
-                all_skills.extend([(name, tier) for name in skills_db[tier]])
-            for slot in range(3):
-                skill_name, skill_tier = random.choice(all_skills)
-                level = 3 if self.player.is_legend else get_skill_level(self.player.is_legend)
-                self.player.set_skill(slot, Skill(skill_name, skill_tier, level))
-                all_skills.remove((skill_name, skill_tier))
+            self.fill_initial_skills()
 
         protected_slot = None
         if ticket_type in ["技能變更保護券", "技能選擇變更券"]:
@@ -1165,15 +4112,7 @@ class MLBSkillSimulatorApp:
         try:
             before_skills = self.player.skills.copy()
             skills = simulate_skill_change(self.player, ticket_type, protected_slot)
-            self.player.ticket_usage_stats[ticket_type] += 1
-            if ticket_type in ["高級技能變更券", "最高級技能變更券"]:
-                self.player.simulation_count += 1
-                if skills[0] and skills[0].tier == SkillTier.LEGEND:
-                    self.player.legend_count += 1
-                level_sum = sum(skill.level for skill in skills if skill)
-                if level_sum in self.player.level_sum_stats:
-                    self.player.level_sum_stats[level_sum] += 1
-                self.player.level_sum_count += 1
+            self.player.stats.add_skills(ticket_type, skills, record_outcomes=ticket_type in STATS_TICKET_TYPES)
 
             position_str = self.player.position.value
             if ticket_type == "傳說技能選擇變更券":
@@ -1205,7 +4144,76 @@ class MLBSkillSimulatorApp:
             return
 
         try:
-            num_simulations = int(self.simulation_entry.get())
+            num_simulations = parse_simulation_count(self.simulation_entry.get())
+            if num_simulations <= 0:
+                messagebox.showwarning("警告", "模擬次數必須大於 0！")
+                return
+            if num_simulations > MAX_SIMULATION_LIMIT:
+                messagebox.showwarning("警告", f"模擬次數不得超過系統上限 {MAX_SIMULATION_LIMIT} 次！")
+                return
+        except ValueError:
+            messagebox.showwarning("警告", "請輸入有效的模擬次數（整數）！")
+            return
+
+        # 指定種子時結果可重現，相同設定直接使用快取的結果
+        seed = None
+        if self.seed_entry.get().strip():
+            try:
+                seed = int(self.seed_entry.get())
+            except ValueError:
+                messagebox.showwarning("警告", "請輸入有效的種子（整數）！")
+                return
+            if seed < 0:
+                messagebox.showwarning("警告", "種子不得為負數！")
+                return
+            if ticket_type not in REROLL_TICKET_TYPES:
+                messagebox.showwarning("警告", "種子僅適用於重抽型變更券（技能變更券、高級、最高級、傳說技能變更券）！")
+                return
+            self.start_simulation(ticket_type, num_simulations, None, seed=seed)
+            return
+
+        if ticket_type in ["技能變更保護券", "技能選擇變更券"] and not any(self.player.skills):
+            self.fill_initial_skills()
+
+        protected_slot = None
+        if ticket_type in ["技能變更保護券", "技能選擇變更券"]:
+            protected_slot = self.slot_var.get() - 1
+            if protected_slot not in [0, 1, 2]:
+                messagebox.showwarning("警告", "請選擇有效的技能（技能1-技能3）！")
+                return
+
+        self.start_simulation(ticket_type, num_simulations, protected_slot)
+
+    def simulate_precision(self):
+        if not self.player:
+            messagebox.showwarning("警告", "請先選擇投手或打者！")
+            return
+
+        ticket_type = self.ticket_var.get()
+        if ticket_type not in STATS_TICKET_TYPES:
+            messagebox.showwarning("警告", "精度模擬僅適用於高級技能變更券與最高級技能變更券！")
+            return
+
+        try:
+            precision = float(self.precision_entry.get()) / 100
+            if not precision > 0:
+                messagebox.showwarning("警告", "精度目標必須大於 0！")
+                return
+        except ValueError:
+            messagebox.showwarning("警告", "請輸入有效的精度目標（百分比）！")
+            return
+
+        self.precision_target = precision
+        self.start_simulation(ticket_type, MAX_SIMULATION_LIMIT, None, precision)
+
+    def simulate_roster(self):
+        ticket_type = self.ticket_var.get()
+        if ticket_type not in STATS_TICKET_TYPES:
+            messagebox.showwarning("警告", "全隊模擬僅適用於高級技能變更券與最高級技能變更券！")
+            return
+
+        try:
+            num_simulations = parse_simulation_count(self.simulation_entry.get())
             if num_simulations <= 0:
                 messagebox.showwarning("警告", "模擬次數必須大於 0！")
                 return
@@ -1216,36 +4224,164 @@ class MLBSkillSimulatorApp:
             messagebox.showwarning("警告", "請輸入有效的模擬次數（整數）！")
             return
 
+        # 尚未設定的位置以非傳說球員加入
+        for position_str, player in roster_players(self.players).items():
+            if position_str not in self.players:
+                self.players[position_str] = player
+                self.update_legend_label(position_str, False)
+
+        self.begin_simulation()
+        worker = threading.Thread(
+            target=roster_simulation_worker,
+            args=(dict(self.players), ticket_type, num_simulations, self.simulation_queue, self.stop_event),
+            daemon=True
+        )
+        worker.start()
+        self.root.after(SIMULATION_REFRESH_MS, self.poll_simulation, self.simulation_queue, self.player)
+
+    def begin_simulation(self):
         self.is_simulating = True
+        self.stop_event = threading.Event()
+        self.simulation_queue = queue.Queue()
         self.stop_button.pack(side=tk.LEFT, padx=self.base_padx)
         self.simulate_multiple_button.config(state="disabled")
+        self.simulate_roster_button.config(state="disabled")
+        self.simulate_precision_button.config(state="disabled")
+        self.simulate_button.config(state="disabled")
 
-        for i in range(num_simulations):
-            if not self.is_simulating:
-                break
-            self.player.ticket_usage_stats[ticket_type] += 1
-            self.simulate()
-            self.root.update()
+    def start_simulation(self, ticket_type, num_simulations, protected_slot, precision=None, seed=None):
+        self.begin_simulation()
+
+        # 模擬在背景執行緒進行，結果經由佇列回傳，介面以固定頻率更新
+        if seed is not None:
+            worker = threading.Thread(
+                target=seeded_simulation_worker,
+                args=(
+                    self.result_cache, self.player.player_type, self.player.is_legend, ticket_type,
+                    num_simulations, seed, self.simulation_queue, self.stop_event
+                ),
+                daemon=True
+            )
+        else:
+            worker = threading.Thread(
+                target=simulation_worker,
+                args=(
+                    self.player.player_type, self.player.is_legend, ticket_type, num_simulations,
+                    protected_slot, self.player.skills.copy(), self.simulation_queue, self.stop_event,
+                    precision, self.player.stats.snapshot()
+                ),
+                daemon=True
+            )
+        worker.start()
+        self.root.after(SIMULATION_REFRESH_MS, self.poll_simulation, self.simulation_queue, self.player)
+
+    def poll_simulation(self, progress_queue, player):
+        if progress_queue is not self.simulation_queue:
+            return
+        finished = False
+        latest_skills = None
+        summary = None
+        with INSTRUMENTATION.phase("gui.merge"):
+            try:
+                while True:
+                    kind, payload, skills = progress_queue.get_nowait()
+                    if kind == "progress":
+                        player.stats.merge(payload)
+                        latest_skills = skills
+                    elif kind == "roster":
+                        for position_str, stats in payload.items():
+                            self.players[position_str].stats.merge(stats)
+                    elif kind == "summary":
+                        summary = payload
+                    elif kind == "error":
+                        messagebox.showerror("錯誤", payload)
+                    else:
+                        finished = True
+            except queue.Empty:
+                pass
+
+        if latest_skills is not None:
+            for i, skill in enumerate(latest_skills):
+                player.set_skill(i, skill)
+            with INSTRUMENTATION.phase("gui.update_player_skill_label"):
+                self.update_player_skill_label(player.position.value, player.skills)
+        with INSTRUMENTATION.phase("gui.update_stats"):
+            self.update_stats()
+        if INSTRUMENTATION.enabled:
+            self.update_metrics()
+
+        if finished:
+            self.finish_simulation()
+            if summary:
+                self.show_roster_summary(summary)
+        else:
+            self.root.after(SIMULATION_REFRESH_MS, self.poll_simulation, progress_queue, player)
 
+    def finish_simulation(self):
         self.is_simulating = False
+        self.simulation_queue = None
         self.stop_button.pack_forget()
         self.simulate_multiple_button.config(state="normal")
+        self.simulate_roster_button.config(state="normal")
+        self.simulate_precision_button.config(state="normal")
+        self.simulate_button.config(state="normal" if self.player else "disabled")
+
+    def toggle_metrics(self):
+        if self.metrics_var.get():
+            INSTRUMENTATION.enable()
+            self.update_metrics()
+        else:
+            INSTRUMENTATION.disable()
+            self.metrics_label.config(text="")
+
+    def update_metrics(self):
+        metrics = INSTRUMENTATION.snapshot()
+        lines = []
+        for ticket_type, entry in metrics["tickets"].items():
+            lines.append(f"{ticket_type}: {entry['draws_per_sec']:,.0f} 次/秒")
+        for name, entry in sorted(metrics["phases"].items()):
+            lines.append(f"{name}: {entry['mean_ms']:.2f} ms × {entry['count']}")
+        if metrics["super_draws"]:
+            lines.append(f"最高級重抽（推算）: {metrics['super_retries_expected']:,.0f} 次")
+        self.metrics_label.config(text="\n".join(lines))
+
+    def show_roster_summary(self, summary):
+        team = summary["team"]
+        lines = [
+            f"位置數: {team['slot_count']}",
+            f"預期擁有傳說技能的位置: {team['expected_legend_slots']:.2f} ({team['legend_coverage'] * 100:.2f}%)"
+        ]
+        for position_str, slot in summary["slots"].items():
+            lines.append(f"{position_str}: 傳說技能 {slot['legend_rate'] * 100:.2f}%")
+        for position_str, message in summary["errors"].items():
+            lines.append(f"{position_str}: {message}")
+        messagebox.showinfo("全隊模擬結果", "\n".join(lines))
 
     def stop_simulation(self):
         self.is_simulating = False
+        if self.stop_event:
+            self.stop_event.set()
+
+    def fill_initial_skills(self):
+        catalog = SKILL_CATALOGS[self.player.player_type]
+        taken = []
+        for slot in range(3):
+            skill_id = _draw_distinct(0, catalog.pool_size, taken)
+            taken.append(skill_id)
+            self.player.set_skill(slot, catalog.skill(skill_id, get_skill_level(self.player.is_legend)))
 
     def reset_all(self):
+        if self.is_simulating:
+            self.stop_simulation()
+            self.finish_simulation()
         for player in self.players.values():
-            player.simulation_count = 0
-            player.legend_count = 0
-            player.level_sum_stats = {3: 0, 4: 0, 5: 0, 6: 0, 7: 0, 8: 0, 9: 0}
-            player.level_sum_count = 0
-            player.ticket_usage_stats = {ticket: 0 for ticket in player.ticket_usage_stats}
+            player.stats.reset()
             for i in range(3):
                 player.set_skill(i, None)
             player.defensive_position = None
 
         self.player = None
+        self.precision_target = None
         for pos in self.pitcher_skill_labels:
             for label in self.pitcher_skill_labels[pos]:
                 label.config(text="未設置", bg="gray")
@@ -1265,12 +4401,11 @@ class MLBSkillSimulatorApp:
         if not self.player:
             messagebox.showwarning("警告", "請先選擇投手或打者！")
             return
+        if self.is_simulating:
+            self.stop_simulation()
+            self.finish_simulation()
         position_str = self.player.position.value
-        self.player.simulation_count = 0
-        self.player.legend_count = 0
-        self.player.level_sum_stats = {3: 0, 4: 0, 5: 0, 6: 0, 7: 0, 8: 0, 9: 0}
-        self.player.level_sum_count = 0
-        self.player.ticket_usage_stats = {ticket: 0 for ticket in self.player.ticket_usage_stats}
+        self.player.stats.reset()
         for i in range(3):
             self.player.set_skill(i, None)
         self.player.defensive_position = None
@@ -1285,10 +4420,443 @@ class MLBSkillSimulatorApp:
         self.update_stats()
 
 def main():
+    load_gui_modules()
     root = tk.Tk()
     root.geometry("1480x800")
     app = MLBSkillSimulatorApp(root)
     root.mainloop()
 
+# 命令列介面：不帶子命令時啟動圖形介面
+PLAYER_TYPE_CHOICES = {"pitcher": PlayerType.PITCHER, "batter": PlayerType.BATTER}
+IMPORT_TIME_BUDGET_MS = 50
+
+def parse_skill(player_type, text):
+    # 格式為「技能名稱」或「技能名稱:等級」，未指定等級時為 1
+    name, _, level = text.partition(":")
+    skill_id = skill_id_by_name(player_type, name)
+    level = int(level) if level else 1
+    if level not in (1, 2, 3):
+        raise ValueError("技能等級必須為 1~3")
+    return SKILL_CATALOGS[player_type].skill(skill_id, level)
+
+def parse_skills(player_type, skill_texts):
+    # 依序填入技能槽，未指定的技能槽為空
+    skills = [parse_skill(player_type, text) for text in skill_texts]
+    if len(skills) > 3:
+        raise ValueError("最多只能指定 3 個技能")
+    return skills + [None] * (3 - len(skills))
+
+def initial_state_arrays(player_type, is_legend, skill_texts):
+    player = Player(player_type, None, is_legend)
+    player.skills = parse_skills(player_type, skill_texts)
+    return player_state_arrays(player)
+
+def _cli_initial_state(args, player_type):
+    return initial_state_arrays(player_type, args.legend, args.skill or [])
+
+def _print_result(result, as_json):
+    if as_json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    for key, value in result.items():
+        if isinstance(value, dict):
+            print(f"{key}:")
+            for inner_key, inner_value in value.items():
+                print(f"  {inner_key}: {inner_value}")
+        else:
+            print(f"{key}: {value}")
+
+def cli_simulate(args):
+    player_type = PLAYER_TYPE_CHOICES[args.type]
+    skill_ids, levels = _cli_initial_state(args, player_type)
+    protected_slot = args.slot - 1 if args.slot else None
+    n = parse_simulation_count(args.n)
+    if args.profile:
+        # 量測只涵蓋主行程，未指定行程數時改在主行程內執行
+        INSTRUMENTATION.enable()
+        if args.workers is None:
+            args.workers = 1
+    if args.history and args.checkpoint:
+        raise ValueError("記錄歷史時無法使用檢查點")
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        # 不覆寫既有的檢查點，以免設定不同時遺失先前的進度
+        raise ValueError(f"檢查點 {args.checkpoint} 已存在；接續請使用 resume {args.checkpoint}，重新開始請先刪除此檔")
+    if args.checkpoint:
+        # 檢查點用於接續中斷的模擬，不讀寫結果快取
+        stats = run_simulation(
+            player_type, args.legend, args.ticket, n, seed=args.seed, workers=args.workers,
+            protected_slot=protected_slot, skill_ids=skill_ids, levels=levels,
+            checkpoint=args.checkpoint, checkpoint_interval=args.checkpoint_every
+        )
+        hit = False
+    elif args.history:
+        # 快取只保存統計，記錄歷史時一律實際模擬
+        metadata = {"ticket_type": args.ticket, "is_legend": args.legend, "n": n, "seed": args.seed, "protected_slot": protected_slot}
+        with HistoryWriter(args.history, player_type, metadata=metadata) as history:
+            stats = run_simulation(
+                player_type, args.legend, args.ticket, n, seed=args.seed, workers=args.workers,
+                protected_slot=protected_slot, skill_ids=skill_ids, levels=levels, history=history
+            )
+        hit = False
+    else:
+        cache = None if args.no_cache else ResultCache(args.cache_dir)
+        stats, hit = cached_run_simulation(
+            cache, player_type, args.legend, args.ticket, n,
+            seed=args.seed, workers=args.workers, protected_slot=protected_slot,
+            skill_ids=skill_ids, levels=levels
+        )
+    result = stats.to_dict()
+    result["cached"] = hit
+    if args.profile:
+        result["instrumentation"] = INSTRUMENTATION.snapshot()
+    result["ticket_type"] = args.ticket
+    result["is_legend"] = args.legend
+    result["legend_rate"] = stats.legend_count / stats.simulation_count if stats.simulation_count else 0.0
+    _print_result(result, args.json)
+    return 0
+
+def cli_resume(args):
+    stats = resume_simulation(args.checkpoint, workers=args.workers, checkpoint_interval=args.checkpoint_every)
+    config, _, next_block = load_checkpoint(args.checkpoint)
+    result = stats.to_dict()
+    result["ticket_type"] = config["ticket_type"]
+    result["is_legend"] = config["is_legend"]
+    result["complete"] = checkpoint_complete(config, next_block)
+    result["legend_rate"] = stats.legend_count / stats.simulation_count if stats.simulation_count else 0.0
+    _print_result(result, args.json)
+    return 0
+
+def parse_comparison_config(text):
+    # 格式為「變更券」或「變更券:legend」（傳說卡）
+    ticket_type, _, card = text.partition(":")
+    if card not in ("", "legend"):
+        raise ValueError(f"未知的卡片類型：{card}")
+    return card == "legend", ticket_type
+
+def parse_ticket_cost(text):
+    # 格式為「變更券=成本」
+    ticket_type, _, cost = text.partition("=")
+    if ticket_type not in TICKET_TYPES:
+        raise ValueError(f"未知的變更券類型：{ticket_type}")
+    return ticket_type, float(cost)
+
+def cli_compare(args):
+    result = compare_configurations(
+        PLAYER_TYPE_CHOICES[args.type],
+        [parse_comparison_config(text) for text in args.config],
+        parse_simulation_count(args.n),
+        seed=args.seed, workers=args.workers,
+        costs=dict(parse_ticket_cost(text) for text in args.cost or []),
+        confidence=args.confidence
+    )
+    if args.json:
+        _print_result(result, True)
+        return 0
+    for label, config in result["configs"].items():
+        print(f"{label}（成本 {config['cost']:g}）: 傳說技能 {config['legend']['mean']:.5f}，等級總和 {config['level_sum']['mean']:.4f}")
+    for label, comparison in result["differences"].items():
+        print(f"{label}:")
+        for metric, values in comparison.items():
+            lower, upper = values["interval"]
+            print(f"  {metric}: {values['difference']:+.5f} [{lower:+.5f}, {upper:+.5f}]，變異數縮減 {values['variance_reduction']:.1f} 倍")
+    return 0
+
+def parse_sweep_parameter(text):
+    # 格式為「參數=數值,數值,...」或「參數=起點:終點:點數」
+    name, _, spec = text.partition("=")
+    if not spec:
+        raise ValueError(f"參數格式錯誤：{text}")
+    if ":" in spec:
+        start, stop, count = spec.split(":")
+        return name, np.linspace(float(start), float(stop), int(count))
+    return name, [float(value) for value in spec.split(",")]
+
+def cli_sweep(args):
+    result = sweep_parameters(args.ticket, args.legend, dict(parse_sweep_parameter(text) for text in args.param or []))
+    metrics = ("legend_rate", "expected_level_sum", "expected_tickets_to_legend")
+    if args.json:
+        _print_result({
+            **{key: result[key] for key in ("ticket_type", "is_legend", "parameters")},
+            "axes": {name: axis.tolist() for name, axis in result["axes"].items()},
+            **{key: result[key].tolist() for key in metrics + ("level_sum_probs",)}
+        }, True)
+        return 0
+    names = result["parameters"]
+    for index in np.ndindex(result["legend_rate"].shape):
+        point = "，".join(f"{name}={result['axes'][name][i]:g}" for name, i in zip(names, index)) or "目前機率表"
+        print(
+            f"{point}: 傳說技能 {result['legend_rate'][index]:.5f}，期望等級總和 {result['expected_level_sum'][index]:.4f}，"
+            f"期望張數 {result['expected_tickets_to_legend'][index]:.3f}"
+        )
+    return 0
+
+def _cli_target(args):
+    return TargetBuild(args.legend_skill, args.min_level_sum, args.require or [])
+
+def _ticket_count_quantile(distribution, q):
+    return int(np.searchsorted(np.cumsum(distribution), q))
+
+def cli_target(args):
+    player_type = PLAYER_TYPE_CHOICES[args.type]
+    result = solve_tickets_to_target(
+        player_type, args.legend, _cli_target(args), args.reroll, parse_skills(player_type, args.skill or []),
+        trials=parse_simulation_count(args.n), seed=args.seed
+    )
+    if args.json:
+        _print_result({
+            **{key: value for key, value in result.items() if key not in ("distribution",)},
+            "distribution": {key: values.tolist() for key, values in result["distribution"].items()}
+        }, True)
+        return 0
+    print("精確計算" if result["exact"] else "抽樣估計")
+    for ticket_type, mean in result["expected"].items():
+        print(f"{ticket_type}: 期望 {mean:.3f} 張，標準差 {math.sqrt(result['variance'][ticket_type]):.3f}")
+    total = result["distribution"]["total"]
+    print(
+        f"合計: 期望 {result['expected_total']:.3f} 張，中位數 {_ticket_count_quantile(total, 0.5)} 張，"
+        f"90% 在 {_ticket_count_quantile(total, 0.9)} 張內"
+    )
+    return 0
+
+def parse_ticket_count(text):
+    # 格式為「變更券=張數」
+    ticket_type, _, count = text.partition("=")
+    if ticket_type not in TICKET_TYPES:
+        raise ValueError(f"未知的變更券類型：{ticket_type}")
+    count = int(count)
+    if count < 0:
+        raise ValueError("變更券張數不得為負數")
+    return ticket_type, count
+
+def cli_optimize(args):
+    player_type = PLAYER_TYPE_CHOICES[args.type]
+    result = optimize_ticket_strategy(
+        player_type, args.legend, _cli_target(args),
+        dict(parse_ticket_count(text) for text in args.inventory), parse_skills(player_type, args.skill or [])
+    )
+    action = result["action"]
+    if args.json:
+        _print_result({
+            "probability": result["probability"],
+            "action": None if action is None else {"ticket_type": action[0], "slot": None if action[1] is None else action[1] + 1}
+        }, True)
+        return 0
+    print(f"達成目標的最高機率: {result['probability']:.5f}")
+    if action is None:
+        print("建議: 不需再使用變更券")
+    else:
+        print(f"建議: 使用{action[0]}" + (f"（技能槽 {action[1] + 1}）" if action[1] is not None else ""))
+    return 0
+
+def cli_serve(args):
+    service = SimulationService(args.host, args.port, workers=args.workers, max_concurrency=args.max_concurrency)
+
+    async def serve():
+        async with service:
+            print(f"模擬服務已啟動：{service.url}", flush=True)
+            await service.server.serve_forever()
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve())
+    return 0
+
+def measure_import_time():
+    # 在新的直譯器中量測匯入時間；先匯入 numpy，另外量測本模組自身的匯入時間
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import numpy\n"
+        "middle = time.perf_counter()\n"
+        "import mlb_skill_simulator\n"
+        "end = time.perf_counter()\n"
+        "print(json.dumps({'numpy_ms': (middle - start) * 1000, 'module_ms': (end - middle) * 1000,"
+        " 'gui_loaded': any(name in sys.modules for name in ('tkinter', 'PIL'))}))\n"
+    )
+    directory = os.path.dirname(os.path.abspath(__file__))
+    load_runtime_modules()
+    # 量測的是一般使用時（已有位元組碼快取）的匯入時間：先匯入一次以寫入快取，即使環境設定了不寫入位元組碼
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    subprocess.run([sys.executable, "-c", "import mlb_skill_simulator"], cwd=directory, env=env, check=True)
+    output = subprocess.run([sys.executable, "-c", code], cwd=directory, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+def cli_history(args):
+    reader = HistoryReader(args.directory)
+    if args.pair:
+        result = reader.co_occurrence(*args.pair)
+    else:
+        result = {
+            "player_type": reader.player_type.value,
+            "trial_count": reader.trial_count,
+            "rows": len(reader),
+            "chunks": len(reader.meta["chunks"]),
+            "complete": reader.meta["complete"],
+            "metadata": reader.meta["metadata"]
+        }
+    _print_result(result, args.json)
+    return 0
+
+def cli_import_time(args):
+    # 量測有雜訊，取多次中模組匯入時間最短的一次
+    if args.runs < 1:
+        raise ValueError("量測次數必須至少為 1")
+    results = [measure_import_time() for _ in range(args.runs)]
+    result = min(results, key=lambda item: item["module_ms"])
+    result["gui_loaded"] = any(item["gui_loaded"] for item in results)
+    result["runs"] = args.runs
+    result["budget_ms"] = args.budget_ms
+    result["passed"] = result["module_ms"] <= args.budget_ms and not result["gui_loaded"]
+    _print_result(result, args.json)
+    return 0 if result["passed"] else 1
+
+def cli_bench(args):
+    results = run_benchmarks(quick=args.quick, pattern=args.filter, repeats=args.repeats)
+    regressions = {}
+    if args.baseline:
+        regressions = compare_benchmarks(results, load_benchmarks(args.baseline), args.threshold)
+    if args.save:
+        save_benchmarks(args.save, results)
+    if args.json:
+        _print_result({"cases": results, "regressions": regressions}, True)
+    else:
+        for name, result in results.items():
+            marker = "  ← 效能退步" if name in regressions else ""
+            print(
+                f"{name}: {result['draws_per_sec']:,.0f} 次/秒, 峰值 {result['peak_bytes'] / 1024:,.1f} KiB, "
+                f"未釋放 {result['retained_bytes_per_draw']:.2f} bytes/次{marker}"
+            )
+    return 1 if regressions else 0
+
+def cli_conform(args):
+    result = run_conformance(n=parse_simulation_count(args.n), scalar_n=parse_simulation_count(args.scalar_n), seed=args.seed, alpha=args.alpha)
+    if args.json:
+        _print_result(result, True)
+    else:
+        print(f"檢定數: {result['tests']}，單項門檻: {result['threshold']:.3g}（整體 alpha = {result['alpha']}）")
+        for name, p_value in result["failures"].items():
+            print(f"未通過 {name}: p = {p_value:.3g}")
+        print("全部通過" if result["passed"] else "有檢定未通過")
+    return 0 if result["passed"] else 1
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="mlb_skill_simulator", description="MLB 9局職棒25 技能模擬器")
+    subparsers = parser.add_subparsers(dest="command")
+
+    simulate_parser = subparsers.add_parser("simulate", help="從相同的初始技能進行多次獨立模擬")
+    simulate_parser.add_argument("--type", choices=sorted(PLAYER_TYPE_CHOICES), default="pitcher")
+    simulate_parser.add_argument("--ticket", choices=TICKET_TYPES, required=True)
+    simulate_parser.add_argument("-n", default="10000", help="模擬次數，可使用 1e6 之類的科學記號")
+    simulate_parser.add_argument("--seed", type=int)
+    simulate_parser.add_argument("--legend", action="store_true", help="傳說球員卡")
+    simulate_parser.add_argument("--skill", action="append", help="初始技能，格式為 名稱 或 名稱:等級，依序填入技能槽")
+    simulate_parser.add_argument("--slot", type=int, choices=[1, 2, 3], help="技能變更保護券與技能選擇變更券的技能槽")
+    simulate_parser.add_argument("--workers", type=int)
+    simulate_parser.add_argument("--cache-dir", help="結果快取目錄（預設為 MLB_SIM_CACHE_DIR 或 ~/.cache/mlb_skill_simulator）")
+    simulate_parser.add_argument("--no-cache", action="store_true", help="不讀寫結果快取（僅指定 --seed 時使用快取）")
+    simulate_parser.add_argument("--json", action="store_true")
+    simulate_parser.add_argument("--profile", action="store_true", help="輸出各階段耗時與每秒抽取次數")
+    simulate_parser.add_argument("--history", help="將每次抽取的結果寫入此目錄（分塊 .npy 欄位檔）")
+    simulate_parser.add_argument("--checkpoint", help="定期將進度寫入此檢查點檔（不覆寫既有的檔案），中斷後可用 resume 接續；僅命令列支援，圖形介面的模擬不寫入檢查點")
+    simulate_parser.add_argument("--checkpoint-every", type=float, default=CHECKPOINT_INTERVAL, help="寫入檢查點的間隔（秒）")
+    simulate_parser.set_defaults(handler=cli_simulate)
+
+    resume_parser = subparsers.add_parser("resume", help="從檢查點接續中斷的模擬")
+    resume_parser.add_argument("checkpoint")
+    resume_parser.add_argument("--workers", type=int)
+    resume_parser.add_argument("--checkpoint-every", type=float, default=CHECKPOINT_INTERVAL, help="寫入檢查點的間隔（秒）")
+    resume_parser.add_argument("--json", action="store_true")
+    resume_parser.set_defaults(handler=cli_resume)
+
+    history_parser = subparsers.add_parser("history", help="查詢抽取歷史紀錄")
+    history_parser.add_argument("directory")
+    history_parser.add_argument("--pair", nargs=2, metavar=("技能A", "技能B"), help="兩個技能同時出現的次數")
+    history_parser.add_argument("--json", action="store_true")
+    history_parser.set_defaults(handler=cli_history)
+
+    compare_parser = subparsers.add_parser("compare", help="以共同亂數比較多種變更券或卡片類型，輸出成對差異的信賴區間")
+    compare_parser.add_argument("--type", choices=sorted(PLAYER_TYPE_CHOICES), default="pitcher")
+    compare_parser.add_argument("--config", action="append", required=True, help="格式為 變更券 或 變更券:legend，第一個為比較基準")
+    compare_parser.add_argument("--cost", action="append", help="每張變更券的成本，格式為 變更券=成本，未指定為 1")
+    compare_parser.add_argument("-n", default="100000", help="試驗次數，可使用 1e6 之類的科學記號")
+    compare_parser.add_argument("--seed", type=int)
+    compare_parser.add_argument("--workers", type=int)
+    compare_parser.add_argument("--confidence", type=float, default=0.95)
+    compare_parser.add_argument("--json", action="store_true")
+    compare_parser.set_defaults(handler=cli_compare)
+
+    sweep_parser = subparsers.add_parser("sweep", help="對機率表參數的格點計算傳說技能機率、期望等級總和與期望張數")
+    sweep_parser.add_argument("--ticket", choices=REROLL_TICKET_TYPES, required=True)
+    sweep_parser.add_argument("--legend", action="store_true", help="傳說球員卡")
+    sweep_parser.add_argument("--param", action="append", help=f"格式為 參數=數值,數值 或 參數=起點:終點:點數，參數為 {'、'.join(SWEEP_PARAMETERS)}")
+    sweep_parser.add_argument("--json", action="store_true")
+    sweep_parser.set_defaults(handler=cli_sweep)
+
+    def add_target_arguments(target_parser):
+        target_parser.add_argument("--type", choices=sorted(PLAYER_TYPE_CHOICES), default="pitcher")
+        target_parser.add_argument("--legend", action="store_true", help="傳說球員卡")
+        target_parser.add_argument("--legend-skill", help="第一技能槽的目標傳說技能，未指定時為任一傳說技能")
+        target_parser.add_argument("--min-level-sum", type=int, default=7, help="等級總和下限")
+        target_parser.add_argument("--require", action="append", help="必須出現的技能，可重複指定")
+        target_parser.add_argument("--skill", action="append", help="目前技能，格式為 名稱 或 名稱:等級，依序填入技能槽")
+        target_parser.add_argument("--json", action="store_true")
+
+    target_parser = subparsers.add_parser("target", help="計算達成目標技能組合所需變更券張數的期望值與分布")
+    add_target_arguments(target_parser)
+    target_parser.add_argument("--reroll", choices=["高級技能變更券", "最高級技能變更券", "傳說技能變更券"], default="高級技能變更券", help="重抽使用的變更券")
+    target_parser.add_argument("-n", default="10000", help="需要其他技能而改以抽樣估計時的軌跡數")
+    target_parser.add_argument("--seed", type=int)
+    target_parser.set_defaults(handler=cli_target)
+
+    optimize_parser = subparsers.add_parser("optimize", help="依變更券庫存求出達成目標機率最高的使用策略")
+    add_target_arguments(optimize_parser)
+    optimize_parser.add_argument("--inventory", action="append", required=True, help="變更券庫存，格式為 變更券=張數，可重複指定")
+    optimize_parser.set_defaults(handler=cli_optimize)
+
+    serve_parser = subparsers.add_parser("serve", help="啟動本機 HTTP/JSON 模擬服務")
+    serve_parser.add_argument("--host", default=SERVICE_HOST)
+    serve_parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    serve_parser.add_argument("--workers", type=int)
+    serve_parser.add_argument("--max-concurrency", type=int, help="同時執行的區塊數上限（預設為行程數的兩倍）")
+    serve_parser.set_defaults(handler=cli_serve)
+
+    import_parser = subparsers.add_parser("import-time", help="檢查匯入時間是否在預算內，且未載入圖形介面模組")
+    import_parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    import_parser.add_argument("--runs", type=int, default=3, help="量測次數，以最短的一次與預算比較")
+    import_parser.add_argument("--json", action="store_true")
+    import_parser.set_defaults(handler=cli_import_time)
+
+    bench_parser = subparsers.add_parser("bench", help="量測模擬熱點的效能，可與基準比較")
+    bench_parser.add_argument("--quick", action="store_true", help="減少抽取次數以快速執行")
+    bench_parser.add_argument("--filter", help="只執行名稱包含此字串的項目")
+    bench_parser.add_argument("--repeats", type=int, default=3)
+    bench_parser.add_argument("--save", help="將結果存成基準 JSON")
+    bench_parser.add_argument("--baseline", help="與此基準 JSON 比較")
+    bench_parser.add_argument("--threshold", type=float, default=BENCHMARK_THRESHOLD, help="容許的效能退步比例")
+    bench_parser.add_argument("--json", action="store_true")
+    bench_parser.set_defaults(handler=cli_bench)
+
+    conform_parser = subparsers.add_parser("conform", help="以卡方與二項檢定驗證模擬結果符合精確機率")
+    conform_parser.add_argument("-n", default="1e6", help="批次引擎每種設定的抽取次數")
+    conform_parser.add_argument("--scalar-n", default="1e4", help="逐次引擎每種設定的抽取次數，0 表示略過")
+    conform_parser.add_argument("--seed", type=int, default=0)
+    conform_parser.add_argument("--alpha", type=float, default=CONFORMANCE_ALPHA, help="整體誤報率")
+    conform_parser.add_argument("--json", action="store_true")
+    conform_parser.set_defaults(handler=cli_conform)
+    return parser
+
+def cli(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        main()
+        return 0
+    try:
+        return args.handler(args)
+    except ValueError as e:
+        print(f"錯誤：{e}", file=sys.stderr)
+        return 2
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    load_runtime_modules()
+    multiprocessing.freeze_support()
+    sys.exit(cli())
\ No newline at end of file
@@ -0,0 +1,40 @@
+import numpy as np
+
+import mlb_skill_simulator as sim
+
+N = 10000
+BLOCK_SIZE = 1000
+CONFIG = (sim.PlayerType.PITCHER, False, "最高級技能變更券", N)
+
+
+def _arrays(stats):
+    return {name: np.asarray(value).tolist() for name, value in stats.to_state().items()}
+
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path):
+    path = str(tmp_path / "run.npz")
+    blocks = iter(range(N))
+    # 第 3 個區塊後中斷，之後從檢查點接續
+    partial = sim.run_simulation(
+        *CONFIG, seed=11, workers=1, block_size=BLOCK_SIZE,
+        checkpoint=path, should_stop=lambda: next(blocks) >= 2
+    )
+    config, saved, next_block = sim.load_checkpoint(path)
+    assert next_block == 3
+    assert not sim.checkpoint_complete(config, next_block)
+    assert _arrays(saved) == _arrays(partial)
+
+    assert sim.cli(["resume", path, "--workers", "1", "--json"]) == 0
+    config, resumed, next_block = sim.load_checkpoint(path)
+    assert sim.checkpoint_complete(config, next_block)
+    expected = sim.run_simulation(*CONFIG, seed=11, workers=1, block_size=BLOCK_SIZE)
+    assert _arrays(resumed) == _arrays(expected)
+
+
+def test_simulate_refuses_to_overwrite_checkpoint(tmp_path, capsys):
+    path = tmp_path / "run.npz"
+    path.write_bytes(b"existing")
+    status = sim.cli(["simulate", "--ticket", "最高級技能變更券", "-n", "1000", "--seed", "1", "--checkpoint", str(path)])
+    assert status == 2
+    assert "resume" in capsys.readouterr().err
+    assert path.read_bytes() == b"existing"
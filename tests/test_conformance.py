@@ -0,0 +1,25 @@
+import pytest
+
+import mlb_skill_simulator as sim
+
+CONFIGS = sim.conformance_configs()
+BATCH_DRAWS = 200000
+SCALAR_DRAWS = 5000
+
+
+def _case_id(config):
+    _, player_type, is_legend, ticket_type = config
+    return f"{player_type.name}-{'legend' if is_legend else 'regular'}-{ticket_type}"
+
+
+def test_published_probabilities():
+    assert all(p_value == 1.0 for p_value in sim._published_checks().values())
+
+
+@pytest.mark.parametrize("config", CONFIGS, ids=[_case_id(config) for config in CONFIGS])
+def test_engines_match_exact_probabilities(config):
+    results = sim.conformance_case(*config, n=BATCH_DRAWS, scalar_n=SCALAR_DRAWS, seed=0)
+    # Bonferroni 校正：整個測試集合的誤報率不超過 CONFORMANCE_ALPHA
+    threshold = sim.CONFORMANCE_ALPHA / (len(CONFIGS) * len(results))
+    failures = {name: p_value for name, p_value in results.items() if p_value < threshold}
+    assert not failures
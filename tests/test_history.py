@@ -0,0 +1,42 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import mlb_skill_simulator as sim
+
+PITCHER = sim.PlayerType.PITCHER
+
+
+def test_round_trip_matches_the_simulation(tmp_path):
+    directory = str(tmp_path / "history")
+    # 區塊小於模擬次數，紀錄會分成多個檔案
+    with sim.HistoryWriter(directory, PITCHER, chunk_trials=700) as history:
+        stats = sim.run_simulation(PITCHER, False, "高級技能變更券", 3000, seed=4, workers=1, block_size=1000, history=history)
+    reader = sim.HistoryReader(directory)
+    assert reader.meta["complete"]
+    assert reader.trial_count == 3000 and len(reader) == 3000 * 3
+
+    rebuilt = sim.SimulationStats(PITCHER)
+    trials = []
+    for chunk in reader.iter_chunks():
+        trials.append(np.asarray(chunk["trial"]))
+        rebuilt.add_batch("高級技能變更券", chunk["skill_id"].reshape(-1, 3), chunk["level"].reshape(-1, 3))
+    assert (np.concatenate(trials) == np.repeat(np.arange(3000), 3)).all()
+    assert rebuilt.legend_count == stats.legend_count
+    assert (rebuilt.skill_level_sum_counts == stats.skill_level_sum_counts).all()
+
+
+def test_aborted_log_is_marked_incomplete(tmp_path):
+    directory = str(tmp_path / "history")
+    skill_ids = np.zeros((512, 3), dtype=np.int16)
+    levels = np.ones((512, 3), dtype=np.int8)
+    with pytest.raises(RuntimeError):
+        with sim.HistoryWriter(directory, PITCHER, chunk_trials=256) as history:
+            history.write(skill_ids, levels)
+            raise RuntimeError("中斷")
+    with open(os.path.join(directory, sim.HISTORY_META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    assert meta["complete"] is False
+    assert sim.HistoryReader(directory).trial_count == 512
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+import mlb_skill_simulator as sim
+
+# 匯入時間與機器負載有關，預算由 import-time 子指令檢查；這裡只驗證與負載無關的部分
+
+
+def test_gui_modules_are_not_imported():
+    assert not sim.measure_import_time()["gui_loaded"]
+
+
+def test_optional_modules_load_lazily():
+    code = (
+        "import sys, mlb_skill_simulator\n"
+        "lazy = ('tkinter', 'PIL', 'asyncio', 'multiprocessing', 'concurrent.futures', 'tempfile', 'hashlib',"
+        " 'subprocess', 'statistics', 'tracemalloc')\n"
+        "print(','.join(name for name in lazy if name in sys.modules))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=sim.os.path.dirname(sim.__file__), capture_output=True, text=True, check=True).stdout
+    assert output.strip() == ""
@@ -0,0 +1,29 @@
+import random
+
+import pytest
+
+import mlb_skill_simulator as sim
+
+SKILLS = ["完美先生:2", "決勝球:1", "平靜:3"]
+
+
+def _player():
+    player = sim.Player(sim.PlayerType.PITCHER, sim.PitcherPosition.STARTER_1, False)
+    player.skills = [sim.parse_skill(sim.PlayerType.PITCHER, text) for text in SKILLS]
+    return player
+
+
+@pytest.mark.parametrize("ticket_type", sim.TICKET_TYPES)
+def test_view_matches_player_for_every_ticket(ticket_type):
+    player = _player()
+    store = sim.RosterStore()
+    view = store.view(store.append({"先發1": player}), "先發1")
+    skill_ids, levels = view.skill_ids.copy(), view.levels.copy()
+
+    random.seed(0)
+    expected = sim.simulate_skill_change(player, ticket_type, protected_slot=1)
+    random.seed(0)
+    result = sim.simulate_skill_change(view, ticket_type, protected_slot=1)
+    assert result == expected
+    # 模擬只回傳新技能，不改動陣容中的資料
+    assert (view.skill_ids == skill_ids).all() and (view.levels == levels).all()
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+
+import mlb_skill_simulator as sim
+
+PITCHER = sim.PlayerType.PITCHER
+
+
+def _state(stats):
+    return {name: np.asarray(value).tolist() for name, value in stats.to_state().items()}
+
+
+def test_cache_hit_returns_the_stored_result(tmp_path):
+    cache = sim.ResultCache(str(tmp_path))
+    stats, hit = sim.cached_run_simulation(cache, PITCHER, False, "最高級技能變更券", 5000, seed=2, workers=1)
+    assert not hit
+    cached, hit = sim.cached_run_simulation(cache, PITCHER, False, "最高級技能變更券", 5000, seed=2, workers=1)
+    assert hit
+    assert _state(cached) == _state(stats)
+
+
+def test_eviction_removes_the_least_recently_used_entry(tmp_path):
+    cache = sim.ResultCache(str(tmp_path))
+    keys = [cache.key(PITCHER, False, "高級技能變更券", 1000, seed) for seed in range(3)]
+    for seed, key in enumerate(keys[:2]):
+        cache.put(key, sim.run_simulation(PITCHER, False, "高級技能變更券", 1000, seed=seed, workers=1))
+    # 第一個項目較舊，但讀取後成為最近使用的項目
+    os.utime(cache._path(keys[0]), (1000, 1000))
+    os.utime(cache._path(keys[1]), (2000, 2000))
+    assert cache.get(keys[0]) is not None
+    size = os.path.getsize(cache._path(keys[0]))
+    cache.max_bytes = size * 2 + size // 2
+    cache.put(keys[2], sim.run_simulation(PITCHER, False, "高級技能變更券", 1000, seed=2, workers=1))
+    assert os.path.exists(cache._path(keys[0]))
+    assert not os.path.exists(cache._path(keys[1]))
+    assert os.path.exists(cache._path(keys[2]))
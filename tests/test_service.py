@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+
+import mlb_skill_simulator as sim
+
+# 第一個請求的連線若被工作行程繼承，用戶端會一直等不到 EOF
+EOF_TIMEOUT = 10.0
+
+
+async def _request(service, method, path, payload=None):
+    reader, writer = await asyncio.open_connection(service.host, service.port)
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {service.host}\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    data = await asyncio.wait_for(reader.read(), EOF_TIMEOUT)
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def _run(test, **options):
+    async def main():
+        async with sim.SimulationService(port=0, workers=2, **options) as service:
+            return await test(service)
+
+    return asyncio.run(main())
+
+
+def _payload(**fields):
+    return {"type": "pitcher", "ticket": "高級技能變更券", "n": 1000} | fields
+
+
+def test_first_request_connection_closes():
+    async def test(service):
+        return await _request(service, "POST", "/simulate", _payload())
+
+    status, response = _run(test)
+    assert status == 200
+    assert response["result"]["simulation_count"] == 1000
+
+
+def test_concurrent_requests_are_coalesced():
+    async def test(service):
+        return await asyncio.gather(*(_request(service, "POST", "/simulate", _payload(n=500)) for _ in range(3)))
+
+    responses = _run(test, coalesce_window=0.5)
+    assert [status for status, _ in responses] == [200] * 3
+    assert all(response["result"]["coalesced"] == 3 for _, response in responses)
+    assert all(response["result"]["simulation_count"] == 500 for _, response in responses)
+
+
+def test_seeded_request_matches_run_simulation():
+    async def test(service):
+        return await _request(service, "POST", "/simulate", _payload(n=5000, seed=7))
+
+    status, response = _run(test, block_size=1000)
+    expected = sim.run_simulation(sim.PlayerType.PITCHER, False, "高級技能變更券", 5000, seed=7, workers=1, block_size=1000)
+    assert status == 200
+    result = response["result"]
+    assert result["legend_count"] == expected.legend_count
+    assert result["level_sum_stats"] == {str(key): value for key, value in expected.level_sum_stats.items()}
+    assert result["seed"] == 7
+
+
+def test_cancel_running_job():
+    async def test(service):
+        reader, writer = await asyncio.open_connection(service.host, service.port)
+        body = json.dumps(_payload(n=sim.MAX_SIMULATION_LIMIT, seed=1, stream=True)).encode("utf-8")
+        writer.write(f"POST /simulate HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+        # 略過回應標頭與第一個 chunk 的長度列，取得工作編號
+        while (await reader.readline()) != b"\r\n":
+            pass
+        await reader.readline()
+        job_id = json.loads(await reader.readline())["job"]
+        cancel = await _request(service, "DELETE", f"/jobs/{job_id}")
+        rest = await asyncio.wait_for(reader.read(), EOF_TIMEOUT)
+        writer.close()
+        lines = [json.loads(line) for line in rest.split(b"\r\n") if line.startswith(b"{")]
+        return job_id, cancel, lines[-1]
+
+    job_id, cancel, last = _run(test, block_size=10000)
+    assert cancel == (200, {"cancelled": True})
+    assert last == {"job": job_id, "cancelled": True}
+
+
+@pytest.mark.parametrize("fields", [
+    {"type": ["pitcher"]},
+    {"ticket": {"name": "高級技能變更券"}},
+    {"skills": "abc"},
+    {"skills": [1]},
+    {"slot": "1"},
+    {"slot": True},
+    {"legend": "false"},
+    {"seed": [1]},
+    {"seed": -1},
+])
+def test_malformed_fields_are_rejected(fields):
+    async def test(service):
+        return await _request(service, "POST", "/simulate", _payload(**fields))
+
+    status, response = _run(test)
+    assert status == 400
+    assert "error" in response
+
+
+def test_simulation_failure_returns_server_error():
+    async def test(service):
+        async def fail(request, progress=None):
+            raise RuntimeError("boom")
+
+        service.simulate = fail
+        return await _request(service, "POST", "/simulate", _payload())
+
+    status, response = _run(test)
+    assert status == 500
+    assert response["error"] == "模擬失敗：RuntimeError"
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mlb_skill_simulator as sim
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_limit(value):
+    env = dict(os.environ, MLB_SIM_MAX_LIMIT=value)
+    return subprocess.run(
+        [sys.executable, "-c", "import mlb_skill_simulator as sim; print(sim.MAX_SIMULATION_LIMIT)"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+
+@pytest.mark.parametrize("value", ["abc", "0", "-5", "1.5", "nan", ""])
+def test_invalid_limit_falls_back_to_default(value):
+    result = _import_limit(value)
+    assert int(result.stdout) == sim.DEFAULT_MAX_SIMULATION_LIMIT
+    assert "MLB_SIM_MAX_LIMIT" in result.stderr
+
+
+@pytest.mark.parametrize("value, expected", [("5000", 5000), ("1e6", 10 ** 6)])
+def test_valid_limit_is_used(value, expected):
+    result = _import_limit(value)
+    assert int(result.stdout) == expected
+    assert not result.stderr
@@ -0,0 +1,29 @@
+import pytest
+
+import mlb_skill_simulator as sim
+
+N = 3000
+
+
+def _outcomes(stats):
+    return stats.simulation_count, stats.legend_count, stats.level_sum_counts.tolist(), stats.draw_count
+
+
+@pytest.mark.parametrize("ticket_type", sim.REROLL_TICKET_TYPES)
+def test_entry_points_share_the_stats_rule(ticket_type, tmp_path):
+    stats = sim.run_simulation(sim.PlayerType.PITCHER, False, ticket_type, N, seed=3, workers=1)
+    cache = sim.ResultCache(str(tmp_path))
+    cached, hit = sim.cached_run_simulation(cache, sim.PlayerType.PITCHER, False, ticket_type, N, seed=3, workers=1)
+    assert not hit
+    assert _outcomes(cached) == _outcomes(stats)
+    assert stats.draw_count == N
+    if ticket_type in sim.STATS_TICKET_TYPES:
+        assert stats.simulation_count == N
+    else:
+        # 其他變更券只累計使用次數，與介面和全隊模擬的規則相同
+        assert (stats.simulation_count, stats.legend_count, stats.level_sum_counts.sum()) == (0, 0, 0)
+
+
+def test_precision_run_rejects_tickets_without_outcomes():
+    with pytest.raises(ValueError):
+        sim.run_until_precision(sim.PlayerType.PITCHER, False, "技能變更券", 0.01, seed=0, workers=1)
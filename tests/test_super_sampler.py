@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+import pytest
+
+import mlb_skill_simulator as sim
+
+# 固定種子下的單項門檻，與 conform 子指令的整體誤報率一致
+P_VALUE_THRESHOLD = 1e-3
+
+
+@pytest.mark.parametrize("player_type", list(sim.PlayerType))
+def test_direct_sampler_matches_rejection_rule(player_type):
+    results = sim.verify_super_sampler(player_type, n=200000, scalar_n=20000, seed=0)
+    for path, (_, _, p_value) in results.items():
+        assert p_value > P_VALUE_THRESHOLD, path
+
+
+@pytest.mark.parametrize("player_type", list(sim.PlayerType))
+def test_batch_sampler_matches_exact_distribution(player_type):
+    catalog = sim.SKILL_CATALOGS[player_type]
+    exact = sim.exact_distribution(player_type, False, "最高級技能變更券")
+    rng = np.random.default_rng(1)
+    skill_ids, _, levels = sim.simulate_skill_change_batch(player_type, False, "最高級技能變更券", 200000, rng)
+    legend_start = catalog.tier_ranges[sim.SkillTier.LEGEND][0]
+
+    legend_count = int((skill_ids[:, 0] >= legend_start).sum())
+    assert sim.binomial_test(legend_count, len(skill_ids), exact["legend_rate"]) > P_VALUE_THRESHOLD
+    level_sums = levels.sum(axis=1, dtype=np.int64)
+    assert level_sums.min() >= 5
+    counts = np.bincount(level_sums - 3, minlength=7)
+    assert sim.chi2_goodness_of_fit(counts, [exact["level_sum"][total] for total in range(3, 10)])[2] > P_VALUE_THRESHOLD
+    for slot in range(3):
+        counts = np.bincount(skill_ids[:, slot], minlength=len(catalog))
+        assert sim.chi2_goodness_of_fit(counts, exact["slot_probs"][slot])[2] > P_VALUE_THRESHOLD, slot
+
+
+def test_scalar_sampler_matches_exact_distribution():
+    player_type = sim.PlayerType.BATTER
+    catalog = sim.SKILL_CATALOGS[player_type]
+    exact = sim.exact_distribution(player_type, False, "最高級技能變更券")
+    state = random.getstate()
+    random.seed(2)
+    try:
+        player = sim.Player(player_type, None)
+        draws = [sim.simulate_skill_change(player, "最高級技能變更券") for _ in range(20000)]
+    finally:
+        random.setstate(state)
+    legend_count = sum(skills[0].tier == sim.SkillTier.LEGEND for skills in draws)
+    assert sim.binomial_test(legend_count, len(draws), exact["legend_rate"]) > P_VALUE_THRESHOLD
+    counts = np.bincount([sum(skill.level for skill in skills) - 3 for skills in draws], minlength=7)
+    assert sim.chi2_goodness_of_fit(counts, [exact["level_sum"][total] for total in range(3, 10)])[2] > P_VALUE_THRESHOLD
+    counts = np.bincount([catalog.skill_id(skills[1]) for skills in draws], minlength=len(catalog))
+    assert sim.chi2_goodness_of_fit(counts, exact["slot_probs"][1])[2] > P_VALUE_THRESHOLD
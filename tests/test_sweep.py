@@ -0,0 +1,20 @@
+import pytest
+
+import mlb_skill_simulator as sim
+
+
+@pytest.mark.parametrize("ticket_type, is_legend, grid", [
+    ("技能變更券", False, {"legend_prob": [0.1]}),
+    ("高級技能變更券", False, {"retry_legend_prob": [0.1]}),
+    ("最高級技能變更券", True, {"retry_legend_prob": [0.1]}),
+    ("高級技能變更券", True, {"等級1": [0.1, 0.9]}),
+    ("最高級技能變更券", True, {"等級3": [0.5]}),
+])
+def test_inapplicable_parameters_are_rejected(ticket_type, is_legend, grid):
+    with pytest.raises(ValueError):
+        sim.sweep_parameters(ticket_type, is_legend, grid)
+
+
+def test_level_weights_change_regular_card_rows():
+    result = sim.sweep_parameters("最高級技能變更券", False, {"等級1": [0.1, 0.9]})
+    assert result["legend_rate"][0] != result["legend_rate"][1]
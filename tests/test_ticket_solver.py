@@ -0,0 +1,76 @@
+import math
+import random
+
+import pytest
+
+import mlb_skill_simulator as sim
+
+PITCHER = sim.PlayerType.PITCHER
+# 抽樣估計與精確值的差距上限（標準誤的倍數）
+Z_LIMIT = 4.0
+
+
+def _parse(texts):
+    return sim.parse_skills(PITCHER, texts)
+
+
+def test_exact_solver_matches_trajectory_simulation():
+    target = sim.TargetBuild("完美先生", 7)
+    exact = sim.solve_tickets_to_target(PITCHER, False, target)
+    sampled = sim.simulate_tickets_to_target(PITCHER, False, target, trials=200000, seed=0)
+    assert exact["exact"] and sampled["unfinished"] == 0
+    for ticket_type, mean in exact["expected"].items():
+        standard_error = math.sqrt(exact["variance"][ticket_type] / sampled["trials"])
+        assert abs(sampled["expected"][ticket_type] - mean) < Z_LIMIT * standard_error
+    assert exact["distribution"]["total"].sum() == pytest.approx(1.0)
+    assert exact["expected_total"] == pytest.approx(sum(exact["expected"].values()))
+
+
+def test_sampling_fallback_is_cached_per_configuration():
+    target = sim.TargetBuild("完美先生", 7, ("決勝球",))
+    first = sim.solve_tickets_to_target(PITCHER, False, target, trials=2000, seed=5)
+    assert not first["exact"]
+    assert sim.solve_tickets_to_target(PITCHER, False, target, trials=2000, seed=5) is first
+    assert sim.solve_tickets_to_target(PITCHER, True, target, trials=2000, seed=5) is not first
+
+
+def _follow_policy(optimizer, target, inventory, trials, seed):
+    # 依 best_action 逐張使用變更券的逐次模擬，回傳達成目標的次數
+    random.seed(seed)
+    successes = 0
+    for _ in range(trials):
+        player = sim.Player(PITCHER, None, False)
+        player.skills = [None, None, None]
+        remaining = dict(inventory)
+        while (action := optimizer.best_action(player.skills, remaining)) is not None:
+            ticket_type, slot = action
+            remaining[ticket_type] -= 1
+            player.skills = sim.simulate_skill_change(player, ticket_type, slot)
+        successes += target.is_met(player.skills)
+    return successes
+
+
+def test_optimizer_matches_policy_following_simulation():
+    target = sim.TargetBuild("完美先生", 7, ("決勝球",))
+    inventory = {"高級技能變更券": 12, "傳說技能選擇變更券": 3, "技能變更保護券": 4}
+    optimizer = sim.TicketStrategyOptimizer(PITCHER, False, target)
+    probability = optimizer.success_probability([None, None, None], inventory)
+    trials = 8000
+    successes = _follow_policy(optimizer, target, inventory, trials, seed=0)
+    standard_error = math.sqrt(probability * (1 - probability) / trials)
+    assert abs(successes / trials - probability) < Z_LIMIT * standard_error
+
+
+@pytest.mark.parametrize("texts", [
+    ["完美先生:3", "平靜:3", "決勝球:3"],
+    ["完美先生:3", "決勝球:3", "平靜:3"],
+])
+def test_best_action_maps_back_to_the_real_slot(texts):
+    # 技能槽 2、3 排序後視為同一狀態，建議的技能槽必須是實際放著非必要技能的那一槽
+    target = sim.TargetBuild("完美先生", 7, ("決勝球", "光速投球"))
+    skills = _parse(texts)
+    optimizer = sim.TicketStrategyOptimizer(PITCHER, False, target)
+    ticket_type, slot = optimizer.best_action(skills, {"技能選擇變更券": 1})
+    assert ticket_type == "技能選擇變更券"
+    assert skills[slot].name == "平靜"
+    assert optimizer.success_probability(skills, {"技能選擇變更券": 1}) > 0
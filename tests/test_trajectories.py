@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import mlb_skill_simulator as sim
+
+PITCHER = sim.PlayerType.PITCHER
+# 固定種子下的單項門檻，與 conform 子指令的整體誤報率一致
+P_VALUE_THRESHOLD = 1e-3
+TRIALS = 200000
+
+
+def _tail_merged(counts, probs, min_expected=20):
+    # 期望次數過少的尾端合併成一格，卡方檢定才有效
+    cut = int(np.searchsorted(np.cumsum(probs[::-1])[::-1] * TRIALS < min_expected, True))
+    return np.append(counts[:cut], counts[cut:].sum()), np.append(probs[:cut], probs[cut:].sum())
+
+
+@pytest.mark.parametrize("is_legend, target, reroll_ticket", [
+    (False, sim.TargetBuild("完美先生", 7), "高級技能變更券"),
+    (False, sim.TargetBuild("完美先生", 9), "最高級技能變更券"),
+    (True, sim.TargetBuild(None, 9), "傳說技能變更券"),
+])
+def test_jump_engine_matches_exact_chain(is_legend, target, reroll_ticket):
+    exact = sim.solve_tickets_to_target(PITCHER, is_legend, target, reroll_ticket)
+    sampled = sim.simulate_tickets_to_target(PITCHER, is_legend, target, reroll_ticket, trials=TRIALS, seed=0)
+    assert sampled["unfinished"] == 0
+    for key in sampled["distribution"]:
+        probs = exact["distribution"][key]
+        counts = np.zeros(max(len(probs), len(sampled["distribution"][key])))
+        counts[:len(sampled["distribution"][key])] = sampled["distribution"][key] * TRIALS
+        padded = np.zeros(len(counts))
+        padded[:len(probs)] = probs
+        counts, padded = _tail_merged(np.round(counts), padded)
+        assert sim.chi2_goodness_of_fit(counts, padded)[2] > P_VALUE_THRESHOLD, key
+
+
+def _step_by_step(policy, trials, seed):
+    # 參考實作：每條軌跡每一步都實際抽取，回傳各變更券的使用數
+    rng = np.random.default_rng(seed)
+    skill_ids = np.full((trials, 3), -1, dtype=np.int16)
+    levels = np.zeros((trials, 3), dtype=np.int8)
+    counts = np.zeros((trials, len(policy.rules)), dtype=np.int64)
+    active = np.arange(trials)
+    while active.size:
+        rule = np.full(active.size, -1)
+        for index, (_, until, _) in reversed(list(enumerate(policy.rules))):
+            rule[~sim.target_met_batch(PITCHER, until, skill_ids[active], levels[active])] = index
+        active, rule = active[rule >= 0], rule[rule >= 0]
+        for index, (ticket_type, _, _) in enumerate(policy.rules):
+            rows = active[rule == index]
+            new_ids, _, new_levels = sim.simulate_skill_change_batch(PITCHER, False, ticket_type, rows.size, rng)
+            skill_ids[rows], levels[rows] = new_ids, new_levels
+            counts[rows, index] += 1
+    return counts
+
+
+def test_jump_engine_matches_step_by_step_when_rules_interact():
+    # 第二條規則的重抽可能讓第一條規則的目標失效，軌跡會回到第一條規則
+    policy = sim.TicketPolicy([
+        ("高級技能變更券", sim.TargetBuild(None, 7)),
+        ("最高級技能變更券", sim.TargetBuild(None, 8)),
+    ])
+    trials = 20000
+    jumped = sim.run_trajectories(PITCHER, False, policy, trials=trials, seed=1)
+    reference = _step_by_step(policy, trials, seed=2)
+    for index, (ticket_type, _, _) in enumerate(policy.rules):
+        values = reference[:, index]
+        standard_error = np.sqrt((values.var() + jumped["variance"][ticket_type]) / trials)
+        assert abs(jumped["expected"][ticket_type] - values.mean()) < 4 * standard_error, ticket_type
+
+
+def test_unreachable_reroll_rule_stops_at_the_ticket_limit():
+    policy = sim.TicketPolicy([("技能變更券", sim.TargetBuild(None, 3))])
+    result = sim.run_trajectories(PITCHER, False, policy, trials=100, seed=0, max_tickets=50)
+    assert result["unfinished"] == 100
+    assert result["expected"]["技能變更券"] == 50